@@ -0,0 +1,29 @@
+import time
+from django.core.management.base import BaseCommand
+from adminsite.models import AdminWallet
+
+
+class Command(BaseCommand):
+    help = "Fold new admin wallet transactions into AdminWallet.total_earnings."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help="Keep rolling up every N seconds instead of running once."
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+
+        while True:
+            rolled = AdminWallet.roll_up()
+            wallet = AdminWallet.platform()
+            self.stdout.write(
+                f"Rolled up {rolled} transactions; total earnings ₹{wallet.total_earnings} "
+                f"up to transaction #{wallet.rolled_up_to_id}."
+            )
+            if not interval:
+                break
+            time.sleep(interval)
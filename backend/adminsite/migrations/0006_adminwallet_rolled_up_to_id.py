@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:53
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def mark_existing_transactions_rolled_up(apps, schema_editor):
+    # Until now total_earnings was written in place and already includes every
+    # earlier transaction, so only rows added from here on are pending.
+    AdminWallet = apps.get_model('adminsite', 'AdminWallet')
+    AdminWalletTransaction = apps.get_model('adminsite', 'AdminWalletTransaction')
+
+    AdminWallet.objects.get_or_create(id=1)
+    for wallet in AdminWallet.objects.all():
+        last_id = AdminWalletTransaction.objects.filter(wallet=wallet).aggregate(last_id=Max('id'))['last_id']
+        wallet.rolled_up_to_id = last_id or 0
+        wallet.save(update_fields=['rolled_up_to_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminsite', '0005_servicerequestmodel_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='adminwallet',
+            name='rolled_up_to_id',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(mark_existing_transactions_rolled_up, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:56
+
+from django.db import migrations, models
+
+
+# Existing rows only carry a free-text note; infer their kind from it.
+NOTE_KINDS = [
+    ("Payout", "PAYOUT"),
+    ("Refund", "REFUND"),
+    ("Fee collected", "PLATFORM_FEE"),
+    ("payment received", "PAYMENT"),
+    ("Fine collected", "FINE"),
+]
+
+
+def backfill_kinds(apps, schema_editor):
+    AdminWalletTransaction = apps.get_model('adminsite', 'AdminWalletTransaction')
+    for note, kind in NOTE_KINDS:
+        AdminWalletTransaction.objects.filter(kind="ADJUSTMENT", note__icontains=note).update(kind=kind)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminsite', '0006_adminwallet_rolled_up_to_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='adminwallettransaction',
+            name='journal_id',
+            field=models.UUIDField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='adminwallettransaction',
+            name='kind',
+            field=models.CharField(choices=[('TOPUP', 'Wallet top-up'), ('PAYMENT', 'Booking payment'), ('REFUND', 'Refund'), ('FINE', 'Cancellation fine'), ('PLATFORM_FEE', 'Platform fee'), ('PAYOUT', 'Barber payout'), ('ADJUSTMENT', 'Adjustment')], default='ADJUSTMENT', max_length=20),
+        ),
+        migrations.RunPython(backfill_kinds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:59
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+# Kinds that take money out of the platform wallet.
+EXPENSE_KINDS = ["PAYOUT", "REFUND"]
+
+
+def backfill_categories(apps, schema_editor):
+    AdminWalletTransaction = apps.get_model('adminsite', 'AdminWalletTransaction')
+    AdminWalletDaily = apps.get_model('adminsite', 'AdminWalletDaily')
+
+    AdminWalletTransaction.objects.filter(kind__in=EXPENSE_KINDS).update(category="EXPENSE")
+
+    days = (
+        AdminWalletTransaction.objects.annotate(date=TruncDate('created_at'))
+        .values('date', 'category')
+        .annotate(total=Sum('amount'), transaction_count=Count('id'))
+        .order_by()
+    )
+    AdminWalletDaily.objects.bulk_create(
+        [AdminWalletDaily(**day) for day in days],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminsite', '0007_transaction_kind_journal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdminWalletDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('category', models.CharField(choices=[('INCOME', 'Income'), ('EXPENSE', 'Expense')], max_length=10)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='adminwallettransaction',
+            name='category',
+            field=models.CharField(choices=[('INCOME', 'Income'), ('EXPENSE', 'Expense')], default='INCOME', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='adminwallettransaction',
+            index=models.Index(fields=['category', 'created_at'], name='adminsite_a_categor_e34852_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='adminwalletdaily',
+            unique_together={('date', 'category')},
+        ),
+        migrations.RunPython(backfill_categories, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:10
+
+from django.db import migrations
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+PLATFORM_WALLET_ID = 1
+
+
+def rebuild_daily_totals(apps, schema_editor):
+    """Daily totals now only cover transactions up to ``rolled_up_to_id``."""
+    AdminWallet = apps.get_model('adminsite', 'AdminWallet')
+    AdminWalletTransaction = apps.get_model('adminsite', 'AdminWalletTransaction')
+    AdminWalletDaily = apps.get_model('adminsite', 'AdminWalletDaily')
+
+    wallet = AdminWallet.objects.filter(id=PLATFORM_WALLET_ID).first()
+    rolled_up_to_id = wallet.rolled_up_to_id if wallet else 0
+
+    days = (
+        AdminWalletTransaction.objects.filter(id__lte=rolled_up_to_id)
+        .annotate(date=TruncDate('created_at'))
+        .values('date', 'category')
+        .annotate(total=Sum('amount'), transaction_count=Count('id'))
+        .order_by()
+    )
+    AdminWalletDaily.objects.all().delete()
+    AdminWalletDaily.objects.bulk_create(
+        [AdminWalletDaily(**day) for day in days],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminsite', '0008_transaction_category'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_daily_totals, migrations.RunPython.noop),
+    ]
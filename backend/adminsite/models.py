@@ -1,8 +1,12 @@
-from django.db import models
+from datetime import timedelta
+from django.db import models, transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import TruncDate
 from django.utils import timezone
 from django.conf import settings
 from authservice.models import User
 from decimal import Decimal
+from paymentservice.kinds import ADJUSTMENT, CATEGORIES, ENTRY_KINDS, INCOME
 
 
 class CategoryModel(models.Model):
@@ -135,19 +139,84 @@ class Coupon(models.Model):
 
 
 class AdminWallet(models.Model):
+    """Platform wallet. Money paths only append AdminWalletTransaction rows
+    (through ``paymentservice.ledger``);
+    ``total_earnings`` is the rolled-up sum of the transactions up to
+    ``rolled_up_to_id`` and is only written by ``roll_up``, so payments never
+    contend on this row.
+    """
+    PLATFORM_WALLET_ID = 1
+    # Transactions younger than this are left for the next rollup so ids
+    # handed out to still-open transactions are not skipped.
+    ROLLUP_SAFETY_SECONDS = 60
+
     total_earnings = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    rolled_up_to_id = models.PositiveBigIntegerField(default=0)
     last_updated = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Admin Wallet - ₹{self.total_earnings}"
+
+    @property
+    def balance(self):
+        pending = (
+            self.transactions.filter(id__gt=self.rolled_up_to_id)
+            .aggregate(total=Sum('amount'))['total']
+        )
+        return self.total_earnings + (pending or 0)
+
+    @classmethod
+    def platform(cls, lock=False):
+        """The platform wallet; with ``lock`` its row is locked for the
+        rest of the transaction."""
+        wallet, _ = cls.objects.get_or_create(id=cls.PLATFORM_WALLET_ID)
+        if lock:
+            wallet = cls.objects.select_for_update().get(id=cls.PLATFORM_WALLET_ID)
+        return wallet
+
+    @classmethod
+    def roll_up(cls):
+        """Fold settled transactions into ``total_earnings`` and the daily
+        totals and return how many were added."""
+        cutoff = timezone.now() - timedelta(seconds=cls.ROLLUP_SAFETY_SECONDS)
+        cls.platform()
+
+        with transaction.atomic():
+            wallet = cls.objects.select_for_update().get(id=cls.PLATFORM_WALLET_ID)
+            pending = wallet.transactions.filter(id__gt=wallet.rolled_up_to_id)
+
+            last_id = pending.filter(created_at__lt=cutoff).aggregate(last_id=Max('id'))['last_id']
+            if last_id is None:
+                return 0
+
+            batch = pending.filter(id__lte=last_id)
+            rolled = batch.aggregate(total=Sum('amount'), count=Count('id'))
+            AdminWalletDaily.add_totals(
+                batch.annotate(date=TruncDate('created_at'))
+                .values('date', 'category')
+                .annotate(total=Sum('amount'), count=Count('id'))
+                .order_by()
+            )
+            wallet.total_earnings += rolled['total'] or 0
+            wallet.rolled_up_to_id = last_id
+            wallet.save(update_fields=['total_earnings', 'rolled_up_to_id', 'last_updated'])
+            return rolled['count']
     
 
 class AdminWalletTransaction(models.Model):
     wallet = models.ForeignKey(AdminWallet, on_delete=models.CASCADE, related_name="transactions")
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     note = models.CharField(max_length=255, blank=True, null=True)
+    kind = models.CharField(max_length=20, choices=ENTRY_KINDS, default=ADJUSTMENT)
+    category = models.CharField(max_length=10, choices=CATEGORIES, default=INCOME)
+    journal_id = models.UUIDField(null=True, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['category', 'created_at']),
+        ]
+
     def is_credit(self):
         return self.amount >= 0
 
@@ -155,3 +224,31 @@ class AdminWalletTransaction(models.Model):
         direction = "+" if self.amount >= 0 else "-"
         return f"{direction}₹{abs(self.amount)} on {self.created_at.strftime('%Y-%m-%d')} - {self.note or 'No note'}"
 
+
+class AdminWalletDaily(models.Model):
+    """Per-day, per-category sum of AdminWalletTransaction amounts up to
+    ``AdminWallet.rolled_up_to_id``. Written only by ``AdminWallet.roll_up``
+    so postings to the platform wallet never update a shared row."""
+    date = models.DateField()
+    category = models.CharField(max_length=10, choices=CATEGORIES)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    transaction_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['date', 'category']
+
+    def __str__(self):
+        return f"{self.date} | {self.category} | ₹{self.total}"
+
+    @classmethod
+    def add_totals(cls, rows):
+        """Add ``{'date', 'category', 'total', 'count'}`` rows to the daily totals."""
+        rows = list(rows)
+        cls.objects.bulk_create(
+            [cls(date=row['date'], category=row['category']) for row in rows], ignore_conflicts=True
+        )
+        for row in rows:
+            cls.objects.filter(date=row['date'], category=row['category']).update(
+                total=F('total') + row['total'],
+                transaction_count=F('transaction_count') + row['count']
+            )
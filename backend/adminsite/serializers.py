@@ -81,6 +81,7 @@ class ServiceSerializer(serializers.ModelSerializer):
 
 class AdminWalletSerializer(serializers.ModelSerializer):
     amount = serializers.DecimalField(max_digits=10, decimal_places=2, write_only=True, required=False)
+    total_earnings = serializers.DecimalField(source='balance', max_digits=12, decimal_places=2, read_only=True)
     
     class Meta:
         model = AdminWallet
@@ -112,7 +113,7 @@ class ComplaintSerializer(serializers.ModelSerializer):
 class AdminWalletTransactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = AdminWalletTransaction
-        fields = ("id", "amount", "note", "created_at")
+        fields = ("id", "amount", "note", "kind", "category", "created_at")
         read_only_fields = fields
 
     
@@ -0,0 +1,100 @@
+import os
+from unittest import mock
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+from authservice.models import User
+from backend import metrics
+from paymentservice import ledger
+from backend.testing import DispatchTestMixin
+from .models import AdminWallet, AdminWalletDaily
+from .views import AdminWalletTransactionHistoryView, platform_metrics
+
+
+class AdminWalletHistoryTests(DispatchTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.barber = self.create_barbers(1)[0]
+
+    def test_postings_leave_daily_totals_to_rollup(self):
+        platform = ledger.platform_wallet()
+        with CaptureQueriesContext(connection) as context:
+            ledger.post(ledger.PAYMENT, [(ledger.EXTERNAL, -200, None), (platform, 200, "Payment received")])
+
+        self.assertFalse(any("adminsite_adminwalletdaily" in q["sql"] for q in context.captured_queries))
+        self.assertFalse(AdminWalletDaily.objects.exists())
+
+        with mock.patch.object(AdminWallet, "ROLLUP_SAFETY_SECONDS", 0):
+            self.assertEqual(AdminWallet.roll_up(), 1)
+        daily = AdminWalletDaily.objects.get()
+        self.assertEqual((daily.date, daily.category), (timezone.localdate(), "INCOME"))
+        self.assertEqual((daily.total, daily.transaction_count), (200, 1))
+
+    def test_history_statistics_come_from_category_rollups(self):
+        platform = ledger.platform_wallet()
+        ledger.post(ledger.PAYMENT, [(ledger.EXTERNAL, -200, None), (platform, 200, "Payment received")])
+        ledger.post(ledger.PAYOUT, [(platform, -80, "Payout"), (ledger.barber_wallet(self.barber), 80, "Payout")])
+        with mock.patch.object(AdminWallet, "ROLLUP_SAFETY_SECONDS", 0):
+            AdminWallet.roll_up()
+        # Posted after the rollup, so only counted from the pending tail.
+        ledger.post(ledger.PAYMENT, [(ledger.EXTERNAL, -100, None), (platform, 100, "Payment received")])
+
+        request = APIRequestFactory().get("/", {"period": "today", "limit": 2})
+        force_authenticate(request, user=self.customer)
+        with CaptureQueriesContext(connection) as context:
+            response = AdminWalletTransactionHistoryView.as_view()(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["statistics"]["total_income"], 300)
+        self.assertEqual(response.data["statistics"]["total_expense"], 80)
+        self.assertEqual(response.data["statistics"]["transaction_count"], 3)
+        self.assertEqual([txn["category"] for txn in response.data["history"]], ["INCOME", "EXPENSE"])
+        self.assertIsNotNone(response.data["next_cursor"])
+        # Only transactions past the rollup watermark are summed from the history table.
+        sums = [q["sql"] for q in context.captured_queries
+                if "adminsite_adminwallettransaction" in q["sql"] and "SUM" in q["sql"]]
+        self.assertEqual(len(sums), 1)
+        self.assertIn('"id" >', sums[0])
+
+    def test_category_filter_applies_to_statistics(self):
+        platform = ledger.platform_wallet()
+        ledger.post(ledger.PAYMENT, [(ledger.EXTERNAL, -200, None), (platform, 200, "Payment received")])
+        with mock.patch.object(AdminWallet, "ROLLUP_SAFETY_SECONDS", 0):
+            AdminWallet.roll_up()
+        ledger.post(ledger.PAYOUT, [(platform, -80, "Payout"), (ledger.barber_wallet(self.barber), 80, "Payout")])
+
+        request = APIRequestFactory().get("/", {"period": "today", "category": "EXPENSE"})
+        force_authenticate(request, user=self.customer)
+        response = AdminWalletTransactionHistoryView.as_view()(request)
+
+        self.assertEqual([txn["category"] for txn in response.data["history"]], ["EXPENSE"])
+        statistics = response.data["statistics"]
+        self.assertEqual((statistics["total_income"], statistics["total_expense"]), (0, 80))
+        self.assertEqual(statistics["transaction_count"], 1)
+
+
+class PlatformMetricsTests(TestCase):
+
+    def setUp(self):
+        metrics.reset()
+
+    def get(self, user):
+        request = APIRequestFactory().get("/")
+        force_authenticate(request, user=user)
+        return platform_metrics(request)
+
+    def test_metrics_are_labelled_with_the_serving_process(self):
+        admin = User.objects.create_user(email="admin@example.com", name="Admin", user_type="admin")
+        customer = User.objects.create_user(email="customer@example.com", name="Customer", user_type="customer")
+        metrics.increment("notifications.sent", 2)
+
+        response = self.get(admin)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["scope"], "process")
+        self.assertEqual(response.data["process"]["pid"], os.getpid())
+        self.assertEqual(response.data["counters"], {"notifications.sent": 2})
+        self.assertEqual(self.get(customer).status_code, 403)
@@ -18,7 +18,8 @@ from .views import (
     approve_service_request,
     AdminServiceRequestDetailView,
     AdminServiceRequestListView,
-    VerificationBarberDetailsView
+    VerificationBarberDetailsView,
+    platform_metrics
     
 )
 
@@ -49,6 +50,7 @@ urlpatterns = [
     path('service-requests/<int:request_id>/approve/', approve_service_request, name='admin-approve-service-request'),
     path('service-requests/<int:request_id>/reject/', reject_service_request, name='admin-reject-service-request'),
     path('service-request/stats/', admin_service_request_stats, name='admin-service-request-stats'),
+    path('metrics/', platform_metrics, name='platform-metrics'),
     path('', include(router.urls)),
 ]
 
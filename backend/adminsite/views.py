@@ -1,3 +1,5 @@
+import os
+import socket
 from customersite.models import Booking, Rating
 from django.db.models import Q
 from django.utils import timezone
@@ -21,6 +23,7 @@ from .models import (
     AdminWallet,
     Coupon,
     AdminWalletTransaction,
+    AdminWalletDaily,
     ServiceRequestModel
 )
 from customersite.models import PaymentModel
@@ -37,6 +40,9 @@ from barber_reg.models import BarberRequest
 from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
 from django.db import transaction
+from backend import metrics
+from backend.pagination import InvalidCursor, keyset_page, parse_limit
+from paymentservice.kinds import EXPENSE, INCOME
 import logging
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -355,14 +361,7 @@ class AdminWalletView(APIView):
 
     def get(self, request):
         try:
-            admin_wallet, created = AdminWallet.objects.get_or_create(
-                id=1,
-                defaults={'total_earnings': 0}
-            )
-
-            if created:
-                logger.info("Created new admin wallet")
-
+            admin_wallet = AdminWallet.platform()
             serializer = AdminWalletSerializer(admin_wallet)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -376,7 +375,8 @@ class AdminWalletView(APIView):
 
 
 def get_period_range(period: str):
-    now = timezone.now()
+    # Local midnight, so the range lines up with the daily rollup dates.
+    now = timezone.localtime()
 
     if period == "today":
         start = now.replace(hour=0, minute=0, second=0, microsecond=0)
@@ -411,60 +411,66 @@ class AdminWalletTransactionHistoryView(APIView):
 
     def get(self, request):
         period = request.query_params.get("period", "all")
+        category = request.query_params.get("category")
 
+        platform = AdminWallet.platform()
         queryset = AdminWalletTransaction.objects.all()
+        daily_totals = AdminWalletDaily.objects.all()
+        # transactions posted since the last rollup are not in the daily totals yet
+        pending = AdminWalletTransaction.objects.filter(id__gt=platform.rolled_up_to_id)
 
         # filter by period
         if period != "all":
             start, end = get_period_range(period)
             if start and end:
                 queryset = queryset.filter(created_at__gte=start, created_at__lt=end)
+                daily_totals = daily_totals.filter(date__gte=start.date(), date__lt=end.date())
+                pending = pending.filter(created_at__gte=start, created_at__lt=end)
 
-        queryset = queryset.order_by("-created_at")
-
-        # statistics using database aggregation
-        stats = queryset.aggregate(
-            total_income=Sum(
-                Case(
-                    When(~Q(note__icontains="payout") & ~Q(note__icontains="refund"),
-                         then="amount"),
-                    default=Value(0),
-                    output_field=DecimalField(),
-                )
-            ),
-            total_expense=Sum(
-                Case(
-                    When(Q(note__icontains="payout") | Q(note__icontains="refund"),
-                         then="amount"),
-                    default=Value(0),
-                    output_field=DecimalField(),
-                )
-            ),
-            transaction_count=Sum(Value(1), output_field=DecimalField()),
-        )
+        if category:
+            queryset = queryset.filter(category=category)
+            daily_totals = daily_totals.filter(category=category)
+            pending = pending.filter(category=category)
 
-        total_income = abs(stats["total_income"] or 0)
-        total_expense = abs(stats["total_expense"] or 0)
-
-        serializer = AdminWalletTransactionSerializer(queryset, many=True)
+        try:
+            limit = parse_limit(request.query_params.get("limit"))
+            history, next_cursor = keyset_page(queryset, request.query_params.get("cursor"), limit)
+        except InvalidCursor as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # statistics from the per-day rollups plus the short tail not rolled up yet
+        totals = {}
+        for rows in (
+            daily_totals.values("category").annotate(total=Sum("total"), count=Sum("transaction_count")),
+            pending.values("category").annotate(total=Sum("amount"), count=Count("id")),
+        ):
+            for row in rows.order_by():
+                current = totals.setdefault(row["category"], {"total": 0, "count": 0})
+                current["total"] += row["total"] or 0
+                current["count"] += row["count"] or 0
+        income = totals.get(INCOME, {})
+        expense = totals.get(EXPENSE, {})
+
+        total_income = abs(income.get("total") or 0)
+        total_expense = abs(expense.get("total") or 0)
+
+        serializer = AdminWalletTransactionSerializer(history, many=True)
 
         return Response(
             {
                 "history": serializer.data,
+                "next_cursor": next_cursor,
                 "statistics": {
                     "total_income": total_income,
                     "total_expense": total_expense,
                     "net_amount": total_income - total_expense,
-                    "transaction_count": queryset.count(),
+                    "transaction_count": (income.get("count") or 0) + (expense.get("count") or 0),
                     "period": period,
                 },
             },
             status=status.HTTP_200_OK,
         )
-        
-        
-        
-        
+
 
 class CouponViewSet(ModelViewSet):
     permission_classes = [IsAuthenticated]
@@ -546,7 +552,7 @@ class AdminDashboardView(APIView):
                 'categories': total_categories,
                 'services': total_services,
                 'platform_earnings': total_revenue,
-                'admin_wallet_balance': admin_wallet.total_earnings if admin_wallet else 0
+                'admin_wallet_balance': admin_wallet.balance if admin_wallet else 0
             },
             'top_booked_services': top_booked_services,
             'top_rating_barbers': top_rating_barbers,
@@ -665,3 +671,21 @@ def admin_service_request_stats(request):
         ).count()
     }
     return Response(stats)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def platform_metrics(request):
+    if request.user.user_type != 'admin':
+        return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
+
+    # Only the worker that served this request; see backend.metrics.
+    return Response({
+        'scope': 'process',
+        'process': {
+            'host': socket.gethostname(),
+            'pid': os.getpid(),
+            'started_at': datetime.fromtimestamp(metrics.STARTED_AT, tz=timezone.get_current_timezone()),
+        },
+        **metrics.snapshot(),
+    })
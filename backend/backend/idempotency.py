@@ -0,0 +1,109 @@
+import hashlib
+import json
+import logging
+import time
+from functools import wraps
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+from backend import metrics
+
+logger = logging.getLogger(__name__)
+
+HEADER = "HTTP_IDEMPOTENCY_KEY"
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL_SECONDS = 0.05
+IN_FLIGHT = "in_flight"
+DONE = "done"
+
+
+def _fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{request.method} {request.path}\n{body}".encode()).hexdigest()
+
+
+def _replay(entry):
+    response = Response(entry["data"], status=entry["status"])
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(view_method):
+    """Make a DRF ``post`` handler safe to retry with an ``Idempotency-Key`` header.
+
+    The first request for a (user, view, key) stores its response in the
+    ``settings.IDEMPOTENCY_CACHE`` cache for ``IDEMPOTENCY_TTL_SECONDS``;
+    retries replay it with one cache read. A duplicate that arrives while the
+    first is still running waits up to ``IDEMPOTENCY_WAIT_SECONDS`` for its
+    response instead of running the handler again. Reusing a key with a
+    different body is rejected with 422. Error responses (4xx and 5xx) and
+    exceptions are not stored, so the client can retry them, or correct the
+    request, under the same key. Requests without the header, or made while
+    the cache is unreachable, run as before.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.META.get(HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({"error": "Idempotency-Key is too long"}, status=status.HTTP_400_BAD_REQUEST)
+
+        user_id = request.user.pk if request.user.is_authenticated else "anonymous"
+        cache_key = f"idempotency:{type(self).__name__}:{user_id}:{hashlib.sha256(key.encode()).hexdigest()}"
+        fingerprint = _fingerprint(request)
+        cache = caches[settings.IDEMPOTENCY_CACHE]
+
+        try:
+            claimed = cache.add(
+                cache_key, {"state": IN_FLIGHT, "fingerprint": fingerprint},
+                timeout=settings.IDEMPOTENCY_LOCK_SECONDS
+            )
+        except Exception as e:
+            logger.warning(f"Idempotency cache unavailable, running {type(self).__name__} unguarded: {e}")
+            return view_method(self, request, *args, **kwargs)
+
+        if not claimed:
+            return _wait_for_first(cache, cache_key, fingerprint)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            cache.delete(cache_key)
+            raise
+
+        if response.status_code >= 400 or not hasattr(response, "data"):
+            cache.delete(cache_key)
+        else:
+            cache.set(cache_key, {
+                "state": DONE,
+                "fingerprint": fingerprint,
+                "status": response.status_code,
+                "data": response.data,
+            }, timeout=settings.IDEMPOTENCY_TTL_SECONDS)
+        return response
+
+    return wrapper
+
+
+def _wait_for_first(cache, cache_key, fingerprint):
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    entry = cache.get(cache_key)
+    while entry is not None and entry["state"] == IN_FLIGHT and time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL_SECONDS)
+        entry = cache.get(cache_key)
+
+    if entry is not None and entry["fingerprint"] != fingerprint:
+        return Response(
+            {"error": "Idempotency-Key was already used with a different request"},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    if entry is None or entry["state"] == IN_FLIGHT:
+        # The first request failed (and released the key) or is still running.
+        return Response(
+            {"error": "A request with this Idempotency-Key is still being processed"},
+            status=status.HTTP_409_CONFLICT
+        )
+    metrics.increment("idempotency.replayed")
+    return _replay(entry)
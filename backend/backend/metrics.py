@@ -0,0 +1,81 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+
+class Histogram:
+    BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf"))
+
+    def __init__(self):
+        self.counts = [0] * len(self.BUCKETS_MS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms):
+        self.counts[bisect_left(self.BUCKETS_MS, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        self.max = max(self.max, value_ms)
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, bucket_count in zip(self.BUCKETS_MS, self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": round(self.max, 3),
+        }
+
+
+# Figures live in this process only: each worker counts what it served
+# since STARTED_AT, and nothing is summed across workers or hosts.
+STARTED_AT = time.time()
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+
+
+def increment(name, value=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def observe(name, value_ms):
+    with _lock:
+        _histograms.setdefault(name, Histogram()).observe(value_ms)
+
+
+@contextmanager
+def timer(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, (time.perf_counter() - started) * 1000)
+
+
+def snapshot():
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "histograms": {name: histogram.snapshot() for name, histogram in _histograms.items()},
+        }
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
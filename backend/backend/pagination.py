@@ -0,0 +1,51 @@
+import base64
+from datetime import datetime
+from django.db.models import Q
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at, pk):
+    raw = f"{created_at.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor("Invalid cursor.") from e
+
+
+def parse_limit(value, default=DEFAULT_LIMIT):
+    try:
+        limit = int(value) if value else default
+    except (TypeError, ValueError) as e:
+        raise InvalidCursor("Invalid limit.") from e
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def keyset_page(queryset, cursor=None, limit=DEFAULT_LIMIT):
+    """Newest-first page of ``queryset`` keyed on ``(created_at, id)``.
+
+    Returns ``(rows, next_cursor)``; ``next_cursor`` is ``None`` on the last
+    page. Unlike offset paging the cost does not grow with the page number,
+    and rows inserted meanwhile do not shift the pages already seen.
+    """
+    queryset = queryset.order_by('-created_at', '-id')
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+    rows = list(queryset[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
@@ -115,6 +115,29 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Idempotency-Key responses, price quotes and barber schedules are shared by
+# every worker, so they live in Redis.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "idempotency": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": REDIS_URL,
+        "KEY_PREFIX": "groomnet",
+    },
+    "quotes": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": REDIS_URL,
+        "KEY_PREFIX": "groomnet",
+    },
+    "availability": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": REDIS_URL,
+        "KEY_PREFIX": "groomnet",
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     { 'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator', },
     { 'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator', },
@@ -159,11 +182,14 @@ CORS_ALLOWED_HEADERS = [
     'authorization',
     'content-type',
     'dnt',
+    'idempotency-key',
     'origin',
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
 ]
+# django-cors-headers reads CORS_ALLOW_HEADERS.
+CORS_ALLOW_HEADERS = CORS_ALLOWED_HEADERS
 CORS_ALLOW_CREDENTIALS = True
 
 CORS_ALLOW_METHODS = [
@@ -221,6 +247,15 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
 STRIPE_PUBLISHABLE_KEY = os.getenv("STRIPE_PUBLISHABLE_KEY")
+STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
+
+# Stripe calls go through paymentservice.gateway. "fake" swaps in the
+# in-process gateway for offline tests and benchmarks.
+PAYMENT_GATEWAY = os.getenv("PAYMENT_GATEWAY", "stripe")
+STRIPE_CONNECT_TIMEOUT_SECONDS = 3
+STRIPE_READ_TIMEOUT_SECONDS = 10
+STRIPE_POOL_SIZE = 20
+STRIPE_MAX_NETWORK_RETRIES = 2
 
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
 GOOGLE_OAUTH2_CLIENT_ID = os.getenv("GOOGLE_OAUTH2_CLIENT_ID")
@@ -233,6 +268,53 @@ SENDGRID_SANDBOX_MODE_IN_DEBUG = False
 
 
 
+# Instant booking dispatch: each wave offers the booking to the nearest `size`
+# barbers within `radius_km`, then waits `timeout_seconds` before the next wave.
+# The booking is expired and refunded when the last wave lapses.
+INSTANT_DISPATCH_WAVES = [
+    {"size": 5, "radius_km": 5, "timeout_seconds": 30},
+    {"size": 15, "radius_km": 10, "timeout_seconds": 45},
+    {"size": 50, "radius_km": 25, "timeout_seconds": 60},
+]
+
+# Stripe captures for accepted instant bookings run in the payment worker.
+# A failed attempt is retried after `retry_delays[attempt - 1]` seconds; once
+# the delays are used up the booking is cancelled and the authorization released.
+INSTANT_CAPTURE_RETRY_DELAYS = [5, 30, 120]
+INSTANT_CAPTURE_LEASE_SECONDS = 60
+
+# First-wins Redis claim taken before the accept transaction; 0 disables it.
+INSTANT_ACCEPT_CLAIM_TTL_SECONDS = 30
+
+# Stripe webhook events are stored by the webhook view and applied by the
+# webhook worker; a failing event is retried this many times.
+STRIPE_EVENT_MAX_ATTEMPTS = 5
+
+# Booking and checkout POSTs honour an Idempotency-Key header (see
+# backend.idempotency). Stored responses are replayed for `ttl_seconds`; a
+# duplicate of a request still in flight waits up to `wait_seconds` for it,
+# and an in-flight marker left by a crashed worker expires after `lock_seconds`.
+IDEMPOTENCY_CACHE = "idempotency"
+IDEMPOTENCY_TTL_SECONDS = 24 * 60 * 60
+IDEMPOTENCY_WAIT_SECONDS = 10
+IDEMPOTENCY_LOCK_SECONDS = 60
+
+# Booking summary issues a signed price quote (customersite.pricing) that
+# create-booking redeems once within `PRICING_QUOTE_TTL_SECONDS`.
+PRICING_QUOTE_CACHE = "quotes"
+PRICING_QUOTE_TTL_SECONDS = 15 * 60
+
+# Barbers with working hours get bookable times computed per day
+# (customersite.availability). A barber-day's windows and busy intervals are
+# cached for `AVAILABILITY_CACHE_SECONDS` and dropped when a booking or the
+# schedule changes; customers can book `AVAILABILITY_HORIZON_DAYS` ahead.
+# The per-day free-minute bitmaps behind the multi-barber search are rebuilt
+# after the same number of seconds.
+AVAILABILITY_CACHE = "availability"
+AVAILABILITY_CACHE_SECONDS = 5 * 60
+AVAILABILITY_HORIZON_DAYS = 30
+
+
 BASE_APP_URL = os.environ.get("FRONTEND_URL", 'http://localhost:5173') 
 BASE_API_URL = f'https://{RENDER_EXTERNAL_HOSTNAME}' if RENDER_EXTERNAL_HOSTNAME else 'http://localhost:8000'
 
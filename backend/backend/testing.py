@@ -0,0 +1,133 @@
+"""Fixtures shared by the app test suites."""
+import time
+from unittest import mock
+from adminsite.models import CategoryModel, ServiceModel
+from authservice.models import User
+from barbersite.models import BarberService
+from customersite.models import Booking
+from profileservice.models import Address
+
+
+IN_MEMORY_CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+class FakeRedis:
+    """In-process stand-in for the Redis commands presence and claims use."""
+
+    def __init__(self):
+        self.values = {}
+        self.sorted_sets = {}
+
+    def _live(self, key):
+        value, expires_at = self.values.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.time():
+            del self.values[key]
+            return None
+        return value
+
+    def get(self, key):
+        return self._live(key)
+
+    def exists(self, key):
+        return int(self._live(key) is not None)
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and self._live(key) is not None:
+            return None
+        self.values[key] = (value, time.time() + ex if ex else None)
+        return True
+
+    def delete(self, *keys):
+        return sum(self.values.pop(key, None) is not None for key in keys)
+
+    def eval(self, script, numkeys, key, value):
+        # Only the compare-and-delete used to release a claim.
+        return self.delete(key) if self._live(key) == value else 0
+
+    def expire(self, key, seconds):
+        return True
+
+    def zadd(self, key, mapping):
+        self.sorted_sets.setdefault(key, {}).update(mapping)
+
+    def zrem(self, key, *members):
+        return sum(self.sorted_sets.get(key, {}).pop(member, None) is not None for member in members)
+
+    def _in_range(self, key, low, high):
+        return [member for member, score in self.sorted_sets.get(key, {}).items()
+                if float(low) <= score <= float(high)]
+
+    def zrangebyscore(self, key, low, high):
+        return self._in_range(key, low, high)
+
+    def zcount(self, key, low, high):
+        return len(self._in_range(key, low, high))
+
+    def zremrangebyscore(self, key, low, high):
+        return self.zrem(key, *self._in_range(key, low, high))
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+
+    def __init__(self, client):
+        self.client, self.calls = client, []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+class DispatchTestMixin:
+
+    def setUp(self):
+        # Presence and claims live in a per-test fake, so no run touches (or
+        # leaves keys in) a real Redis. With nobody heartbeating, dispatch
+        # falls back to the User.is_online mirror.
+        self.redis = FakeRedis()
+        for target in ("instantbooking.presence.get_redis", "instantbooking.claims.get_redis"):
+            patcher = mock.patch(target, return_value=self.redis)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        category = CategoryModel.objects.create(name="Hair", image="categories/hair.png")
+        self.service = ServiceModel.objects.create(
+            category=category, name="Haircut", price=200, duration_minutes=30
+        )
+        self.customer = User.objects.create_user(
+            email="customer@example.com", name="Customer", user_type="customer"
+        )
+        self.address = Address.objects.create(
+            user=self.customer, name="Home", mobile="9999999999", building="1",
+            street="Main Street", city="Kochi", district="Ernakulam",
+            state="Kerala", pincode="682001"
+        )
+        self.barber_count = 0
+
+    def create_barbers(self, count):
+        barbers = []
+        for _ in range(count):
+            self.barber_count += 1
+            barber = User.objects.create_user(
+                email=f"barber{self.barber_count}@example.com",
+                name=f"Barber {self.barber_count}",
+                user_type="barber",
+                is_online=True
+            )
+            BarberService.objects.create(barber=barber, service=self.service)
+            barbers.append(barber)
+        return barbers
+
+    def create_booking(self, **kwargs):
+        data = {
+            "customer": self.customer,
+            "service": self.service,
+            "address": self.address,
+            "total_amount": 210,
+        }
+        data.update(kwargs)
+        return Booking.objects.create(**data)
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:56
+
+from django.db import migrations, models
+
+
+# Existing rows only carry a free-text note; infer their kind from it.
+NOTE_KINDS = [
+    ("Platform Fee", "PLATFORM_FEE"),
+    ("Earnings for", "PAYOUT"),
+    ("Fine received", "FINE"),
+]
+
+
+def backfill_kinds(apps, schema_editor):
+    WalletTransaction = apps.get_model('barbersite', 'WalletTransaction')
+    for note, kind in NOTE_KINDS:
+        WalletTransaction.objects.filter(kind="ADJUSTMENT", note__icontains=note).update(kind=kind)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('barbersite', '0002_alter_wallettransaction_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallettransaction',
+            name='journal_id',
+            field=models.UUIDField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='wallettransaction',
+            name='kind',
+            field=models.CharField(choices=[('TOPUP', 'Wallet top-up'), ('PAYMENT', 'Booking payment'), ('REFUND', 'Refund'), ('FINE', 'Cancellation fine'), ('PLATFORM_FEE', 'Platform fee'), ('PAYOUT', 'Barber payout'), ('ADJUSTMENT', 'Adjustment')], default='ADJUSTMENT', max_length=20),
+        ),
+        migrations.RunPython(backfill_kinds, migrations.RunPython.noop),
+    ]
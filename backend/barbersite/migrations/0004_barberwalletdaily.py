@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_totals(apps, schema_editor):
+    WalletTransaction = apps.get_model('barbersite', 'WalletTransaction')
+    BarberWalletDaily = apps.get_model('barbersite', 'BarberWalletDaily')
+
+    days = (
+        WalletTransaction.objects.annotate(date=TruncDate('created_at'))
+        .values('wallet_id', 'date')
+        .annotate(total=Sum('amount'), transaction_count=Count('id'))
+        .order_by()
+    )
+    BarberWalletDaily.objects.bulk_create(
+        [BarberWalletDaily(**day) for day in days],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('barbersite', '0003_transaction_kind_journal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BarberWalletDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_totals', to='barbersite.barberwallet')),
+            ],
+            options={
+                'unique_together': {('wallet', 'date')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(fields=['wallet', 'created_at', 'id'], name='barbersite__wallet__d1d005_idx'),
+        ),
+        migrations.RunPython(backfill_daily_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+from django.db.models import Count
+
+SLOT_FIELDS = ('barber_id', 'date', 'start_time', 'end_time')
+
+
+def dedupe_slots(apps, schema_editor):
+    """Fold duplicate slots into one row per (barber, date, start, end).
+
+    The booked copy (or else the oldest) is kept; bookings pointing at the
+    other copies are moved onto it before they are deleted.
+    """
+    BarberSlot = apps.get_model('barbersite', 'BarberSlot')
+    BarberSlotBooking = apps.get_model('barbersite', 'BarberSlotBooking')
+    Booking = apps.get_model('customersite', 'Booking')
+
+    groups = (
+        BarberSlot.objects.values(*SLOT_FIELDS)
+        .annotate(copies=Count('id'))
+        .filter(copies__gt=1)
+        .order_by()
+    )
+    for group in groups.iterator():
+        copies = list(
+            BarberSlot.objects.filter(**{field: group[field] for field in SLOT_FIELDS})
+            .order_by('-is_booked', 'id')
+            .values_list('id', flat=True)
+        )
+        keep, extra = copies[0], copies[1:]
+        Booking.objects.filter(slot_id__in=extra).update(slot_id=keep)
+        BarberSlotBooking.objects.filter(slot_id__in=extra).update(slot_id=keep)
+        BarberSlot.objects.filter(id__in=extra).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('barbersite', '0005_working_hours'),
+        ('customersite', '0008_paymentmodel_releasable_at_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_slots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:17
+
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('barbersite', '0006_dedupe_barber_slots'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='barberslot',
+            unique_together={('barber', 'date', 'start_time', 'end_time')},
+        ),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 from authservice.models import User
+from paymentservice.kinds import ADJUSTMENT, ENTRY_KINDS
 from adminsite.models import ServiceModel
 from customersite.models import Booking
 
@@ -28,7 +31,10 @@ class BarberSlot(models.Model):
     start_time = models.TimeField()
     end_time = models.TimeField()
     is_booked = models.BooleanField(default=False)
-    
+
+    class Meta:
+        unique_together = ['barber', 'date', 'start_time', 'end_time']
+
     def is_slot_available(barber, slot):
         active_instant = Booking.objects.filter(
             barber=barber, 
@@ -43,6 +49,59 @@ class BarberSlot(models.Model):
     
     
 
+class WorkingHours(models.Model):
+    """A weekly window in which a barber takes scheduled bookings. Bookable
+    start times are computed from these windows (see
+    ``customersite.availability``) instead of being stored as slots."""
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+
+    barber = models.ForeignKey(User, on_delete=models.CASCADE, related_name='working_hours',
+                               limit_choices_to={'user_type': 'barber'})
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['barber', 'weekday', 'start_time']
+        ordering = ['weekday', 'start_time']
+
+    def __str__(self):
+        return f"{self.barber.name} | {self.get_weekday_display()} {self.start_time}-{self.end_time}"
+
+
+class ScheduleException(models.Model):
+    """Replaces a barber's weekly hours on one date. A row without times
+    marks the day off; rows with times are that day's only windows."""
+    barber = models.ForeignKey(User, on_delete=models.CASCADE, related_name='schedule_exceptions',
+                               limit_choices_to={'user_type': 'barber'})
+    date = models.DateField()
+    start_time = models.TimeField(null=True, blank=True)
+    end_time = models.TimeField(null=True, blank=True)
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['barber', 'date', 'start_time']
+        ordering = ['date', 'start_time']
+
+    @property
+    def is_day_off(self):
+        return self.start_time is None
+
+    def __str__(self):
+        hours = "off" if self.is_day_off else f"{self.start_time}-{self.end_time}"
+        return f"{self.barber.name} | {self.date} {hours}"
+
+
 class BarberSlotBooking(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     slot = models.ForeignKey(BarberSlot, on_delete=models.CASCADE)
@@ -67,15 +126,50 @@ class WalletTransaction(models.Model):
         BarberWallet, on_delete=models.CASCADE, related_name="transactions")
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     note = models.CharField(max_length=255, blank=True, null=True)
+    kind = models.CharField(max_length=20, choices=ENTRY_KINDS, default=ADJUSTMENT)
+    journal_id = models.UUIDField(null=True, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['wallet', 'created_at', 'id'])]
 
     def __str__(self):
         return f"₹{self.amount} on {self.created_at.strftime('%Y-%m-%d')} - {self.note or 'No note'}"
 
 
+
+class BarberWalletDaily(models.Model):
+    """Per-wallet, per-day sum of WalletTransaction amounts, kept current by
+    the ledger so period totals read at most a month of rows."""
+    wallet = models.ForeignKey(
+        BarberWallet, on_delete=models.CASCADE, related_name="daily_totals")
+    date = models.DateField()
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    transaction_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['wallet', 'date']
+
+    def __str__(self):
+        return f"{self.wallet} | {self.date} | ₹{self.total}"
+
+    @classmethod
+    def add_transactions(cls, transactions):
+        day = timezone.localdate()
+        totals = {}
+        for wallet_transaction in transactions:
+            amount, count = totals.get(wallet_transaction.wallet_id, (0, 0))
+            totals[wallet_transaction.wallet_id] = (amount + wallet_transaction.amount, count + 1)
+
+        cls.objects.bulk_create([cls(wallet_id=wallet_id, date=day) for wallet_id in totals], ignore_conflicts=True)
+        for wallet_id, (amount, count) in totals.items():
+            cls.objects.filter(wallet_id=wallet_id, date=day).update(
+                total=F('total') + amount,
+                transaction_count=F('transaction_count') + count
+            )
+
+
 class Portfolio(models.Model):
     user = models.OneToOneField(
         User, on_delete=models.CASCADE, related_name='portfolio')
@@ -1,7 +1,11 @@
+from datetime import timedelta
 from rest_framework import serializers
 from adminsite.models import ServiceRequestModel
 from adminsite.serializers import ServiceSerializer
-from .models import BarberSlot, BarberSlotBooking, BarberWallet, WalletTransaction, Portfolio, BarberService
+from .models import (
+    BarberSlot, BarberSlotBooking, BarberWallet, WalletTransaction, Portfolio, BarberService,
+    ScheduleException, WorkingHours,
+)
 
 
 
@@ -12,6 +16,91 @@ class BarberSlotSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class SlotTimesSerializer(serializers.Serializer):
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+
+    def to_internal_value(self, data):
+        if data.get('end_time') in ["24:00", "24:00:00", "00:00", "00:00:00"]:
+            data = {**data, 'end_time': "23:59:59"}
+        return super().to_internal_value(data)
+
+    def validate(self, data):
+        if data['start_time'] >= data['end_time']:
+            raise serializers.ValidationError("End time must be after start time")
+        return data
+
+
+class BulkSlotRangeSerializer(serializers.Serializer):
+    MAX_DAYS = 92
+
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    # 0 = Monday; every day of the range when left out.
+    weekdays = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=6), required=False, allow_empty=False
+    )
+
+    def validate(self, data):
+        if data['end_date'] < data['start_date']:
+            raise serializers.ValidationError("end_date must not be before start_date")
+        if (data['end_date'] - data['start_date']).days >= self.MAX_DAYS:
+            raise serializers.ValidationError(f"A range can cover at most {self.MAX_DAYS} days")
+        return data
+
+    @staticmethod
+    def dates(data):
+        weekdays = data.get('weekdays')
+        days = (data['end_date'] - data['start_date']).days + 1
+        dates = (data['start_date'] + timedelta(days=offset) for offset in range(days))
+        return [date for date in dates if weekdays is None or date.weekday() in weekdays]
+
+
+class BulkSlotCreateSerializer(BulkSlotRangeSerializer):
+    MAX_SLOTS = 3000
+
+    times = SlotTimesSerializer(many=True, allow_empty=False)
+
+    def validate(self, data):
+        data = super().validate(data)
+        times = sorted((t['start_time'], t['end_time']) for t in data['times'])
+        for (_, previous_end), (start, _) in zip(times, times[1:]):
+            if start < previous_end:
+                raise serializers.ValidationError({"times": "Slot times must not overlap"})
+        if len(self.dates(data)) * len(times) > self.MAX_SLOTS:
+            raise serializers.ValidationError(f"At most {self.MAX_SLOTS} slots can be created at once")
+        data['times'] = times
+        return data
+
+
+class WorkingHoursSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WorkingHours
+        fields = ['id', 'weekday', 'start_time', 'end_time']
+
+    def validate(self, data):
+        start = data.get('start_time', getattr(self.instance, 'start_time', None))
+        end = data.get('end_time', getattr(self.instance, 'end_time', None))
+        if start >= end:
+            raise serializers.ValidationError("End time must be after start time")
+        return data
+
+
+class ScheduleExceptionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ScheduleException
+        fields = ['id', 'date', 'start_time', 'end_time', 'note']
+
+    def validate(self, data):
+        start = data.get('start_time', getattr(self.instance, 'start_time', None))
+        end = data.get('end_time', getattr(self.instance, 'end_time', None))
+        if (start is None) != (end is None):
+            raise serializers.ValidationError("Give both start and end time, or neither for a day off")
+        if start is not None and start >= end:
+            raise serializers.ValidationError("End time must be after start time")
+        return data
+
+
 class BarberSlotBookingSerializer(serializers.ModelSerializer):
     slot = BarberSlotSerializer()
 
@@ -42,15 +131,14 @@ class BarberServiceSerializer(serializers.ModelSerializer):
 class WalletTransactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = WalletTransaction
-        fields = ['id', 'amount', 'note', 'created_at']
+        fields = ['id', 'amount', 'note', 'kind', 'created_at']
 
 
 class BarberWalletSerializer(serializers.ModelSerializer):
-    transactions = WalletTransactionSerializer(many=True, read_only=True)
 
     class Meta:
         model = BarberWallet
-        fields = ['balance', 'updated_at', 'transactions']
+        fields = ['balance', 'updated_at']
 
 
 class ServiceRequestCreateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+from paymentservice import ledger
+from backend.testing import DispatchTestMixin
+from .models import BarberSlot
+from .views import BarberSlotViewSet, BarberWalletTransactionsView, BarberWalletView
+
+
+class BarberWalletHistoryTests(DispatchTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.barber = self.create_barbers(1)[0]
+        self.wallet = ledger.barber_wallet(self.barber)
+        for amount in (100, 50, 25):
+            ledger.post(ledger.PAYOUT, [(ledger.platform_wallet(), -amount, "Payout"), (self.wallet, amount, "Earned")])
+
+    def get(self, view, **params):
+        request = APIRequestFactory().get("/", params)
+        force_authenticate(request, user=self.barber)
+        return view.as_view()(request)
+
+    def test_postings_roll_up_per_day(self):
+        daily = self.wallet.daily_totals.get()
+        self.assertEqual(daily.date, timezone.localdate())
+        self.assertEqual((daily.total, daily.transaction_count), (175, 3))
+
+        response = self.get(BarberWalletView)
+        self.assertEqual(response.data["day_total"], 175)
+
+    def test_history_pages_by_cursor(self):
+        first = self.get(BarberWalletTransactionsView, limit=2)
+        self.assertEqual([tx["amount"] for tx in first.data["results"]], ["25.00", "50.00"])
+        self.assertIsNotNone(first.data["next_cursor"])
+
+        second = self.get(BarberWalletTransactionsView, limit=2, cursor=first.data["next_cursor"])
+        self.assertEqual([tx["amount"] for tx in second.data["results"]], ["100.00"])
+        self.assertIsNone(second.data["next_cursor"])
+
+    def test_bad_cursor_is_rejected(self):
+        response = self.get(BarberWalletTransactionsView, cursor="not-a-cursor")
+        self.assertEqual(response.status_code, 400)
+
+
+class BulkSlotTests(DispatchTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        [self.barber] = self.create_barbers(1)
+        # A Monday, so the fortnight has ten weekdays.
+        self.monday = timezone.localdate() + timedelta(days=7 - timezone.localdate().weekday())
+
+    def post(self, action, data):
+        request = APIRequestFactory().post("/", data, format="json")
+        force_authenticate(request, user=self.barber)
+        return BarberSlotViewSet.as_view({"post": action})(request)
+
+    def create(self, times, **data):
+        return self.post("bulk_create_slots", {
+            "start_date": self.monday.isoformat(),
+            "end_date": (self.monday + timedelta(days=13)).isoformat(),
+            "weekdays": [0, 1, 2, 3, 4],
+            "times": [{"start_time": start, "end_time": end} for start, end in times],
+            **data,
+        })
+
+    def test_bulk_create_summarises_created_skipped_and_conflicting(self):
+        first = self.create([("09:00", "09:30"), ("09:30", "10:00")])
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((first.data["created"], first.data["skipped"], first.data["conflicting"]), (20, 0, 0))
+
+        with CaptureQueriesContext(connection) as queries:
+            again = self.create([("09:00", "09:30"), ("09:45", "10:15"), ("23:00", "24:00")])
+        statements = [q["sql"] for q in queries.captured_queries if "SAVEPOINT" not in q["sql"]]
+        self.assertEqual(len(statements), 4)  # barber lock, existing slots, one insert, stale bitmaps
+
+        self.assertEqual((again.data["created"], again.data["skipped"], again.data["conflicting"]), (10, 10, 10))
+        self.assertEqual(BarberSlot.objects.filter(barber=self.barber).count(), 30)
+        self.assertEqual(BarberSlot.objects.filter(end_time=datetime.strptime("23:59:59", "%H:%M:%S").time()).count(), 10)
+
+    def test_bulk_create_rejects_oversized_or_overlapping_requests(self):
+        self.assertEqual(self.create([("09:00", "10:00"), ("09:30", "10:30")]).status_code, 400)
+        self.assertEqual(self.create([("09:00", "10:00")], end_date=(self.monday + timedelta(days=200)).isoformat()).status_code, 400)
+
+    def test_bulk_cancel_keeps_booked_slots(self):
+        self.create([("09:00", "09:30")])
+        booked = BarberSlot.objects.filter(barber=self.barber).first()
+        booked.is_booked = True
+        booked.save()
+
+        response = self.post("bulk_cancel_slots", {
+            "start_date": self.monday.isoformat(), "end_date": (self.monday + timedelta(days=13)).isoformat()
+        })
+
+        self.assertEqual((response.data["cancelled"], response.data["kept_booked"]), (9, 1))
+        self.assertEqual(list(BarberSlot.objects.values_list("id", flat=True)), [booked.id])
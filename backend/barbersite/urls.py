@@ -5,9 +5,12 @@ from .views import (
     BarberPortfolioView,
     BarberServiceViewSet,
     BarberSlotViewSet,
+    WorkingHoursViewSet,
+    ScheduleExceptionViewSet,
     BarberAppointments,
     CompletedAppointments,
     BarberWalletView,
+    BarberWalletTransactionsView,
     BarberDashboardView,
     get_barber_categories,
     ServiceRequestListCreateView,
@@ -20,6 +23,8 @@ router = DefaultRouter()
 router.register(r'barber-services', BarberServiceViewSet,
                 basename='barber-services')
 router.register(r'barber-slots', BarberSlotViewSet, basename='barber-slots')
+router.register(r'working-hours', WorkingHoursViewSet, basename='working-hours')
+router.register(r'schedule-exceptions', ScheduleExceptionViewSet, basename='schedule-exceptions')
 
 urlpatterns = [
     path('barber-dash/', BarberDashboard.as_view(), name='barber-dash'),
@@ -30,6 +35,7 @@ urlpatterns = [
     path('completed-barber-appointments/',
          CompletedAppointments.as_view(), name='CompletedAppointments'),
     path('barber/wallet/', BarberWalletView.as_view(), name='barber-wallet'),
+    path('barber/wallet/transactions/', BarberWalletTransactionsView.as_view(), name='barber-wallet-transactions'),
     path('dashboard/barber/', BarberDashboardView.as_view(),
          name='barber-dashboard'),
 
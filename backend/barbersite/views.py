@@ -1,21 +1,26 @@
 from adminsite.models import CategoryModel, ServiceModel, ServiceRequestModel
-from django.db.models import Sum
-from django.utils.timezone import now
 from datetime import timedelta
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework import generics, status
 from customersite.models import Booking, Rating
 from django.db.models import Avg, Count
-from django.utils.timezone import localtime
+from django.utils.timezone import localdate, localtime
+from backend.pagination import InvalidCursor, keyset_page, parse_limit
 from adminsite.serializers import ServiceRequestSerializer
-from .serializers import BarberWalletSerializer
+from .serializers import BarberWalletSerializer, WalletTransactionSerializer
 from .models import BarberWallet
 from rest_framework import status
 import logging
 from django.db.models import ProtectedError
 from django.db import transaction
-from .serializers import BarberSlotSerializer
-from .models import BarberSlot
+from .serializers import (
+    BarberSlotSerializer, BulkSlotCreateSerializer, BulkSlotRangeSerializer, ScheduleExceptionSerializer,
+    WorkingHoursSerializer,
+)
+from authservice.models import User
+from .models import BarberSlot, ScheduleException, WorkingHours
+from customersite import availability
+from django.conf import settings
 from .models import BarberService
 from rest_framework.decorators import action
 from rest_framework import viewsets, status
@@ -26,6 +31,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from .serializers import PortfolioSerializer, BarberServiceSerializer
 from .models import Portfolio
+from instantbooking.geo import refresh_barber_geo_index
 
 logger = logging.getLogger(__name__)
 
@@ -68,6 +74,7 @@ class BarberPortfolioView(APIView):
             portfolio, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
+            refresh_barber_geo_index(request.user)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -162,6 +169,7 @@ class BarberServiceViewSet(viewsets.ModelViewSet):
 
 class BarberSlotViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
+    MAX_REPORTED_CONFLICTS = 50
 
     def list(self, request):
         date_filter = request.query_params.get('date')
@@ -196,23 +204,26 @@ class BarberSlotViewSet(viewsets.ViewSet):
         if end_time in ["24:00", "24:00:00", "00:00", "00:00:00"]:
             end_time = "23:59:59"
 
-        if BarberSlot.objects.filter(
-            barber=request.user,
-            date=date,
-            start_time=start_time,
-            end_time=end_time
-        ).exists():
-            return Response({
-                'error': f'Slot already exists for {date} at {start_time}-{end_time}'
-            }, status=status.HTTP_400_BAD_REQUEST)
-
         try:
-            slot = BarberSlot.objects.create(
-                barber=request.user,
-                date=date,
-                start_time=start_time,
-                end_time=end_time
-            )
+            with transaction.atomic():
+                User.objects.select_for_update().filter(id=request.user.id).values_list('id', flat=True).first()
+                if BarberSlot.objects.filter(
+                    barber=request.user,
+                    date=date,
+                    start_time=start_time,
+                    end_time=end_time
+                ).exists():
+                    return Response({
+                        'error': f'Slot already exists for {date} at {start_time}-{end_time}'
+                    }, status=status.HTTP_400_BAD_REQUEST)
+
+                slot = BarberSlot.objects.create(
+                    barber=request.user,
+                    date=date,
+                    start_time=start_time,
+                    end_time=end_time
+                )
+            availability.invalidate([request.user.id], [BarberSlot._meta.get_field('date').to_python(date)])
             serializer = BarberSlotSerializer(slot)
             return Response({
                 'message': f'Slot created successfully for {date}',
@@ -245,6 +256,7 @@ class BarberSlotViewSet(viewsets.ViewSet):
 
             with transaction.atomic():
                 slot.delete()
+            availability.invalidate([request.user.id], [slot.date])
 
             return Response({
                 'message': f'Slot cancelled successfully for {slot_info}.'
@@ -262,6 +274,74 @@ class BarberSlotViewSet(viewsets.ViewSet):
                 'error': f'An error occurred while cancelling the slot: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(detail=False, methods=['post'], url_path='bulk-create')
+    def bulk_create_slots(self, request):
+        """Create the given slot times on every (matching weekday) date of a
+        range in one transaction. Exact duplicates are skipped and times
+        overlapping an existing slot are reported as conflicts."""
+        serializer = BulkSlotCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        with transaction.atomic():
+            # Slot writers for a barber take this lock, so nothing can insert
+            # between the read below and the insert.
+            User.objects.select_for_update().filter(id=request.user.id).values_list('id', flat=True).first()
+            existing = {}
+            for date, start, end in BarberSlot.objects.filter(
+                barber=request.user, date__range=[data['start_date'], data['end_date']]
+            ).values_list('date', 'start_time', 'end_time'):
+                existing.setdefault(date, set()).add((start, end))
+
+            new_slots, skipped, conflicts = [], 0, []
+            for date in BulkSlotCreateSerializer.dates(data):
+                taken = existing.get(date, set())
+                for start, end in data['times']:
+                    if (start, end) in taken:
+                        skipped += 1
+                    elif any(start < taken_end and taken_start < end for taken_start, taken_end in taken):
+                        conflicts.append({'date': date, 'start_time': start, 'end_time': end})
+                    else:
+                        new_slots.append(BarberSlot(barber=request.user, date=date, start_time=start, end_time=end))
+
+            created = len(BarberSlot.objects.bulk_create(new_slots, batch_size=500))
+
+        if created:
+            availability.invalidate([request.user.id], {slot.date for slot in new_slots})
+        return Response({
+            'message': f'{created} slots created',
+            'created': created,
+            'skipped': skipped,
+            'conflicting': len(conflicts),
+            'conflicts': conflicts[:self.MAX_REPORTED_CONFLICTS],
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], url_path='bulk-cancel')
+    def bulk_cancel_slots(self, request):
+        """Delete every unbooked slot in a date range with one set-based
+        delete. Slots with a booking are kept and counted."""
+        serializer = BulkSlotRangeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        slots = BarberSlot.objects.filter(barber=request.user, date__range=[data['start_date'], data['end_date']])
+        if data.get('weekdays'):
+            slots = slots.filter(date__iso_week_day__in=[weekday + 1 for weekday in data['weekdays']])
+
+        with transaction.atomic():
+            cancellable = slots.filter(is_booked=False, booking__isnull=True, barberslotbooking__isnull=True)
+            dates = set(cancellable.values_list('date', flat=True))
+            _, deleted = BarberSlot.objects.filter(id__in=cancellable.values('id')).delete()
+            cancelled = deleted.get(BarberSlot._meta.label, 0)
+            kept = slots.count()
+        availability.invalidate([request.user.id], dates)
+
+        return Response({
+            'message': f'{cancelled} slots cancelled',
+            'cancelled': cancelled,
+            'kept_booked': kept,
+        }, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=['get'], url_path='by-date-range')
     def get_slots_by_date_range(self, request):
         start_date = request.query_params.get('start_date')
@@ -281,6 +361,60 @@ class BarberSlotViewSet(viewsets.ViewSet):
         return Response(serializer.data)
 
 
+class WorkingHoursViewSet(viewsets.ModelViewSet):
+    """The barber's weekly working hours. Customers are offered start times
+    computed from these instead of ``BarberSlot`` rows."""
+    permission_classes = [IsAuthenticated]
+    serializer_class = WorkingHoursSerializer
+
+    def get_queryset(self):
+        return WorkingHours.objects.filter(barber=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(barber=self.request.user)
+        self.invalidate_horizon()
+
+    def perform_update(self, serializer):
+        serializer.save()
+        self.invalidate_horizon()
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        self.invalidate_horizon()
+
+    def invalidate_horizon(self):
+        today = localdate()
+        availability.invalidate(
+            [self.request.user.id],
+            [today + timedelta(days=offset) for offset in range(settings.AVAILABILITY_HORIZON_DAYS + 1)]
+        )
+
+
+class ScheduleExceptionViewSet(viewsets.ModelViewSet):
+    """Days off and one-off hours that replace the weekly working hours."""
+    permission_classes = [IsAuthenticated]
+    serializer_class = ScheduleExceptionSerializer
+
+    def get_queryset(self):
+        exceptions = ScheduleException.objects.filter(barber=self.request.user)
+        if self.action == 'list':
+            exceptions = exceptions.filter(date__gte=localdate())
+        return exceptions
+
+    def perform_create(self, serializer):
+        exception = serializer.save(barber=self.request.user)
+        availability.invalidate([self.request.user.id], [exception.date])
+
+    def perform_update(self, serializer):
+        old_date = serializer.instance.date
+        exception = serializer.save()
+        availability.invalidate([self.request.user.id], {old_date, exception.date})
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        availability.invalidate([self.request.user.id], [instance.date])
+
+
 class BarberAppointments(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -368,18 +502,22 @@ class BarberWalletView(APIView):
 
         wallet, _ = BarberWallet.objects.get_or_create(barber=request.user)
 
-        today = now().date()
+        today = localdate()
         start_of_week = today - timedelta(days=today.weekday())
         start_of_month = today.replace(day=1)
 
-        transactions = wallet.transactions.all()
+        daily_totals = wallet.daily_totals.filter(
+            date__gte=min(start_of_week, start_of_month), date__lte=today
+        ).values_list('date', 'total')
 
-        day_total = transactions.filter(created_at__date=today).aggregate(
-            total=Sum('amount'))['total'] or 0
-        week_total = transactions.filter(created_at__date__gte=start_of_week).aggregate(
-            total=Sum('amount'))['total'] or 0
-        month_total = transactions.filter(created_at__date__gte=start_of_month).aggregate(
-            total=Sum('amount'))['total'] or 0
+        day_total = week_total = month_total = 0
+        for date, total in daily_totals:
+            if date == today:
+                day_total += total
+            if date >= start_of_week:
+                week_total += total
+            if date >= start_of_month:
+                month_total += total
 
         serializer = BarberWalletSerializer(wallet)
         data = serializer.data
@@ -392,6 +530,29 @@ class BarberWalletView(APIView):
         return Response(data)
 
 
+class BarberWalletTransactionsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not hasattr(request.user, 'user_type') or request.user.user_type != 'barber':
+            return Response({'detail': 'Access denied'}, status=403)
+
+        wallet, _ = BarberWallet.objects.get_or_create(barber=request.user)
+
+        try:
+            limit = parse_limit(request.query_params.get('limit'))
+            transactions, next_cursor = keyset_page(
+                wallet.transactions.all(), request.query_params.get('cursor'), limit
+            )
+        except InvalidCursor as e:
+            return Response({'detail': str(e)}, status=400)
+
+        return Response({
+            'results': WalletTransactionSerializer(transactions, many=True).data,
+            'next_cursor': next_cursor,
+        })
+
+
 class BarberDashboardView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -10,6 +10,9 @@ python manage.py collectstatic --no-input
 # 3. Apply database migrations
 python manage.py migrate
 
+# Index barbers for located dispatch (idempotent; picks up barbers saved before the index existed)
+python manage.py build_barber_geo_index
+
 # 4. Create Superuser (Automatically uses Env Vars)
 
 python manage.py createsuperuser --no-input || true
\ No newline at end of file
@@ -12,6 +12,7 @@ from django.conf import settings
 import asyncio
 import time
 from django.db import models
+from instantbooking import offers, presence
 User = get_user_model()
 
 ONLINE_USERS = {}
@@ -431,6 +432,12 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                     
                     await self.accept()
                     print(f"Notification Socket: User {user_id} ({self.user.user_type}) joined {self.group_name} & {self.booking_group_name}")
+
+                    if self.user.user_type == 'barber':
+                        if self.user.is_online:
+                            await database_sync_to_async(presence.heartbeat)(self.user.id)
+                        self.presence_task = asyncio.create_task(self.presence_heartbeat())
+                        await self.replay_pending_offers()
                     return
                         
             except Exception as e:
@@ -439,11 +446,28 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         await self.close(code=4001)
 
     async def disconnect(self, close_code):
+        if hasattr(self, 'presence_task'):
+            self.presence_task.cancel()
         if hasattr(self, 'group_name'):
             await self.channel_layer.group_discard(self.group_name, self.channel_name)
         if hasattr(self, 'booking_group_name'):
             await self.channel_layer.group_discard(self.booking_group_name, self.channel_name)
 
+    async def replay_pending_offers(self):
+        events = await database_sync_to_async(offers.pending_offer_events)(self.user.id)
+        for event in events:
+            await self.new_booking_request(event)
+
+    async def presence_heartbeat(self):
+        try:
+            while True:
+                await asyncio.sleep(presence.HEARTBEAT_INTERVAL_SECONDS)
+                await database_sync_to_async(presence.refresh)(self.user.id)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"Presence heartbeat error for barber {self.user.id}: {e}")
+
     async def notification_update(self, event):
         await self.send(text_data=json.dumps(event))
 
@@ -457,6 +481,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             "address": event["address"],
             "total_amount": event["total_amount"],
             "barber_image": event.get("barber_image"),
+            "distance_km": event.get("distance_km"),
         }))
 
     async def service_request(self, event):
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import threading
+import time
+from channels.layers import get_channel_layer
+from backend import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationPublisher:
+    """Sends channel-layer events from sync code through one long-lived event loop.
+
+    Views hand over a batch of ``(group, event)`` pairs. The batch is sent
+    concurrently on the publisher's loop, which keeps the channel layer's
+    Redis connection pool alive between requests.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _get_loop(self):
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever,
+                    name="notification-publisher",
+                    daemon=True
+                ).start()
+            return self._loop
+
+    def publish(self, group, event, wait=False):
+        return self.publish_many([(group, event)], wait=wait)
+
+    def publish_many(self, messages, wait=False, timeout=5):
+        """Queue a batch of events. With ``wait=True`` block until the batch is
+        sent and return the ``{"sent": n, "failed": n}`` result."""
+        messages = list(messages)
+        if not messages:
+            return {"sent": 0, "failed": 0} if wait else None
+
+        started = time.perf_counter()
+        future = asyncio.run_coroutine_threadsafe(
+            self._send_batch(messages, started), self._get_loop()
+        )
+        metrics.observe("notifications.request_ms", (time.perf_counter() - started) * 1000)
+
+        if wait:
+            return future.result(timeout)
+        return future
+
+    def drain(self, timeout=5):
+        """Block until every batch queued so far has been sent."""
+        if self._loop is None or self._loop.is_closed():
+            return
+
+        async def wait_for_pending():
+            pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(wait_for_pending(), self._loop).result(timeout)
+
+    async def _send_batch(self, messages, queued_at):
+        metrics.observe("notifications.queue_ms", (time.perf_counter() - queued_at) * 1000)
+        channel_layer = get_channel_layer()
+
+        with metrics.timer("notifications.batch_ms"):
+            results = await asyncio.gather(
+                *(channel_layer.group_send(group, event) for group, event in messages),
+                return_exceptions=True
+            )
+
+        failed = 0
+        for (group, event), result in zip(messages, results):
+            if isinstance(result, Exception):
+                failed += 1
+                metrics.increment(f"notifications.failed.{event.get('type')}")
+                logger.error(f"Socket Error for {group} ({event.get('type')}): {str(result)}")
+
+        sent = len(messages) - failed
+        metrics.increment("notifications.sent", sent)
+        metrics.increment("notifications.failed", failed)
+        return {"sent": sent, "failed": failed}
+
+
+publisher = NotificationPublisher()
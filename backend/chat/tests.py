@@ -0,0 +1,137 @@
+import threading
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+from backend import metrics
+from backend.metrics import Histogram
+from backend.testing import IN_MEMORY_CHANNEL_LAYERS, DispatchTestMixin
+from .models import ChatMessage
+from .publisher import publisher
+from .views import ChatMessagesView
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class PublisherTests(DispatchTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+        self.layer = get_channel_layer()
+        [self.barber] = self.create_barbers(1)
+        self.booking = self.create_booking(barber=self.barber, status="CONFIRMED")
+
+    def listen(self, group):
+        channel = async_to_sync(self.layer.new_channel)()
+        async_to_sync(self.layer.group_add)(group, channel)
+        return channel
+
+    def receive(self, channel):
+        return async_to_sync(self.layer.receive)(channel)
+
+    def test_message_from_sync_view_notifies_the_other_user(self):
+        channel = self.listen(f"notifications_{self.barber.id}")
+        request = APIRequestFactory().post("/", {"message": "On my way?"}, format="json")
+        force_authenticate(request, user=self.customer)
+
+        response = ChatMessagesView.as_view()(request, booking_id=self.booking.id)
+        publisher.drain()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(ChatMessage.objects.get().message, "On my way?")
+        self.assertEqual(self.receive(channel), {
+            "type": "notification_update",
+            "update_type": "message_received",
+            "booking_id": str(self.booking.id),
+        })
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["counters"]["notifications.sent"], 1)
+        self.assertEqual(snapshot["counters"]["notifications.failed"], 0)
+        for name in ("notifications.request_ms", "notifications.queue_ms", "notifications.batch_ms"):
+            self.assertEqual(snapshot["histograms"][name]["count"], 1)
+
+    def test_batch_is_sent_together_and_failures_are_counted(self):
+        channels = [self.listen(f"notifications_{i}") for i in (1, 2)]
+
+        result = publisher.publish_many([
+            ("notifications_1", {"type": "notification_update", "update_type": "first"}),
+            ("not a valid group!", {"type": "booking_cancelled"}),
+            ("notifications_2", {"type": "notification_update", "update_type": "second"}),
+        ], wait=True)
+
+        self.assertEqual(result, {"sent": 2, "failed": 1})
+        self.assertEqual([self.receive(channel)["update_type"] for channel in channels], ["first", "second"])
+        counters = metrics.snapshot()["counters"]
+        self.assertEqual(counters["notifications.failed"], 1)
+        self.assertEqual(counters["notifications.failed.booking_cancelled"], 1)
+        # One batch, however many events it carries.
+        self.assertEqual(metrics.snapshot()["histograms"]["notifications.batch_ms"]["count"], 1)
+
+    def test_drain_waits_for_every_queued_batch_on_one_loop(self):
+        channel = self.listen("notifications_1")
+
+        futures = [
+            publisher.publish("notifications_1", {"type": "notification_update", "update_type": str(i)})
+            for i in range(5)
+        ]
+        publisher.drain()
+
+        self.assertTrue(all(future.done() for future in futures))
+        self.assertEqual(sorted(self.receive(channel)["update_type"] for _ in futures), ["0", "1", "2", "3", "4"])
+        self.assertEqual(metrics.snapshot()["counters"]["notifications.sent"], 5)
+        loops = [thread for thread in threading.enumerate() if thread.name == "notification-publisher"]
+        self.assertEqual(len(loops), 1)
+
+    def test_empty_batch_sends_nothing(self):
+        self.assertEqual(publisher.publish_many([], wait=True), {"sent": 0, "failed": 0})
+        self.assertEqual(metrics.snapshot()["counters"], {})
+
+
+class MetricsTests(SimpleTestCase):
+
+    def setUp(self):
+        metrics.reset()
+
+    def test_histogram_quantiles_come_from_buckets(self):
+        histogram = Histogram()
+        for value in range(1, 101):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.quantile(0.5), 50)
+        self.assertEqual(histogram.quantile(0.99), 100)
+        self.assertEqual(histogram.snapshot(), {
+            "count": 100, "avg_ms": 50.5, "p50_ms": 50, "p99_ms": 100, "max_ms": 100,
+        })
+
+    def test_histogram_quantile_is_capped_at_the_max(self):
+        histogram = Histogram()
+        self.assertEqual(histogram.quantile(0.5), 0.0)
+
+        histogram.observe(3)
+        self.assertEqual(histogram.quantile(0.5), 3)
+
+        histogram.observe(20000)
+        self.assertEqual(histogram.quantile(0.5), 5)
+        self.assertEqual(histogram.quantile(1), 20000)
+
+    def test_counters_are_safe_across_threads(self):
+        def bump():
+            for _ in range(1000):
+                metrics.increment("test.hits")
+
+        threads = [threading.Thread(target=bump) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(metrics.snapshot()["counters"]["test.hits"], 8000)
+
+    def test_timer_records_failed_blocks_too(self):
+        with self.assertRaises(ValueError):
+            with metrics.timer("test.block_ms"):
+                raise ValueError
+
+        self.assertEqual(metrics.snapshot()["histograms"]["test.block_ms"]["count"], 1)
+        metrics.reset()
+        self.assertEqual(metrics.snapshot(), {"counters": {}, "histograms": {}})
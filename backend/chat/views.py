@@ -8,8 +8,7 @@ from .models import ChatMessage
 from .serializers import ChatMessageSerializer
 from rest_framework.views import APIView
 from django.db.models import Q
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from .publisher import publisher
 
 
 
@@ -100,10 +99,9 @@ class ChatMessagesView(APIView):
 
         
 
-        channel_layer = get_channel_layer()
         other_user = booking.barber if request.user == booking.customer else booking.customer
         
-        async_to_sync(channel_layer.group_send)(
+        publisher.publish(
             f'notifications_{other_user.id}',
             {
                 'type': 'notification_update',
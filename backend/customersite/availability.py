@@ -0,0 +1,467 @@
+import logging
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import BooleanField, Q, Value
+from django.utils import timezone
+from authservice.models import User
+from barbersite.models import BarberSlot, ScheduleException, WorkingHours
+from .models import BarberDayAvailability, Booking
+
+logger = logging.getLogger(__name__)
+
+# Scheduled slots must keep this gap around an instant booking.
+BOOKING_BUFFER = timedelta(minutes=15)
+# Slots starting sooner than this from now are not offered for today.
+BOOKING_LEAD_TIME = timedelta(minutes=30)
+# Instant bookings older than this no longer block slots.
+INSTANT_BOOKING_WINDOW = timedelta(hours=12)
+BUSY_STATUSES = ["PENDING", "CONFIRMED"]
+# Length of computed slots when the request does not name a service.
+DEFAULT_SLOT_MINUTES = 30
+# Computed slots are identified by their start, e.g. "2025-03-01T10:30".
+SLOT_REF_FORMAT = "%Y-%m-%dT%H:%M"
+
+
+class SlotUnavailable(ValueError):
+    pass
+
+
+def merge_intervals(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def sweep_free(slots, busy, bounds):
+    """The items of ``slots`` (sorted by start) whose ``bounds(slot)`` window
+    overlaps none of the merged, sorted ``busy`` intervals.
+
+    Slot starts only move forward, so the busy pointer does too: the whole
+    pass is O(slots + busy) instead of comparing every slot with every
+    booking.
+    """
+    free = []
+    j = 0
+    for slot in slots:
+        start, end = bounds(slot)
+        while j < len(busy) and busy[j][1] <= start:
+            j += 1
+        if j == len(busy) or busy[j][0] >= end:
+            free.append(slot)
+    return free
+
+
+def _local(date, at):
+    return timezone.make_aware(datetime.combine(date, at), timezone.get_current_timezone())
+
+
+def busy_by_barber(barber_ids, day_start, day_end, now):
+    """``{barber_id: intervals}`` with the merged, sorted ``(start, end)``
+    intervals in which each of ``barber_ids`` is busy during
+    ``[day_start, day_end)``. Recent instant bookings are widened by
+    ``BOOKING_BUFFER``; scheduled bookings block their own time. One query;
+    the service duration comes in the same row."""
+    rows = Booking.objects.filter(barber_id__in=barber_ids, status__in=BUSY_STATUSES).filter(
+        Q(booking_type="INSTANT_BOOKING", created_at__gte=now - INSTANT_BOOKING_WINDOW)
+        | Q(booking_type="SCHEDULE_BOOKING", service_started_at__gte=day_start - timedelta(days=1),
+            service_started_at__lt=day_end)
+    ).order_by().values_list(
+        'barber_id', 'booking_type', 'service_started_at', 'created_at', 'service__duration_minutes'
+    )
+
+    intervals = {}
+    for barber_id, booking_type, started_at, created_at, duration_minutes in rows:
+        buffer = BOOKING_BUFFER if booking_type == "INSTANT_BOOKING" else timedelta(0)
+        start = (started_at or created_at) - buffer
+        end = (started_at or created_at) + timedelta(minutes=duration_minutes) + buffer
+        if start < day_end and end > day_start:
+            intervals.setdefault(barber_id, []).append((start, end))
+    return {barber_id: merge_intervals(busy) for barber_id, busy in intervals.items()}
+
+
+def busy_intervals(barber_id, day_start, day_end, now):
+    return busy_by_barber([barber_id], day_start, day_end, now).get(barber_id, [])
+
+
+def windows_by_barber(barber_ids, date):
+    """``{barber_id: (uses_working_hours, windows)}`` for ``barber_ids`` on
+    ``date``; barbers without a row only publish ``BarberSlot`` rows.
+
+    Exceptions for the date replace the weekly hours; a day-off exception
+    leaves no windows. One query.
+    """
+    exceptions = ScheduleException.objects.filter(barber_id__in=barber_ids, date=date).values_list(
+        'barber_id', 'start_time', 'end_time', Value(True, output_field=BooleanField())
+    ).order_by()
+    weekly = WorkingHours.objects.filter(barber_id__in=barber_ids, weekday=date.weekday()).values_list(
+        'barber_id', 'start_time', 'end_time', Value(False, output_field=BooleanField())
+    ).order_by()
+    rows_by_barber = {}
+    for barber_id, *row in exceptions.union(weekly, all=True):
+        rows_by_barber.setdefault(barber_id, []).append(row)
+
+    schedules = {}
+    for barber_id, rows in rows_by_barber.items():
+        if any(is_exception for _, _, is_exception in rows):
+            rows = [row for row in rows if row[2]]
+        schedules[barber_id] = True, sorted(
+            (_local(date, start), _local(date, end)) for start, end, _ in rows if start is not None
+        )
+    return schedules
+
+
+def working_windows(barber_id, date):
+    """``(uses_working_hours, windows)`` for ``barber_id`` on ``date``. One query."""
+    return windows_by_barber([barber_id], date).get(barber_id, (False, []))
+
+
+def _cache_key(barber_id, date):
+    return f"availability:{barber_id}:{date.isoformat()}"
+
+
+def day_schedule(barber_id, date, now=None, use_cache=True):
+    """Working windows and busy intervals of ``barber_id`` on ``date``,
+    cached per barber-day for ``AVAILABILITY_CACHE_SECONDS``. Bookings and
+    schedule edits drop the affected days through ``invalidate``."""
+    cache = caches[settings.AVAILABILITY_CACHE]
+    key = _cache_key(barber_id, date)
+    if use_cache:
+        try:
+            schedule = cache.get(key)
+        except Exception as e:
+            logger.warning(f"Availability cache unavailable: {e}")
+            use_cache, schedule = False, None
+        if schedule is not None:
+            return schedule
+
+    now = now or timezone.now()
+    day_start = _local(date, time.min)
+    uses_working_hours, windows = working_windows(barber_id, date)
+    schedule = {
+        "uses_working_hours": uses_working_hours,
+        "windows": windows,
+        "busy": busy_intervals(barber_id, day_start, day_start + timedelta(days=1), now),
+    }
+    if use_cache:
+        try:
+            cache.set(key, schedule, timeout=settings.AVAILABILITY_CACHE_SECONDS)
+        except Exception as e:
+            logger.warning(f"Availability cache unavailable: {e}")
+    return schedule
+
+
+def invalidate(barber_ids, dates):
+    """Drop the cached schedules and free-minute bitmaps of ``barber_ids`` on
+    ``dates``."""
+    keys = [_cache_key(barber_id, date) for barber_id in barber_ids for date in dates]
+    if not keys:
+        return
+    BarberDayAvailability.objects.filter(barber_id__in=barber_ids, date__in=dates).delete()
+    try:
+        caches[settings.AVAILABILITY_CACHE].delete_many(keys)
+    except Exception as e:
+        logger.warning(f"Availability cache unavailable, {len(keys)} schedules left to expire: {e}")
+
+
+def invalidate_around(barber_ids, moments):
+    """Drop the cached days around ``moments``; the day before and after are
+    included because buffers and long services cross midnight."""
+    dates = set()
+    for moment in moments:
+        local_date = timezone.localdate(moment)
+        dates.update(local_date + timedelta(days=offset) for offset in (-1, 0, 1))
+    invalidate(barber_ids, dates)
+
+
+def slot_ref(start):
+    return timezone.localtime(start).strftime(SLOT_REF_FORMAT)
+
+
+def parse_slot_ref(value):
+    """``(date, start_time)`` for a computed slot id, or ``None``."""
+    try:
+        start = datetime.strptime(str(value), SLOT_REF_FORMAT)
+    except ValueError:
+        return None
+    return start.date(), start.time()
+
+
+def computed_slots(schedule, date, duration_minutes, now):
+    """Start times spaced ``duration_minutes`` apart within the working
+    windows that clear every busy interval and the lead time."""
+    length = timedelta(minutes=duration_minutes)
+    earliest = now + BOOKING_LEAD_TIME
+    candidates = set()
+    for window_start, window_end in schedule["windows"]:
+        start = window_start
+        while start + length <= window_end:
+            if start > earliest:
+                candidates.add((start, start + length))
+            start += length
+
+    free = sweep_free(sorted(candidates), schedule["busy"], lambda candidate: candidate)
+    return [
+        {"id": slot_ref(start), "date": date, "start_time": timezone.localtime(start).time(),
+         "end_time": timezone.localtime(end).time()}
+        for start, end in free
+    ]
+
+
+def available_slots(barber_id, date, duration_minutes=None, now=None):
+    """Bookable slots of ``barber_id`` on ``date``, ordered by start time.
+
+    Barbers with working hours get start times computed for a service of
+    ``duration_minutes``, as dicts keyed by a slot ref. Barbers who publish
+    slots get their unbooked ``BarberSlot`` rows that clear the busy
+    intervals. With the day cached that is at most one query.
+    """
+    now = now or timezone.now()
+    earliest = timezone.localtime(now + BOOKING_LEAD_TIME)
+    if earliest.date() > date:
+        return []
+
+    schedule = day_schedule(barber_id, date, now)
+    if schedule["uses_working_hours"]:
+        return computed_slots(schedule, date, duration_minutes or DEFAULT_SLOT_MINUTES, now)
+
+    slots = BarberSlot.objects.filter(barber_id=barber_id, date=date, is_booked=False)
+    if earliest.date() == date:
+        slots = slots.filter(start_time__gt=earliest.time())
+    slots = list(slots.order_by('start_time', 'end_time'))
+
+    def bounds(slot):
+        return _local(slot.date, slot.start_time), _local(slot.date, slot.end_time)
+
+    return sweep_free(slots, schedule["busy"], bounds)
+
+
+def working_dates(barber_id, start, days):
+    """Dates in ``[start, start + days)`` on which ``barber_id`` has working
+    hours left after day-off exceptions. Two queries."""
+    weekdays = set(WorkingHours.objects.filter(barber_id=barber_id).values_list('weekday', flat=True))
+    end = start + timedelta(days=days)
+    exceptions = {}
+    for date, start_time in ScheduleException.objects.filter(
+        barber_id=barber_id, date__gte=start, date__lt=end
+    ).values_list('date', 'start_time'):
+        exceptions[date] = exceptions.get(date, False) or start_time is not None
+
+    dates = []
+    for offset in range(days):
+        date = start + timedelta(days=offset)
+        works = exceptions[date] if date in exceptions else date.weekday() in weekdays
+        if works:
+            dates.append(date)
+    return dates
+
+
+def reserve_slot(barber_id, date, start_time, duration_minutes, now=None):
+    """Materialize the computed slot starting at ``start_time`` as an
+    unbooked ``BarberSlot`` for the booking to take.
+
+    Locks the barber row so concurrent reservations for the same barber run
+    one at a time, and re-checks availability without the cache. Must run
+    inside ``transaction.atomic()``. Raises ``SlotUnavailable``.
+    """
+    User.objects.select_for_update().filter(id=barber_id).values_list('id', flat=True).first()
+    now = now or timezone.now()
+    schedule = day_schedule(barber_id, date, now, use_cache=False)
+    offered = {slot["start_time"]: slot for slot in computed_slots(schedule, date, duration_minutes, now)}
+    slot = offered.get(start_time)
+    if not schedule["uses_working_hours"] or slot is None:
+        raise SlotUnavailable("This time is no longer available. Please pick another slot.")
+    reserved, created = BarberSlot.objects.get_or_create(
+        barber_id=barber_id, date=date, start_time=slot["start_time"], end_time=slot["end_time"]
+    )
+    if not created and reserved.is_booked and not reserved.booking_set.filter(status__in=BUSY_STATUSES).exists():
+        # Left booked by a cancelled booking; the time was just re-checked free.
+        reserved.is_booked = False
+        reserved.save(update_fields=['is_booked'])
+    return reserved
+
+
+def minute_bits(start_minute, end_minute):
+    """Bitmap with the minutes ``[start_minute, end_minute)`` of a day set."""
+    start_minute, end_minute = max(start_minute, 0), min(end_minute, BarberDayAvailability.MINUTES)
+    if end_minute <= start_minute:
+        return 0
+    return ((1 << (end_minute - start_minute)) - 1) << start_minute
+
+
+def _minutes(delta, round_up):
+    seconds = int(delta.total_seconds())
+    return -(-seconds // 60) if round_up else seconds // 60
+
+
+def day_bitmap(windows, busy, day_start):
+    """Free-minute bitmap of the ``windows`` less the ``busy`` intervals.
+
+    Only whole minutes inside a window count as free, and a minute touched
+    by a busy interval does not.
+    """
+    free = 0
+    for start, end in windows:
+        free |= minute_bits(_minutes(start - day_start, True), _minutes(end - day_start, False))
+    for start, end in busy:
+        free &= ~minute_bits(_minutes(start - day_start, False), _minutes(end - day_start, True))
+    return free
+
+
+def build_bitmaps(barber_ids, date, now):
+    """``{barber_id: (free_minutes, uses_working_hours, spans)}`` on ``date``.
+
+    ``free_minutes`` is the bitmap of the working windows, or of the unbooked
+    ``BarberSlot`` rows for barbers without working hours, less the busy
+    intervals. ``spans`` are the minute ranges bookings start from: the
+    windows, or the slots clear of every busy interval. Three queries for
+    any number of barbers.
+    """
+    day_start = _local(date, time.min)
+    schedules = windows_by_barber(barber_ids, date)
+    windows = {barber_id: schedule[1] for barber_id, schedule in schedules.items()}
+    slot_barbers = [barber_id for barber_id in barber_ids if barber_id not in schedules]
+    if slot_barbers:
+        for barber_id, start, end in BarberSlot.objects.filter(
+            barber_id__in=slot_barbers, date=date, is_booked=False
+        ).order_by('start_time', 'end_time').values_list('barber_id', 'start_time', 'end_time'):
+            windows.setdefault(barber_id, []).append((_local(date, start), _local(date, end)))
+
+    busy = busy_by_barber(barber_ids, day_start, day_start + timedelta(days=1), now)
+    days = {}
+    for barber_id in barber_ids:
+        barber_windows, barber_busy = windows.get(barber_id, []), busy.get(barber_id, [])
+        uses_working_hours = barber_id in schedules
+        spans = barber_windows if uses_working_hours else sweep_free(barber_windows, barber_busy, lambda slot: slot)
+        days[barber_id] = (
+            day_bitmap(barber_windows, barber_busy, day_start),
+            uses_working_hours,
+            [[_minutes(start - day_start, True), _minutes(end - day_start, False)] for start, end in spans],
+        )
+    return days
+
+
+def free_bitmaps(barber_ids, date, now=None):
+    """``{barber_id: (free_minutes, uses_working_hours, spans)}`` as stored
+    for each of ``barber_ids`` on ``date``, ``free_minutes`` as bytes.
+
+    Rows older than ``AVAILABILITY_CACHE_SECONDS`` or dropped by
+    ``invalidate`` are rebuilt together and written back with one upsert, so
+    a search costs the same few queries however many barbers it covers.
+    """
+    now = now or timezone.now()
+    days = {
+        barber_id: (bytes(free_minutes), uses_working_hours, spans)
+        for barber_id, free_minutes, uses_working_hours, spans in BarberDayAvailability.objects.filter(
+            barber_id__in=barber_ids, date=date,
+            computed_at__gte=now - timedelta(seconds=settings.AVAILABILITY_CACHE_SECONDS)
+        ).values_list('barber_id', 'free_minutes', 'uses_working_hours', 'spans')
+    }
+    missing = [barber_id for barber_id in barber_ids if barber_id not in days]
+    if not missing:
+        return days
+
+    size = BarberDayAvailability.MINUTES // 8
+    rows = [
+        BarberDayAvailability(
+            barber_id=barber_id, date=date, free_minutes=free.to_bytes(size, "little"),
+            uses_working_hours=uses_working_hours, spans=spans, computed_at=now
+        )
+        for barber_id, (free, uses_working_hours, spans) in build_bitmaps(missing, date, now).items()
+    ]
+    BarberDayAvailability.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['barber', 'date'],
+        update_fields=['free_minutes', 'uses_working_hours', 'spans', 'computed_at']
+    )
+    days.update((row.barber_id, (row.free_minutes, row.uses_working_hours, row.spans)) for row in rows)
+    return days
+
+
+def start_bits(uses_working_hours, spans, duration_minutes):
+    """Bitmap of the minutes a booking of ``duration_minutes`` may start at:
+    every ``duration_minutes`` from the start of each working window, as in
+    ``computed_slots``, or the start of each slot long enough for it."""
+    bits = 0
+    for start, end in spans:
+        if uses_working_hours:
+            for minute in range(start, end - duration_minutes + 1, duration_minutes):
+                bits |= 1 << minute
+        elif end - start >= duration_minutes:
+            bits |= 1 << start
+    return bits
+
+
+def free_window_starts(bitmaps, duration_minutes, first_minute, last_minute, allowed_starts=None):
+    """``{barber_id: minute}`` with the earliest start in
+    ``[first_minute, last_minute]`` of ``duration_minutes`` free minutes in
+    a row, for the barbers of ``bitmaps`` that have one. With
+    ``allowed_starts``, a ``{barber_id: bitmap}`` as from ``start_bits``,
+    only those minutes count as starts.
+
+    The bitmaps are laid end to end in one integer, each padded with zero
+    bits past midnight, and reduced together: after ``free &= free >> step``
+    for doubling steps, bit ``m`` is set only when minutes
+    ``m .. m + duration_minutes - 1`` are all free. The padding keeps one
+    barber's minutes from running into the next one's.
+    """
+    if not bitmaps or duration_minutes < 1:
+        return {}
+    barber_ids = list(bitmaps)
+    lane = -(-(BarberDayAvailability.MINUTES + duration_minutes) // 8)
+    free = int.from_bytes(b"".join(bitmaps[barber_id].ljust(lane, b"\0") for barber_id in barber_ids), "little")
+
+    length = 1
+    while length < duration_minutes:
+        step = min(length, duration_minutes - length)
+        free &= free >> step
+        length += step
+
+    starts = minute_bits(first_minute, min(last_minute, BarberDayAvailability.MINUTES - duration_minutes) + 1)
+    if allowed_starts is None:
+        lanes = starts.to_bytes(lane, "little") * len(barber_ids)
+    else:
+        lanes = b"".join((allowed_starts.get(barber_id, 0) & starts).to_bytes(lane, "little") for barber_id in barber_ids)
+    free &= int.from_bytes(lanes, "little")
+
+    lanes = free.to_bytes(lane * len(barber_ids), "little")
+    earliest = {}
+    for index, barber_id in enumerate(barber_ids):
+        found = int.from_bytes(lanes[index * lane:(index + 1) * lane], "little")
+        if found:
+            earliest[barber_id] = (found & -found).bit_length() - 1
+    return earliest
+
+
+def free_barbers(barber_ids, date, duration_minutes, window_start, window_end, now=None):
+    """``{barber_id: start_time}`` for the barbers of ``barber_ids`` free for
+    ``duration_minutes`` from some time between ``window_start`` and
+    ``window_end`` on ``date``, with the earliest such time.
+
+    Only times ``available_slots`` would offer count: the working-hours
+    grid for the service length, or the start of a slot long enough for it,
+    outside the lead time. The result says a barber is free, not which slot
+    to book; that comes from ``available_slots``, which re-checks the
+    barber's day.
+    """
+    now = now or timezone.now()
+    earliest = timezone.localtime(now + BOOKING_LEAD_TIME)
+    if earliest.date() > date:
+        return {}
+    first_minute = window_start.hour * 60 + window_start.minute
+    if earliest.date() == date:
+        first_minute = max(first_minute, earliest.hour * 60 + earliest.minute + 1)
+
+    days = free_bitmaps(barber_ids, date, now)
+    starts = free_window_starts(
+        {barber_id: free for barber_id, (free, _, _) in days.items()}, duration_minutes,
+        first_minute, window_end.hour * 60 + window_end.minute,
+        {
+            barber_id: start_bits(uses_working_hours, spans, duration_minutes)
+            for barber_id, (_, uses_working_hours, spans) in days.items()
+        }
+    )
+    return {barber_id: time(minute // 60, minute % 60) for barber_id, minute in starts.items()}
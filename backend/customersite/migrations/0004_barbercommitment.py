@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+ACTIVE_INSTANT_STATUSES = ["PENDING", "CONFIRMED", "STARTED", "ARRIVED", "ON_THE_WAY"]
+
+
+def backfill_commitments(apps, schema_editor):
+    Booking = apps.get_model('customersite', 'Booking')
+    BarberCommitment = apps.get_model('customersite', 'BarberCommitment')
+    now = timezone.now()
+
+    barber_ids = Booking.objects.filter(barber__isnull=False).values_list('barber_id', flat=True).distinct()
+    for barber_id in barber_ids:
+        bookings = Booking.objects.filter(barber_id=barber_id)
+        active_instant_id = (
+            bookings.filter(booking_type="INSTANT_BOOKING", status__in=ACTIVE_INSTANT_STATUSES)
+            .order_by('created_at')
+            .values_list('id', flat=True)
+            .first()
+        )
+        next_scheduled = (
+            bookings.filter(booking_type="SCHEDULE_BOOKING", status="CONFIRMED", service_started_at__gte=now)
+            .order_by('service_started_at')
+            .values_list('id', 'service_started_at')
+            .first()
+        ) or (None, None)
+
+        BarberCommitment.objects.create(
+            barber_id=barber_id,
+            active_instant_booking_id=active_instant_id,
+            next_scheduled_booking_id=next_scheduled[0],
+            next_scheduled_at=next_scheduled[1],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authservice', '0001_initial'),
+        ('customersite', '0003_customerwallettransaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BarberCommitment',
+            fields=[
+                ('barber', models.OneToOneField(limit_choices_to={'user_type': 'barber'}, on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='commitment', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('next_scheduled_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('active_instant_booking', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='customersite.booking')),
+                ('next_scheduled_booking', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='customersite.booking')),
+            ],
+        ),
+        migrations.RunPython(backfill_commitments, migrations.RunPython.noop),
+    ]
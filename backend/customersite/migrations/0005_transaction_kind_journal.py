@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:56
+
+from django.db import migrations, models
+
+
+# Existing rows only carry a free-text note; infer their kind from it.
+NOTE_KINDS = [
+    ("added to your wallet", "TOPUP"),
+    ("Refund", "REFUND"),
+    ("Fine", "FINE"),
+    ("Paid for", "PAYMENT"),
+]
+
+
+def backfill_kinds(apps, schema_editor):
+    CustomerWalletTransaction = apps.get_model('customersite', 'CustomerWalletTransaction')
+    for note, kind in NOTE_KINDS:
+        CustomerWalletTransaction.objects.filter(kind="ADJUSTMENT", note__icontains=note).update(kind=kind)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customersite', '0004_barbercommitment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customerwallettransaction',
+            name='journal_id',
+            field=models.UUIDField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='customerwallettransaction',
+            name='kind',
+            field=models.CharField(choices=[('TOPUP', 'Wallet top-up'), ('PAYMENT', 'Booking payment'), ('REFUND', 'Refund'), ('FINE', 'Cancellation fine'), ('PLATFORM_FEE', 'Platform fee'), ('PAYOUT', 'Barber payout'), ('ADJUSTMENT', 'Adjustment')], default='ADJUSTMENT', max_length=20),
+        ),
+        migrations.RunPython(backfill_kinds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customersite', '0005_transaction_kind_journal'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customerwallettransaction',
+            index=models.Index(fields=['wallet', 'created_at', 'id'], name='customersit_wallet__67fe45_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customersite', '0006_wallet_transaction_history_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentmodel',
+            name='checkout_session_id',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customersite', '0007_paymentmodel_checkout_session_id'),
+        ('paymentservice', '0002_settlementbatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentmodel',
+            name='releasable_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='paymentmodel',
+            name='settlement_batch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payments', to='paymentservice.settlementbatch'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentmodel',
+            index=models.Index(fields=['is_released_to_barber', 'releasable_at'], name='customersit_is_rele_f9ca91_idx'),
+        ),
+    ]
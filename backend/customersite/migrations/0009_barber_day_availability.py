@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:21
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customersite', '0008_paymentmodel_releasable_at_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BarberDayAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('free_minutes', models.BinaryField(max_length=180)),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('barber', models.ForeignKey(limit_choices_to={'user_type': 'barber'}, on_delete=django.db.models.deletion.CASCADE, related_name='day_availability', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('barber', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:40
+
+from django.db import migrations, models
+
+
+def drop_stored_days(apps, schema_editor):
+    # Rows built before spans were stored would offer no start times; they
+    # are rebuilt on the next search.
+    apps.get_model('customersite', 'BarberDayAvailability').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customersite', '0009_barber_day_availability'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='barberdayavailability',
+            name='spans',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='barberdayavailability',
+            name='uses_working_hours',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(drop_stored_days, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,7 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from authservice.models import User
+from paymentservice.kinds import ADJUSTMENT, ENTRY_KINDS
 from adminsite.models import ServiceModel , Coupon
 from profileservice.models import Address
 from django.conf import settings
@@ -58,14 +60,149 @@ class Booking(models.Model):
     completed_at = models.DateTimeField(null=True, blank=True)
     service_started_at = models.DateTimeField(null=True, blank=True)
 
+    _loaded_barber_id = None
+    _loaded_started_at = None
+
     class Meta:
         ordering = ['-created_at']
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_barber_id = instance.__dict__.get('barber_id')
+        instance._loaded_started_at = instance.__dict__.get('service_started_at')
+        return instance
+
+    def save(self, *args, **kwargs):
+        from .availability import invalidate_around
+
+        # Keep the commitments of the old and the new barber in step with this booking.
+        barber_ids = {self._loaded_barber_id, self.barber_id} - {None}
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            for barber_id in barber_ids:
+                BarberCommitment.refresh(barber_id)
+            moments = {self._loaded_started_at, self.service_started_at, self.created_at} - {None}
+            transaction.on_commit(lambda: invalidate_around(barber_ids, moments))
+        self._loaded_barber_id = self.barber_id
+        self._loaded_started_at = self.service_started_at
+
     def __str__(self):
         barber_name = self.barber.name if self.barber else "No Barber Assigned"
         return f"{self.customer.name} - {self.service.name} - {barber_name}"
 
 
+
+
+class BarberCommitment(models.Model):
+    """Denormalized per-barber view of the active instant booking and the next
+    confirmed scheduled booking, rewritten whenever one of the barber's
+    bookings is saved so availability checks never scan the booking table.
+
+    ``next_scheduled_at`` in the past means the row is stale (that booking has
+    started); readers refresh such rows before trusting them.
+    """
+    ACTIVE_INSTANT_STATUSES = ["PENDING", "CONFIRMED", "STARTED", "ARRIVED", "ON_THE_WAY"]
+
+    barber = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="commitment",
+        limit_choices_to={'user_type': 'barber'}
+    )
+    active_instant_booking = models.ForeignKey(
+        Booking, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    next_scheduled_booking = models.ForeignKey(
+        Booking, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    next_scheduled_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Commitments of barber #{self.barber_id}"
+
+    @property
+    def is_stale(self):
+        return self.next_scheduled_at is not None and self.next_scheduled_at < timezone.now()
+
+    @classmethod
+    def refresh(cls, barber_id):
+        bookings = Booking.objects.filter(barber_id=barber_id)
+        active_instant_id = (
+            bookings.filter(booking_type="INSTANT_BOOKING", status__in=cls.ACTIVE_INSTANT_STATUSES)
+            .order_by('created_at')
+            .values_list('id', flat=True)
+            .first()
+        )
+        next_scheduled = (
+            bookings.filter(
+                booking_type="SCHEDULE_BOOKING",
+                status="CONFIRMED",
+                service_started_at__gte=timezone.now()
+            )
+            .order_by('service_started_at')
+            .values_list('id', 'service_started_at')
+            .first()
+        ) or (None, None)
+
+        commitment, _ = cls.objects.update_or_create(
+            barber_id=barber_id,
+            defaults={
+                'active_instant_booking_id': active_instant_id,
+                'next_scheduled_booking_id': next_scheduled[0],
+                'next_scheduled_at': next_scheduled[1],
+            }
+        )
+        return commitment
+
+    @classmethod
+    def for_barber(cls, barber_id):
+        """Primary-key lookup of a barber's commitments, refreshed first if stale.
+
+        Barbers without a row have never been assigned a booking.
+        """
+        commitment = cls.objects.filter(barber_id=barber_id).first()
+        if commitment is None:
+            return cls(barber_id=barber_id)
+        if commitment.is_stale:
+            commitment = cls.refresh(barber_id)
+        return commitment
+
+
+class BarberDayAvailability(models.Model):
+    """A barber's free minutes on one local day, one bit per minute.
+
+    Bit ``m`` of ``free_minutes`` (read little-endian) is set when the barber
+    is free during minute ``m`` after midnight. ``spans`` are the
+    ``[start_minute, end_minute]`` ranges bookings start from: the working
+    windows, or for barbers without working hours the unbooked slots clear
+    of bookings. Rows are built by ``customersite.availability.free_bitmaps``
+    and deleted whenever the barber's slots, working hours or bookings for
+    the day change.
+    """
+    MINUTES = 24 * 60
+
+    barber = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="day_availability",
+        limit_choices_to={'user_type': 'barber'}
+    )
+    date = models.DateField()
+    free_minutes = models.BinaryField(max_length=MINUTES // 8)
+    uses_working_hours = models.BooleanField(default=False)
+    spans = models.JSONField(default=list)
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ['barber', 'date']
+
+    def __str__(self):
+        return f"{self.barber_id} availability on {self.date}"
+
+
 class PaymentModel(models.Model):
     PAYMENT_METHODS = [
         ("STRIPE", "stripe"), 
@@ -83,15 +220,28 @@ class PaymentModel(models.Model):
     payment_method = models.CharField(max_length=20, choices=PAYMENT_METHODS, default="stripe")
     payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS, default='PENDING')
     transaction_id = models.CharField(max_length=100, null=True, blank=True)
+    checkout_session_id = models.CharField(max_length=255, null=True, blank=True, db_index=True)
     discount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     final_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     service_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     platform_fee = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     is_released_to_barber = models.BooleanField(default=False)
+    # Set when the service is completed; the settlement run releases the
+    # barber's share and stamps the batch that did it.
+    releasable_at = models.DateTimeField(null=True, blank=True)
+    settlement_batch = models.ForeignKey(
+        'paymentservice.SettlementBatch', on_delete=models.SET_NULL,
+        null=True, blank=True, related_name='payments'
+    )
     released_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_released_to_barber', 'releasable_at']),
+        ]
+
     def __str__(self):
         return f"Payment for {self.booking} - {self.payment_status}"
 
@@ -122,8 +272,15 @@ class CustomerWalletTransaction(models.Model):
     wallet = models.ForeignKey(CustomerWallet, on_delete=models.CASCADE, related_name="transactions")
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     note = models.CharField(max_length=255, blank=True, null=True)
+    kind = models.CharField(max_length=20, choices=ENTRY_KINDS, default=ADJUSTMENT)
+    journal_id = models.UUIDField(null=True, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['wallet', 'created_at', 'id']),
+        ]
+
     def __str__(self):
         return f"₹{self.amount} on {self.created_at.strftime('%Y-%m-%d')} - {self.note or 'No note'}"
 
@@ -0,0 +1,130 @@
+import logging
+import uuid
+from decimal import Decimal
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from adminsite.models import Coupon
+
+logger = logging.getLogger(__name__)
+
+PLATFORM_FEE_RATE = Decimal('0.05')
+CENTS = Decimal('0.01')
+QUOTE_SALT = "customersite.pricing.quote"
+QUOTE_USED = "Price quote was already used. Please review your booking again."
+AMOUNT_FIELDS = ('service_amount', 'platform_fee', 'discount', 'total_amount')
+
+
+class PricingError(ValueError):
+    pass
+
+
+class InvalidQuote(ValueError):
+    pass
+
+
+def find_coupon(code, service, user=None):
+    """The active coupon ``code`` for ``service``; with ``user``, also check
+    that they have not used it. Raises ``PricingError``."""
+    try:
+        coupon = Coupon.objects.get(code__iexact=code.strip(), is_active=True, service=service)
+    except Coupon.DoesNotExist as e:
+        raise PricingError("Invalid or inapplicable coupon.") from e
+    if not coupon.is_valid():
+        raise PricingError("Coupon has expired.")
+    if user is not None and not coupon.can_user_use_coupon(user):
+        raise PricingError("You have used this coupon.")
+    return coupon
+
+
+def price(service, coupon=None):
+    """Amounts charged for ``service``: price, platform fee, coupon discount
+    on the fee-inclusive subtotal, and the total, all as 2dp ``Decimal``."""
+    service_amount = service.price.quantize(CENTS)
+    platform_fee = (service_amount * PLATFORM_FEE_RATE).quantize(CENTS)
+    discount = coupon.get_discount_amount(service_amount + platform_fee) if coupon else Decimal('0.00')
+    return {
+        'service_id': service.id,
+        'coupon_id': coupon.id if coupon else None,
+        'service_amount': service_amount,
+        'platform_fee': platform_fee,
+        'discount': discount,
+        'total_amount': service_amount + platform_fee - discount,
+    }
+
+
+def _cache_key(quote_id):
+    return f"pricing:quote:{quote_id}"
+
+
+def issue_quote(user, service, coupon=None):
+    """Price the booking and return ``(token, amounts)``.
+
+    ``token`` is the signed quote, valid for ``PRICING_QUOTE_TTL_SECONDS``
+    and redeemable once by ``user``; booking creation charges exactly the
+    amounts it carries.
+    """
+    amounts = price(service, coupon)
+    quote = {
+        'id': uuid.uuid4().hex,
+        'user_id': user.id,
+        **{key: str(value) if key in AMOUNT_FIELDS else value for key, value in amounts.items()},
+    }
+    try:
+        caches[settings.PRICING_QUOTE_CACHE].set(
+            _cache_key(quote['id']), quote, timeout=settings.PRICING_QUOTE_TTL_SECONDS
+        )
+    except Exception as e:
+        logger.warning(f"Quote cache unavailable, quote {quote['id']} cannot be redeemed once-only: {e}")
+    return signing.dumps(quote, salt=QUOTE_SALT, compress=True), amounts
+
+
+def verify_quote(token, user, service_id):
+    """Verify ``token`` for ``user`` booking ``service_id``.
+
+    Returns the quoted amounts in the shape of ``price`` plus the
+    ``quote_id`` to hand to ``consume_quote`` once the booking is created.
+    Raises ``InvalidQuote`` when the token is forged, expired, someone
+    else's, for another service or already used. No database query is made.
+    """
+    try:
+        quote = signing.loads(token, salt=QUOTE_SALT, max_age=settings.PRICING_QUOTE_TTL_SECONDS)
+    except signing.SignatureExpired as e:
+        raise InvalidQuote("Price quote has expired. Please review your booking again.") from e
+    except signing.BadSignature as e:
+        raise InvalidQuote("Invalid price quote.") from e
+    if quote['user_id'] != user.id:
+        raise InvalidQuote("Invalid price quote.")
+    if quote['service_id'] != service_id:
+        raise InvalidQuote("Price quote is for a different service.")
+
+    try:
+        unused = caches[settings.PRICING_QUOTE_CACHE].get(_cache_key(quote['id'])) is not None
+    except Exception as e:
+        logger.warning(f"Quote cache unavailable, accepting quote {quote['id']} on its signature: {e}")
+        unused = True
+    if not unused:
+        raise InvalidQuote(QUOTE_USED)
+
+    return {
+        'service_id': quote['service_id'],
+        'coupon_id': quote['coupon_id'],
+        'quote_id': quote['id'],
+        **{key: Decimal(quote[key]) for key in AMOUNT_FIELDS},
+    }
+
+
+def consume_quote(quote_id):
+    """Use up the quote ``quote_id``; raises ``InvalidQuote`` if it already was.
+
+    Call inside the booking transaction, after the booking is created, so a
+    request rejected on the way keeps its quote for the retry.
+    """
+    try:
+        consumed = caches[settings.PRICING_QUOTE_CACHE].delete(_cache_key(quote_id))
+    except Exception as e:
+        # The signature and max_age still bound the quote; only reuse goes unchecked.
+        logger.warning(f"Quote cache unavailable, accepting quote {quote_id} on its signature: {e}")
+        consumed = True
+    if not consumed:
+        raise InvalidQuote(QUOTE_USED)
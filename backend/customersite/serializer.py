@@ -10,7 +10,8 @@ from profileservice.models import UserProfile
 import requests
 from django.db.models import Avg
 from customersite.models import Rating
-from adminsite.models import Coupon
+from instantbooking.geo import refresh_barber_geo_index
+from . import availability, pricing
 
 class BarberSerializer(serializers.ModelSerializer):
     average_rating = serializers.SerializerMethodField()
@@ -22,9 +23,28 @@ class BarberSerializer(serializers.ModelSerializer):
     def get_average_rating(self, obj):
         avg = Rating.objects.filter(barber=obj).aggregate(avg=Avg('rating'))['avg']
         return round(avg, 1) if avg is not None else None
+
+
+class FreeBarberSerializer(BarberSerializer):
+    """A barber found by the free-window search. Expects ``average_rating``
+    annotated on the queryset and ``earliest_start`` in the context."""
+    average_rating = serializers.SerializerMethodField()
+    earliest_start = serializers.SerializerMethodField()
+
+    class Meta(BarberSerializer.Meta):
+        fields = BarberSerializer.Meta.fields + ['earliest_start']
+
+    def get_average_rating(self, obj):
+        return round(obj.average_rating, 1) if obj.average_rating is not None else None
+
+    def get_earliest_start(self, obj):
+        return self.context['earliest_start'][obj.id].strftime("%H:%M")
     
 
 class AvailableSlotSerializer(serializers.ModelSerializer):
+    # BarberSlot id, or the ref of a slot computed from working hours.
+    id = serializers.ReadOnlyField()
+
     class Meta:
         model = BarberSlot
         fields = ['id', 'date', 'start_time', 'end_time']
@@ -57,14 +77,19 @@ class AddressSerializer(serializers.ModelSerializer):
 
 
 class BookingCreateSerializer(serializers.Serializer):
+    """Validates a booking request and attaches its ``pricing``.
+
+    A computed slot comes back as ``slot_start`` (date, start time) for the
+    view to reserve. With a ``quote`` from booking-summary the quoted amounts are charged as
+    they are, without looking up the service or coupon again. Without one
+    (older clients) the price is computed here. Needs ``request`` in the
+    context.
+    """
     booking_type = serializers.ChoiceField(choices=Booking.BOOKING_TYPE_CHOICES)
-    service = serializers.PrimaryKeyRelatedField(queryset=ServiceModel.objects.all())
+    service = serializers.IntegerField()
     address = serializers.PrimaryKeyRelatedField(queryset=Address.objects.all())
-    slot = serializers.PrimaryKeyRelatedField(
-        queryset=BarberSlot.objects.all(),
-        required=False,
-        allow_null=True
-    )
+    # A BarberSlot id, or the ref of a slot computed from working hours.
+    slot = serializers.CharField(required=False, allow_null=True)
     barber = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.filter(user_type="barber"),
         required=False,
@@ -82,6 +107,7 @@ class BookingCreateSerializer(serializers.Serializer):
         allow_blank=True,
         allow_null=True
     )
+    quote = serializers.CharField(required=False, allow_blank=True)
 
     def validate(self, data):
         booking_type = data["booking_type"]
@@ -96,31 +122,35 @@ class BookingCreateSerializer(serializers.Serializer):
             data["barber"] = None
             data["slot"] = None
 
-        service = data["service"]
-        service_price = service.price
-        platform_fee = service_price * Decimal('0.05')
-        total_amount = service_price + platform_fee
-        
-      
+        if data.get("slot"):
+            slot_start = availability.parse_slot_ref(data["slot"])
+            if slot_start:
+                data["slot"], data["slot_start"] = None, slot_start
+            else:
+                slot = BarberSlot.objects.filter(id=data["slot"]).first() if data["slot"].isdigit() else None
+                if slot is None:
+                    raise serializers.ValidationError({"slot": "Slot not found"})
+                data["slot"] = slot
+
+        quote = data.pop("quote", None)
+        coupon_code = data.pop("coupon_code", None)
+        if quote:
+            try:
+                data["pricing"] = pricing.verify_quote(quote, self.context["request"].user, data["service"])
+            except pricing.InvalidQuote as e:
+                raise serializers.ValidationError({"quote": str(e)})
+            return data
+
+        service = ServiceModel.objects.filter(id=data["service"]).first()
+        if service is None:
+            raise serializers.ValidationError({"service": "Service not found"})
         coupon = None
-        if "coupon_code" in data and data["coupon_code"]:
-            coupon_code = data.pop("coupon_code")
+        if coupon_code:
             try:
-                coupon = Coupon.objects.get(
-                    code=coupon_code,
-                    service=service,
-                    is_active=True
-                )
-                if coupon.is_valid():
-                    discount = coupon.get_discount_amount(total_amount)
-                    total_amount -= discount
-                    data["coupon"] = coupon
-                else:
-                    raise serializers.ValidationError({"coupon_code": "Coupon has expired"})
-            except Coupon.DoesNotExist:
-                raise serializers.ValidationError({"coupon_code": "Invalid coupon code"})
-     
-        data["total_amount"] = total_amount
+                coupon = pricing.find_coupon(coupon_code, service)
+            except pricing.PricingError as e:
+                raise serializers.ValidationError({"coupon_code": str(e)})
+        data["pricing"] = pricing.price(service, coupon)
 
         return data
 
@@ -260,6 +290,9 @@ class LocationSerializer(serializers.Serializer):
         profile.address = address
         profile.save()
 
+        if user.user_type == 'barber':
+            refresh_barber_geo_index(user)
+
         return {
             'message': 'Location updated successfully!',
             'user_type': user.user_type,
@@ -307,6 +340,6 @@ class ComplaintSerializer(serializers.ModelSerializer):
 class CustomerTransactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = CustomerWalletTransaction
-        fields = ['id', 'amount', 'note', 'created_at']
+        fields = ['id', 'amount', 'note', 'kind', 'created_at']
 
 
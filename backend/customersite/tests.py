@@ -0,0 +1,395 @@
+import json
+import time
+from datetime import datetime, timedelta
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+from adminsite.models import Coupon, ServiceModel
+from authservice.models import User
+from barbersite.models import BarberSlot, ScheduleException, WorkingHours
+from paymentservice import ledger
+from backend.testing import DispatchTestMixin
+from . import availability
+from .models import BarberDayAvailability, Booking, PaymentModel
+from .views import (
+    AvailableSlotListView, BookingCreateView, CustomerWalletTransactionHistoryView, booking_summary, free_barbers
+)
+
+
+class CustomerWalletHistoryTests(DispatchTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        wallet = ledger.customer_wallet(self.customer)
+        for amount in (300, 200, 100):
+            ledger.post(ledger.TOPUP, [(ledger.EXTERNAL, -amount, None), (wallet, amount, f"₹{amount} added")])
+
+    def get(self, **params):
+        request = APIRequestFactory().get("/", params)
+        force_authenticate(request, user=self.customer)
+        return CustomerWalletTransactionHistoryView.as_view()(request)
+
+    def test_history_pages_before_cursor(self):
+        first = self.get(limit=2)
+        self.assertEqual([txn["amount"] for txn in first.data["history"]], ["100.00", "200.00"])
+
+        second = self.get(limit=2, before=first.data["next_cursor"])
+        self.assertEqual([txn["amount"] for txn in second.data["history"]], ["300.00"])
+        self.assertIsNone(second.data["next_cursor"])
+
+    def test_exports_stream_every_row(self):
+        ndjson = self.get(export="ndjson")
+        self.assertTrue(ndjson.streaming)
+        rows = [json.loads(line) for line in b"".join(ndjson.streaming_content).decode().splitlines()]
+        self.assertEqual([row["amount"] for row in rows], ["100.00", "200.00", "300.00"])
+
+        csv_lines = b"".join(self.get(export="csv").streaming_content).decode().splitlines()
+        self.assertEqual(csv_lines[0], "id,created_at,kind,amount,note")
+        self.assertEqual(len(csv_lines), 4)
+
+
+@override_settings(PRICING_QUOTE_CACHE="default")
+class PriceQuoteTests(DispatchTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        Coupon.objects.create(
+            code="TRIM10", service=self.service, discount_percentage=10,
+            expiry_date=timezone.now() + timedelta(days=1)
+        )
+
+    def post(self, view, data):
+        request = APIRequestFactory().post("/", data, format="json")
+        force_authenticate(request, user=self.customer)
+        return view(request)
+
+    def summary(self, **data):
+        return self.post(booking_summary, {"service_id": self.service.id, "address_id": self.address.id, **data})
+
+    def book(self, **data):
+        return self.post(BookingCreateView.as_view(), {
+            "service": self.service.id, "address": self.address.id,
+            "payment_method": "COD", "booking_type": "INSTANT_BOOKING", **data
+        })
+
+    def test_booking_charges_the_quoted_amounts_without_repricing(self):
+        summary = self.summary(coupon_code="trim10")
+        self.assertEqual(summary.data["total_amount"], 189.0)
+        ServiceModel.objects.filter(id=self.service.id).update(price=300)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.book(quote=summary.data["quote"])
+
+        self.assertEqual(response.status_code, 201)
+        payment = PaymentModel.objects.get(booking_id=response.data["booking_id"])
+        self.assertEqual(
+            (payment.service_amount, payment.platform_fee, payment.discount, payment.final_amount),
+            (200, 10, 21, 189)
+        )
+        self.assertEqual(payment.booking.coupon.code, "TRIM10")
+        lookups = [q["sql"] for q in queries.captured_queries if q["sql"].startswith("SELECT")]
+        self.assertFalse([sql for sql in lookups if "adminsite_coupon" in sql or "adminsite_servicemodel" in sql])
+
+    def test_quote_is_redeemed_once(self):
+        quote = self.summary().data["quote"]
+        self.assertEqual(self.book(quote=quote).status_code, 201)
+
+        reused = self.book(quote=quote)
+        self.assertEqual(reused.status_code, 400)
+        self.assertIn("quote", reused.data)
+
+    def test_rejected_booking_keeps_its_quote(self):
+        [barber] = self.create_barbers(1)
+        day = timezone.localdate() + timedelta(days=1)
+        taken, free = (
+            BarberSlot.objects.create(
+                barber=barber, date=day, start_time=datetime.strptime(start, "%H:%M").time(),
+                end_time=datetime.strptime(end, "%H:%M").time(), is_booked=is_booked
+            )
+            for start, end, is_booked in (("10:00", "10:30", True), ("11:00", "11:30", False))
+        )
+        quote = self.summary().data["quote"]
+        schedule = {"booking_type": "SCHEDULE_BOOKING", "barber": barber.id, "quote": quote}
+
+        rejected = self.book(slot=str(taken.id), **schedule)
+        self.assertEqual(rejected.status_code, 400)
+        self.assertIn("slot", rejected.data)
+
+        self.assertEqual(self.book(slot=str(free.id), **schedule).status_code, 201)
+        self.assertEqual(self.book(quote=quote).status_code, 400)
+
+    def test_tampered_or_foreign_quote_is_rejected(self):
+        quote = self.summary().data["quote"]
+        other = ServiceModel.objects.create(category=self.service.category, name="Shave", price=100, duration_minutes=15)
+
+        self.assertEqual(self.book(quote=quote[:-2] + "xx").status_code, 400)
+        self.assertEqual(self.book(quote=quote, service=other.id).status_code, 400)
+
+    def test_booking_without_quote_is_priced_on_create(self):
+        response = self.book(coupon_code="TRIM10")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(PaymentModel.objects.get(booking_id=response.data["booking_id"]).final_amount, 189)
+
+
+@override_settings(AVAILABILITY_CACHE="default")
+class SlotAvailabilityTests(DispatchTestMixin, TestCase):
+    SLOTS = 500
+    BOOKINGS = 200
+
+    def setUp(self):
+        super().setUp()
+        caches["default"].clear()
+        [self.barber] = self.create_barbers(1)
+        self.day = timezone.localdate() + timedelta(days=1)
+        self.day_start = timezone.make_aware(datetime.combine(self.day, datetime.min.time()))
+
+    def at(self, minutes):
+        return self.day_start + timedelta(minutes=minutes)
+
+    def test_slots_near_an_instant_booking_are_hidden(self):
+        for start in (600, 630, 660, 700):
+            BarberSlot.objects.create(
+                barber=self.barber, date=self.day,
+                start_time=self.at(start).time(), end_time=self.at(start + 30).time()
+            )
+        # Busy 10:00-10:30 plus the 15 minute buffer either side.
+        self.create_booking(barber=self.barber, booking_type="INSTANT_BOOKING", status="CONFIRMED",
+                            service_started_at=self.at(600))
+
+        slots = availability.available_slots(self.barber.id, self.day)
+
+        self.assertEqual([slot.start_time for slot in slots], [self.at(660).time(), self.at(700).time()])
+
+    def test_sweep_matches_pairwise_check_in_two_queries(self):
+        """Micro-benchmark: 500 slots and 200 instant bookings in one day."""
+        BarberSlot.objects.bulk_create([
+            BarberSlot(barber=self.barber, date=self.day,
+                       start_time=self.at(i * 2).time(), end_time=self.at(i * 2 + 30).time())
+            for i in range(self.SLOTS)
+        ])
+        Booking.objects.bulk_create([
+            Booking(customer=self.customer, service=self.service, address=self.address, total_amount=210,
+                    barber=self.barber, booking_type="INSTANT_BOOKING", status="CONFIRMED",
+                    service_started_at=self.at(i * 37 % 600))
+            for i in range(self.BOOKINGS)
+        ])
+
+        # Cold: working hours, busy intervals and slots; warm: slots only.
+        with CaptureQueriesContext(connection) as queries:
+            slots = availability.available_slots(self.barber.id, self.day)
+        self.assertEqual(len(queries.captured_queries), 3)
+        with self.assertNumQueries(1):
+            availability.available_slots(self.barber.id, self.day)
+
+        all_slots = list(BarberSlot.objects.filter(barber=self.barber).order_by('start_time'))
+        busy = [
+            (self.at(i * 37 % 600) - availability.BOOKING_BUFFER,
+             self.at(i * 37 % 600 + 30) + availability.BOOKING_BUFFER)
+            for i in range(self.BOOKINGS)
+        ]
+
+        windows = [(slot, self.at(i * 2), self.at(i * 2 + 30)) for i, slot in enumerate(all_slots)]
+        started = time.perf_counter()
+        pairwise = [slot for slot, start, end in windows if not any(s < end and start < e for s, e in busy)]
+        pairwise_ms = (time.perf_counter() - started) * 1000
+
+        merged = availability.merge_intervals(busy)
+        bounds = {slot.id: (start, end) for slot, start, end in windows}
+        started = time.perf_counter()
+        swept = availability.sweep_free(all_slots, merged, lambda slot: bounds[slot.id])
+        sweep_ms = (time.perf_counter() - started) * 1000
+
+        self.assertTrue(0 < len(pairwise) < self.SLOTS)
+        self.assertEqual([slot.id for slot in slots], [slot.id for slot in pairwise])
+        self.assertEqual(swept, pairwise)
+        self.assertLess(sweep_ms, pairwise_ms)
+
+
+@override_settings(AVAILABILITY_CACHE="default", PRICING_QUOTE_CACHE="default")
+class WorkingHoursTests(DispatchTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        caches["default"].clear()
+        [self.barber] = self.create_barbers(1)
+        self.day = timezone.localdate() + timedelta(days=2)
+        WorkingHours.objects.create(
+            barber=self.barber, weekday=self.day.weekday(),
+            start_time=datetime.strptime("09:00", "%H:%M").time(), end_time=datetime.strptime("12:00", "%H:%M").time()
+        )
+
+    def starts(self, duration_minutes=30):
+        return [slot["id"][-5:] for slot in availability.available_slots(self.barber.id, self.day, duration_minutes)]
+
+    def book(self, slot):
+        request = APIRequestFactory().post("/", {
+            "service": self.service.id, "address": self.address.id, "barber": self.barber.id,
+            "slot": slot, "payment_method": "COD", "booking_type": "SCHEDULE_BOOKING",
+        }, format="json")
+        force_authenticate(request, user=self.customer)
+        with self.captureOnCommitCallbacks(execute=True):
+            return BookingCreateView.as_view()(request)
+
+    def test_start_times_follow_service_length(self):
+        self.assertEqual(self.starts(30), ["09:00", "09:30", "10:00", "10:30", "11:00", "11:30"])
+        self.assertEqual(self.starts(60), ["09:00", "10:00", "11:00"])
+
+        request = APIRequestFactory().get("/", {
+            "barber_id": self.barber.id, "date": self.day.isoformat(), "service_id": self.service.id
+        })
+        force_authenticate(request, user=self.customer)
+        response = AvailableSlotListView.as_view()(request)
+        self.assertEqual(response.data[0], {
+            "id": f"{self.day.isoformat()}T09:00", "date": self.day.isoformat(),
+            "start_time": "09:00:00", "end_time": "09:30:00",
+        })
+
+    def test_exceptions_replace_weekly_hours(self):
+        ScheduleException.objects.create(
+            barber=self.barber, date=self.day,
+            start_time=datetime.strptime("15:00", "%H:%M").time(), end_time=datetime.strptime("16:00", "%H:%M").time()
+        )
+        self.assertEqual(self.starts(), ["15:00", "15:30"])
+
+        caches["default"].clear()
+        ScheduleException.objects.filter(barber=self.barber).update(start_time=None, end_time=None)
+        self.assertEqual(self.starts(), [])
+
+    def test_booking_materializes_slot_and_refreshes_cached_day(self):
+        self.starts()
+        with self.assertNumQueries(0):
+            self.starts()
+        ref = f"{self.day.isoformat()}T10:00"
+
+        response = self.book(ref)
+
+        self.assertEqual(response.status_code, 201)
+        slot = Booking.objects.get(id=response.data["booking_id"]).slot
+        self.assertEqual((slot.start_time.strftime("%H:%M"), slot.end_time.strftime("%H:%M"), slot.is_booked),
+                         ("10:00", "10:30", True))
+        self.assertEqual(self.starts(), ["09:00", "09:30", "10:30", "11:00", "11:30"])
+        self.assertEqual(self.book(ref).status_code, 400)
+        self.assertEqual(BarberSlot.objects.count(), 1)
+
+    def test_cancelled_slot_can_be_booked_again(self):
+        ref = f"{self.day.isoformat()}T10:00"
+        booking = Booking.objects.get(id=self.book(ref).data["booking_id"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.status = "CANCELLED"
+            booking.save()
+
+        self.assertIn("10:00", self.starts())
+        response = self.book(ref)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Booking.objects.get(id=response.data["booking_id"]).slot, booking.slot)
+        self.assertEqual(BarberSlot.objects.count(), 1)
+        self.assertEqual(self.book(ref).status_code, 400)
+
+
+@override_settings(AVAILABILITY_CACHE="default")
+class FreeBarberSearchTests(DispatchTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        caches["default"].clear()
+        ServiceModel.objects.filter(id=self.service.id).update(duration_minutes=60)
+        self.day = timezone.localdate() + timedelta(days=2)
+        self.day_start = timezone.make_aware(datetime.combine(self.day, datetime.min.time()))
+
+    def clock(self, value):
+        return datetime.strptime(value, "%H:%M").time()
+
+    def barbers_with_hours(self, count, start="16:00", end="20:00"):
+        barbers = self.create_barbers(count)
+        User.objects.filter(id__in=[barber.id for barber in barbers]).update(is_verified=True)
+        WorkingHours.objects.bulk_create([
+            WorkingHours(barber=barber, weekday=self.day.weekday(), start_time=self.clock(start), end_time=self.clock(end))
+            for barber in barbers
+        ])
+        return barbers
+
+    def search(self, **params):
+        request = APIRequestFactory().get("/", {
+            "service_id": self.service.id, "date": self.day.isoformat(), "from": "17:00", "to": "19:00", **params
+        })
+        force_authenticate(request, user=self.customer)
+        return free_barbers(request)
+
+    def found(self, **params):
+        return [(barber["id"], barber["earliest_start"]) for barber in self.search(**params).data["barbers"]]
+
+    def book(self, barber, at):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_booking(
+                barber=barber, booking_type="SCHEDULE_BOOKING", status="CONFIRMED",
+                service_started_at=timezone.make_aware(datetime.combine(self.day, self.clock(at)))
+            )
+
+    def test_finds_barbers_free_for_the_whole_service(self):
+        [booked, closing, day_off] = self.barbers_with_hours(3)
+        WorkingHours.objects.filter(barber=closing).update(start_time=self.clock("09:00"), end_time=self.clock("17:30"))
+        ScheduleException.objects.create(barber=day_off, date=self.day)
+        self.book(booked, "17:00")
+        [slots, unverified] = self.create_barbers(2)
+        User.objects.filter(id=slots.id).update(is_verified=True)
+        for barber in (slots, unverified):
+            BarberSlot.objects.create(barber=barber, date=self.day, start_time=self.clock("17:30"), end_time=self.clock("18:30"))
+
+        self.assertEqual(self.found(), [(slots.id, "17:30"), (booked.id, "18:00")])
+        self.assertEqual(self.found(to="17:45"), [(slots.id, "17:30")])
+        self.assertEqual(self.search(date="tomorrow").status_code, 400)
+        self.assertEqual(self.search(service_id="haircut").status_code, 400)
+
+    def test_starts_follow_the_bookable_grid(self):
+        [grid, slots] = self.barbers_with_hours(2)
+        WorkingHours.objects.filter(barber=slots).delete()
+        # Free from 17:30, but slots start every 60 minutes from 16:00.
+        self.book(grid, "16:30")
+        # Back-to-back half-hour slots hold no 60 minute service; the hour slot does.
+        for start, end in (("17:00", "17:30"), ("17:30", "18:00"), ("18:30", "19:30")):
+            BarberSlot.objects.create(barber=slots, date=self.day, start_time=self.clock(start), end_time=self.clock(end))
+
+        self.assertEqual(self.found(), [(grid.id, "18:00"), (slots.id, "18:30")])
+        self.assertEqual(
+            [slot["start_time"] for slot in availability.available_slots(grid.id, self.day, 60)],
+            [self.clock("18:00"), self.clock("19:00")]
+        )
+
+    def test_query_count_does_not_grow_with_barbers(self):
+        self.barbers_with_hours(3)
+        with CaptureQueriesContext(connection) as few:
+            self.assertEqual(len(self.search().data["barbers"]), 3)
+        BarberDayAvailability.objects.all().delete()
+        self.barbers_with_hours(30)
+        with CaptureQueriesContext(connection) as many:
+            self.assertEqual(len(self.search().data["barbers"]), 33)
+
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+        self.assertEqual(BarberDayAvailability.objects.filter(date=self.day).count(), 33)
+        # Service, candidates, stored bitmaps, result rows.
+        with self.assertNumQueries(4):
+            self.search()
+
+    def test_booking_refreshes_the_barbers_bitmap(self):
+        [barber] = self.barbers_with_hours(1)
+        self.assertEqual(self.found(), [(barber.id, "17:00")])
+
+        self.book(barber, "17:00")
+        self.assertEqual(self.found(), [(barber.id, "18:00")])
+        self.book(barber, "18:00")
+        self.assertEqual(self.found(), [(barber.id, "19:00")])
+        self.book(barber, "19:00")
+        self.assertEqual(self.found(), [])
+
+    def test_windows_do_not_run_into_the_next_barber(self):
+        late = availability.minute_bits(23 * 60 + 30, 24 * 60).to_bytes(180, "little")
+        early = availability.minute_bits(0, 60).to_bytes(180, "little")
+
+        starts = availability.free_window_starts({1: late, 2: early, 3: late}, 60, 22 * 60, 24 * 60)
+        self.assertEqual(starts, {})
+        self.assertEqual(availability.free_window_starts({1: late, 2: early}, 30, 0, 24 * 60), {1: 1410, 2: 0})
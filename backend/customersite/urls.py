@@ -5,6 +5,7 @@ from .views import (
     ServiceListView,
     CategoryListView,
     BarberListView,
+    free_barbers,
     available_dates,
     AvailableSlotListView,
     AddressListCreateView,
@@ -33,6 +34,7 @@ urlpatterns = [
     path('categories/', CategoryListView.as_view(), name='categories'),
     path('services/', ServiceListView.as_view(), name='services'),
     path('barbers/', BarberListView.as_view(), name='barbers'),
+    path('barbers/free/', free_barbers, name='free-barbers'),
     
     
     path('available-dates/', available_dates, name='available-dates'),
@@ -1,11 +1,11 @@
 from .serializer import CustomerTransactionSerializer
 from rest_framework import generics, permissions, status
 from .models import Rating
-from adminsite.models import Coupon
 from django.utils.timezone import make_aware, is_naive, now
 from datetime import timedelta, datetime
 from barbersite.models import BarberWallet, WalletTransaction
 from django.db import transaction
+from django.db.models import Avg
 from decimal import Decimal
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
@@ -19,6 +19,7 @@ from .serializer import (
     CategorySerializer,
     ServiceSerializer,
     BarberSerializer,
+    FreeBarberSerializer,
     AvailableSlotSerializer,
     AddressSerializer,
     BookingCreateSerializer,
@@ -27,7 +28,10 @@ from .serializer import (
     RatingSerializer,
     ComplaintSerializer
 )
-from adminsite.models import CategoryModel, ServiceModel, AdminWallet, AdminWalletTransaction
+from adminsite.models import CategoryModel, ServiceModel
+from paymentservice import ledger
+from backend.idempotency import idempotent
+from . import availability, pricing
 import logging
 from barbersite.models import BarberSlot, BarberService
 from django.contrib.auth.models import User
@@ -37,11 +41,17 @@ from profileservice.serializers import AddressSerializer
 from authservice.models import User
 from .models import Booking, CustomerWallet, Complaints, CustomerWalletTransaction
 logger = logging.getLogger(__name__)
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from chat.publisher import publisher
+from backend.pagination import InvalidCursor, keyset_page, parse_limit
+from instantbooking.capture import cancel_pending_capture
+from instantbooking.offers import close_offers
 from .models import PaymentModel
 import pytz 
+import csv
+import itertools
+import json
 from django.conf import settings 
+from django.http import StreamingHttpResponse
 
 
 
@@ -160,95 +170,76 @@ def available_dates(request):
     if not barber_id:
         return Response({"error": "barber_id is required"}, status=400)
 
-    dates = BarberSlot.objects.filter(
+    today = timezone.localdate()
+    dates = set(BarberSlot.objects.filter(
         barber_id=barber_id,
         is_booked=False,
-        date__gte=timezone.now().date()
-    ).values_list('date', flat=True).distinct().order_by('date')
+        date__gte=today
+    ).values_list('date', flat=True).distinct())
+    dates.update(availability.working_dates(barber_id, today, settings.AVAILABILITY_HORIZON_DAYS))
 
-    return Response({"available_dates": list(dates)})
+    return Response({"available_dates": sorted(dates)})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def free_barbers(request):
+    """Barbers offering ``service_id`` who are free for the whole service,
+    starting at some time from ``from`` to ``to`` (HH:MM, default the whole
+    day) on ``date``, earliest first."""
+    service_id = request.query_params.get('service_id')
+    date_str = request.query_params.get('date')
+    if not service_id or not date_str:
+        return Response({"error": "service_id and date are required"}, status=400)
+    if not service_id.isdigit():
+        return Response({"error": "service_id must be a number"}, status=400)
+
+    try:
+        date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
+        window_start = datetime.strptime(request.query_params.get('from', "00:00"), "%H:%M").time()
+        window_end = datetime.strptime(request.query_params.get('to', "23:59"), "%H:%M").time()
+    except ValueError:
+        return Response({"error": "Use YYYY-MM-DD for date and HH:MM for from and to"}, status=400)
+
+    duration = ServiceModel.objects.filter(id=service_id).values_list('duration_minutes', flat=True).first()
+    if duration is None:
+        return Response({"error": "Service not found"}, status=404)
+
+    barber_ids = list(User.objects.filter(
+        id__in=BarberService.objects.filter(service_id=service_id, is_active=True).values('barber_id'),
+        user_type='barber',
+        is_active=True,
+        is_blocked=False,
+        is_verified=True
+    ).values_list('id', flat=True))
+    earliest_start = availability.free_barbers(barber_ids, date_obj, duration, window_start, window_end)
+
+    barbers = sorted(
+        User.objects.filter(id__in=earliest_start).annotate(average_rating=Avg('barber_ratings__rating')),
+        key=lambda barber: (earliest_start[barber.id], barber.id)
+    )
+    serializer = FreeBarberSerializer(barbers, many=True, context={'earliest_start': earliest_start})
+    return Response({"date": date_obj, "duration_minutes": duration, "barbers": serializer.data})
 
 
 class AvailableSlotListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = AvailableSlotSerializer
 
-    def get_queryset(self):
-        barber_id = self.request.query_params.get('barber_id')
-        date_str = self.request.query_params.get('date')
+    def list(self, request, *args, **kwargs):
+        barber_id = request.query_params.get('barber_id')
+        date_str = request.query_params.get('date')
+        service_id = request.query_params.get('service_id')
 
         if not barber_id or not date_str:
-            return BarberSlot.objects.none()
+            return Response([])
 
         date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
-        current_time = timezone.now()
-
-        cutoff_time = current_time - timedelta(hours=12)
-
-        instant_bookings = Booking.objects.filter(
-            barber_id=barber_id,
-            status__in=["CONFIRMED", "PENDING"],
-            booking_type="INSTANT_BOOKING",
-            created_at__gte=cutoff_time
-        )
-
-        booking_ranges = []
-        for booking in instant_bookings:
-            if booking.service_started_at:
-                start_dt = booking.service_started_at
-            else:
-                start_dt = booking.created_at
-
-            if is_naive(start_dt):
-                start_dt = make_aware(start_dt)
-
-            duration = timedelta(minutes=booking.service.duration_minutes)
-            end_dt = start_dt + duration
-
-            booking_date = start_dt.date()
-            end_date = end_dt.date()
-
-            if booking_date == date_obj or end_date == date_obj:
-                booking_ranges.append((start_dt, end_dt))
-
-        slots = BarberSlot.objects.filter(
-            barber_id=barber_id,
-            date=date_obj,
-            is_booked=False
-        )
-
-        if date_obj == current_time.date():
-            buffer_time = current_time + timedelta(minutes=30)
-            current_time_only = buffer_time.time()
-            slots = slots.filter(start_time__gt=current_time_only)
-
-        def slot_conflicts_with_booking(slot, booking_start, booking_end):
-            slot_start = datetime.combine(slot.date, slot.start_time)
-            slot_end = datetime.combine(slot.date, slot.end_time)
-
-            if is_naive(slot_start):
-                slot_start = make_aware(slot_start)
-            if is_naive(slot_end):
-                slot_end = make_aware(slot_end)
-
-            buffer = timedelta(minutes=15)
-            booking_start_buffered = booking_start - buffer
-            booking_end_buffered = booking_end + buffer
-
-            return slot_start < booking_end_buffered and booking_start_buffered < slot_end
-
-        available_slots = []
-        for slot in slots:
-            has_conflict = False
-            for booking_start, booking_end in booking_ranges:
-                if slot_conflicts_with_booking(slot, booking_start, booking_end):
-                    has_conflict = True
-                    break
-
-            if not has_conflict:
-                available_slots.append(slot.id)
-
-        return slots.filter(id__in=available_slots).order_by('start_time')
+        duration = None
+        if service_id:
+            duration = ServiceModel.objects.filter(id=service_id).values_list('duration_minutes', flat=True).first()
+        slots = availability.available_slots(barber_id, date_obj, duration)
+        return Response(self.get_serializer(slots, many=True).data)
 
 
 class AddressListCreateView(generics.ListCreateAPIView):
@@ -287,62 +278,56 @@ def booking_summary(request):
         if barber_id and slot_id:
             try:
                 barber = User.objects.get(id=barber_id, user_type='barber')
-                slot = BarberSlot.objects.get(id=slot_id, is_booked=False)
-
                 summary['barber'] = {
                     'name': barber.name,
                     'phone': barber.phone,
                 }
-                summary['slot'] = {
-                    'date': slot.date,
-                    'start_time': slot.start_time,
-                    'end_time': slot.end_time,
-                }
+
+                slot_start = availability.parse_slot_ref(slot_id)
+                if slot_start:
+                    slot_date, start_time = slot_start
+                    end = datetime.combine(slot_date, start_time) + timedelta(minutes=service.duration_minutes)
+                    summary['slot'] = {
+                        'date': slot_date,
+                        'start_time': start_time,
+                        'end_time': end.time(),
+                    }
+                else:
+                    slot = BarberSlot.objects.get(id=slot_id, is_booked=False)
+                    summary['slot'] = {
+                        'date': slot.date,
+                        'start_time': slot.start_time,
+                        'end_time': slot.end_time,
+                    }
             except User.DoesNotExist:
                 return Response({"error": "Barber not found."}, status=404)
         else:
             print("Instant booking: Skipping barber and slot details")
 
-        service_amount = float(service.price)
-        platform_fee = round(0.05 * service_amount, 2)
-        total_amount = service_amount + platform_fee
-
-        discount = 0
+        coupon = None
         coupon_info = None
-
         if coupon_code:
             try:
-
-                coupon = Coupon.objects.get(
-                    code__iexact=coupon_code.strip(),
-                    is_active=True,
-                    service=service
-                )
-
-                if not coupon.is_valid():
-                    return Response({"error": "Coupon has expired."}, status=400)
-                if not coupon.can_user_use_coupon(request.user):
-                    return Response({"error": "You have used this coupon."}, status=400)
-
-                total_before_discount = service_amount + platform_fee
-                discount = float(coupon.get_discount_amount(
-                    Decimal(str(total_before_discount))))
-                total_amount = total_before_discount - discount
-                coupon_info = {
-                    "code": coupon.code,
-                    "discount_percentage": coupon.discount_percentage,
-                    "discount_amount": discount,
-                }
-
-            except Coupon.DoesNotExist:
-                return Response({"error": "Invalid or inapplicable coupon."}, status=400)
+                coupon = pricing.find_coupon(coupon_code, service, user=request.user)
+            except pricing.PricingError as e:
+                return Response({"error": str(e)}, status=400)
+
+        quote, amounts = pricing.issue_quote(request.user, service, coupon)
+        if coupon:
+            coupon_info = {
+                "code": coupon.code,
+                "discount_percentage": coupon.discount_percentage,
+                "discount_amount": float(amounts['discount']),
+            }
 
         summary.update({
-            'service_amount': round(service_amount, 2),
-            'platform_fee': platform_fee,
-            'discount': discount,
-            'total_amount': round(total_amount, 2),
+            'service_amount': float(amounts['service_amount']),
+            'platform_fee': float(amounts['platform_fee']),
+            'discount': float(amounts['discount']),
+            'total_amount': float(amounts['total_amount']),
             'coupon': coupon_info,
+            'quote': quote,
+            'quote_expires_in': settings.PRICING_QUOTE_TTL_SECONDS,
         })
 
         return Response(summary)
@@ -361,43 +346,45 @@ def booking_summary(request):
 class BookingCreateView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     def post(self, request):
-        serializer = BookingCreateSerializer(data=request.data)
+        serializer = BookingCreateSerializer(data=request.data, context={"request": request})
         serializer.is_valid(raise_exception=True)
 
         data = serializer.validated_data
+        price = data["pricing"]
         user = request.user
 
         with transaction.atomic():
-            
-            coupon = data.pop("coupon", None)
-            
+            slot = data.get("slot")
+            if data.get("slot_start"):
+                duration = ServiceModel.objects.values_list('duration_minutes', flat=True).get(id=price["service_id"])
+                try:
+                    slot = availability.reserve_slot(data["barber"].id, *data["slot_start"], duration)
+                except availability.SlotUnavailable as e:
+                    raise serializers.ValidationError({"slot": str(e)})
+
             booking = Booking.objects.create(
                 customer=user,
-                service=data["service"],
+                service_id=price["service_id"],
                 address=data["address"],
                 barber=data.get("barber"),
-                slot=data.get("slot"),
-                coupon=coupon, 
+                slot=slot,
+                coupon_id=price["coupon_id"],
                 booking_type=data["booking_type"],
-                total_amount=data["total_amount"],
+                total_amount=price["total_amount"],
                 status="PENDING",
                 is_payment_done=False
             )
 
-            discount = Decimal('0.00')
-            if coupon:
-                original_amount = data["service"].price + (data["service"].price * Decimal('0.05'))
-                discount = coupon.get_discount_amount(original_amount)
-
             payment = PaymentModel.objects.create(
                 booking=booking,
                 payment_method=data["payment_method"],
                 payment_status="PENDING",
-                service_amount=data["service"].price,
-                platform_fee=data["service"].price * Decimal('0.05'),
-                discount=discount,
-                final_amount=data["total_amount"],
+                service_amount=price["service_amount"],
+                platform_fee=price["platform_fee"],
+                discount=price["discount"],
+                final_amount=price["total_amount"],
             )
 
             if booking.booking_type == "SCHEDULE_BOOKING":
@@ -423,6 +410,12 @@ class BookingCreateView(APIView):
                 booking.save()
                 payment.save()
 
+            if price.get("quote_id"):
+                try:
+                    pricing.consume_quote(price["quote_id"])
+                except pricing.InvalidQuote as e:
+                    raise serializers.ValidationError({"quote": str(e)})
+
         return Response({
             "booking_id": booking.id,
             "booking_type": booking.booking_type,
@@ -579,8 +572,7 @@ def update_travel_status(request, booking_id):
         booking.travel_status = new_status
         booking.save()
 
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
+        publisher.publish(
             f"customer_{booking.customer.id}",
             {
                 "type": "travel_update", 
@@ -641,8 +633,10 @@ class CustomerWalletView(APIView):
             amount = serializer.validated_data['amount']
             wallet, created = CustomerWallet.objects.get_or_create(
                 user=request.user)
-            wallet.account_total_balance += amount
-            wallet.save()
+            ledger.post(ledger.TOPUP, [
+                (ledger.EXTERNAL, -amount, None),
+                (wallet, amount, f"₹{amount} added to your wallet"),
+            ])
 
             return Response({'message': 'Amount successfully added to your wallet'}, status=status.HTTP_202_ACCEPTED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -655,7 +649,7 @@ class EmergencyCancel(APIView):
     def post(self, request, booking_id):
         try:
             with transaction.atomic():
-                booking = get_object_or_404(Booking, id=booking_id, customer=request.user)
+                booking = get_object_or_404(Booking.objects.select_for_update(), id=booking_id, customer=request.user)
 
                 if booking.status in ['CANCELLED', 'COMPLETED']:
                     return Response({'error': 'Booking already processed'}, status=400)
@@ -669,42 +663,29 @@ class EmergencyCancel(APIView):
                 payment_method = payment.payment_method if payment else None
                 
                 wallet, _ = CustomerWallet.objects.get_or_create(user=request.user)
-                admin_wallet, _ = AdminWallet.objects.get_or_create(id=1, defaults={'total_earnings': Decimal('0.00')})
 
                 refund_amount = Decimal('0.00')
+                is_paid = payment_method != 'COD' and payment is not None and payment.payment_status == 'SUCCESS'
+                if payment_method == 'STRIPE' and not is_paid:
+                    # An accepted instant booking's capture may still be queued, or already done.
+                    is_paid = cancel_pending_capture(booking)
 
-                if payment_method != 'COD':
+                if is_paid:
+                    # The platform holds the full payment: refund it, then charge the fine.
                     refund_amount = booking.total_amount - fine_amount
-                    wallet.account_total_balance += refund_amount
-                    wallet.save()
-
-                    admin_wallet.total_earnings -= refund_amount
-                    admin_wallet.save()
-
-                    CustomerWalletTransaction.objects.create(
-                        wallet=wallet, amount=refund_amount, 
-                        note=f"Refund (Emergency Cancel) #{booking.id}"
-                    )
-                    CustomerWalletTransaction.objects.create(
-                        wallet=wallet, amount=-fine_amount, 
-                        note=f"Cancellation Fine #{booking.id}"
-                    )
-                else:
-                   
-                    CustomerWalletTransaction.objects.create(
-                        wallet=wallet, amount=-fine_amount, 
-                        note=f"Cancellation Fine (COD) #{booking.id}"
-                    )
-
-               
-                if booking.barber:
-                    barber_wallet, _ = BarberWallet.objects.get_or_create(barber=booking.barber)
-                    barber_wallet.balance += fine_amount
-                    barber_wallet.save()
-                    WalletTransaction.objects.create(
-                        wallet=barber_wallet, amount=fine_amount, 
-                        note=f"Fine received: Cancelled Booking #{booking.id}"
+                    ledger.post(ledger.REFUND, [
+                        (ledger.platform_wallet(), -booking.total_amount, f"Refund (Emergency Cancel) #{booking.id}"),
+                        (wallet, booking.total_amount, f"Refund (Emergency Cancel) #{booking.id}"),
+                    ])
+
+                if is_paid or booking.barber:
+                    fine_note = f"Cancellation Fine (COD) #{booking.id}" if payment_method == 'COD' else f"Cancellation Fine #{booking.id}"
+                    fine_receiver = (
+                        (ledger.barber_wallet(booking.barber), fine_amount, f"Fine received: Cancelled Booking #{booking.id}")
+                        if booking.barber else
+                        (ledger.platform_wallet(), fine_amount, f"Fine collected: Cancelled Booking #{booking.id}")
                     )
+                    ledger.post(ledger.FINE, [(wallet, -fine_amount, fine_note), fine_receiver])
 
                 booking.status = 'CANCELLED'
                 booking.save()
@@ -714,8 +695,7 @@ class EmergencyCancel(APIView):
                     payment.save()
 
                 if booking.barber:
-                    channel_layer = get_channel_layer()
-                    async_to_sync(channel_layer.group_send)(
+                    publisher.publish(
                         f"barber_{booking.barber.id}",
                         {
                             "type": "booking_cancelled",
@@ -723,7 +703,16 @@ class EmergencyCancel(APIView):
                             "message": "Customer cancelled the booking."
                         }
                     )
+                else:
+                    publisher.publish_many(
+                        (
+                            f"barber_{barber_id}",
+                            {"type": "remove_booking", "booking_id": booking.id, "message": "Booking cancelled."}
+                        )
+                        for barber_id in close_offers(booking, "WITHDRAWN")
+                    )
 
+                wallet.refresh_from_db()
                 return Response({
                     'message': 'Booking cancelled successfully!',
                     'fine_amount': str(fine_amount),
@@ -794,18 +783,72 @@ class CreateComplaintView(APIView):
     
     
     
+class StatementBuffer:
+    """File-like sink for csv.writer that hands each row back instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
 class CustomerWalletTransactionHistoryView(APIView):
     permission_classes = [IsAuthenticated]
 
+    EXPORT_FIELDS = ['id', 'created_at', 'kind', 'amount', 'note']
+    EXPORT_CHUNK_SIZE = 500
+
     def get(self, request):
         wallet = CustomerWallet.objects.filter(user=request.user).first()
+        transactions = CustomerWalletTransaction.objects.filter(wallet=wallet)
+
+        export = request.query_params.get('export')
+        if export in ('ndjson', 'csv'):
+            return self.export(transactions, export)
+        if export:
+            return Response({'detail': 'export must be ndjson or csv.'}, status=400)
+
         if not wallet:
-            return Response({'history': []})
+            return Response({'history': [], 'next_cursor': None})
+
+        try:
+            limit = parse_limit(request.query_params.get('limit'))
+            history, next_cursor = keyset_page(transactions, request.query_params.get('before'), limit)
+        except InvalidCursor as e:
+            return Response({'detail': str(e)}, status=400)
+
+        serializer = CustomerTransactionSerializer(history, many=True)
+        return Response({'history': serializer.data, 'next_cursor': next_cursor})
+
+    def export(self, transactions, export):
+        rows = (
+            transactions.order_by('-created_at', '-id')
+            .values_list(*self.EXPORT_FIELDS)
+            .iterator(chunk_size=self.EXPORT_CHUNK_SIZE)
+        )
+
+        if export == 'csv':
+            writer = csv.writer(StatementBuffer())
+            lines = itertools.chain(
+                [writer.writerow(self.EXPORT_FIELDS)],
+                (writer.writerow([pk, created_at.isoformat(), kind, amount, note or ''])
+                 for pk, created_at, kind, amount, note in rows)
+            )
+            content_type = 'text/csv'
+        else:
+            lines = (
+                json.dumps({
+                    'id': pk,
+                    'created_at': created_at.isoformat(),
+                    'kind': kind,
+                    'amount': str(amount),
+                    'note': note,
+                }) + '\n'
+                for pk, created_at, kind, amount, note in rows
+            )
+            content_type = 'application/x-ndjson'
 
-        transactions = CustomerWalletTransaction.objects.filter(
-            wallet=wallet).order_by('-created_at')
-        serializer = CustomerTransactionSerializer(transactions, many=True)
-        return Response({'history': serializer.data})
+        response = StreamingHttpResponse(lines, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="wallet_statement.{export}"'
+        return response
 
 
 
@@ -0,0 +1,225 @@
+import logging
+from datetime import timedelta
+import stripe
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from backend import metrics
+from chat.publisher import publisher
+from customersite.models import Booking
+from paymentservice.gateway import get_gateway
+from .models import PaymentCapture
+
+logger = logging.getLogger(__name__)
+
+# Declines and invalid intents will not succeed on a retry.
+PERMANENT_ERRORS = (stripe.error.CardError, stripe.error.InvalidRequestError)
+
+
+def enqueue_capture(booking):
+    """Queue the Stripe capture of an accepted booking. Call inside the claim transaction."""
+    capture, _ = PaymentCapture.objects.get_or_create(
+        booking=booking,
+        defaults={'next_attempt_at': timezone.now()}
+    )
+    return capture
+
+
+def claim_due_captures(limit=20):
+    """Lease due captures to this worker and return their ids.
+
+    The lease pushes ``next_attempt_at`` forward, so another worker only picks
+    a capture up again if this one dies before recording the result.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        capture_ids = list(
+            PaymentCapture.objects.select_for_update(skip_locked=True)
+            .filter(status="PENDING", next_attempt_at__lte=now)
+            .order_by('next_attempt_at')
+            .values_list('id', flat=True)[:limit]
+        )
+        PaymentCapture.objects.filter(id__in=capture_ids).update(
+            next_attempt_at=now + timedelta(seconds=settings.INSTANT_CAPTURE_LEASE_SECONDS)
+        )
+    return capture_ids
+
+
+def _capture_intent(payment):
+    gateway = get_gateway()
+    try:
+        gateway.capture_payment_intent(
+            payment.transaction_id,
+            idempotency_key=f"capture-booking-{payment.booking_id}"
+        )
+    except stripe.error.InvalidRequestError:
+        # A previous attempt may have captured the intent before its response was lost.
+        intent = gateway.retrieve_payment_intent(payment.transaction_id)
+        if intent.status != "succeeded":
+            raise
+
+
+def _lock_pending(capture_id):
+    """Lock a capture and its booking, booking first as cancellation does.
+    Returns ``(capture, booking)``, with ``capture`` ``None`` once it is no
+    longer pending. Call inside a transaction."""
+    booking_id = PaymentCapture.objects.filter(id=capture_id).values_list('booking_id', flat=True).first()
+    booking = Booking.objects.select_for_update().select_related('payment').filter(id=booking_id).first()
+    capture = PaymentCapture.objects.select_for_update().filter(id=capture_id, status="PENDING").first()
+    return capture, booking
+
+
+def process_capture(capture_id):
+    """Capture the payment of one leased capture and record the outcome.
+
+    Stripe is called without any row lock held; only the bookkeeping before
+    and after runs in (short) transactions. A booking cancelled before the
+    capture is never charged; one cancelled while Stripe was being called is
+    settled by ``cancel_pending_capture``. A booking completed while the
+    capture waited is still charged.
+    """
+    with transaction.atomic():
+        capture, booking = _lock_pending(capture_id)
+        if capture is None:
+            return None
+        if booking.status == "CANCELLED":
+            capture.status = "CANCELLED"
+            capture.save(update_fields=['status', 'updated_at'])
+            return "CANCELLED"
+
+    payment = booking.payment
+    error = None
+
+    with metrics.timer("payments.capture_ms"):
+        try:
+            if payment.transaction_id:
+                _capture_intent(payment)
+            else:
+                error = stripe.error.InvalidRequestError("Payment has no PaymentIntent.", None)
+        except stripe.error.StripeError as e:
+            error = e
+
+    if error is None:
+        with transaction.atomic():
+            capture, booking = _lock_pending(capture_id)
+            if capture is None:
+                return "CANCELLED"
+            capture.status, capture.attempts = "SUCCEEDED", capture.attempts + 1
+            capture.save(update_fields=['status', 'attempts', 'updated_at'])
+            booking.payment.payment_status = "SUCCESS"
+            booking.payment.save(update_fields=['payment_status', 'updated_at'])
+        metrics.increment("payments.capture.succeeded")
+        return "SUCCEEDED"
+
+    attempts = capture.attempts + 1
+    retry_delays = settings.INSTANT_CAPTURE_RETRY_DELAYS
+    logger.error(f"Capture attempt {attempts} failed for booking {capture.booking_id}: {str(error)}")
+
+    if not isinstance(error, PERMANENT_ERRORS) and attempts <= len(retry_delays):
+        PaymentCapture.objects.filter(id=capture_id, status="PENDING").update(
+            attempts=attempts,
+            last_error=str(error),
+            next_attempt_at=timezone.now() + timedelta(seconds=retry_delays[attempts - 1])
+        )
+        metrics.increment("payments.capture.retried")
+        return "RETRY"
+
+    if not compensate_failed_capture(capture_id, attempts, str(error)):
+        return "CANCELLED"
+    metrics.increment("payments.capture.failed")
+    return "FAILED"
+
+
+def compensate_failed_capture(capture_id, attempts, error):
+    """Cancel the booking whose payment could not be captured, free the barber
+    and release the card authorization.
+
+    Returns ``False`` without doing anything when the customer cancelled the
+    booking first; cancellation has settled the payment then.
+    """
+    with transaction.atomic():
+        capture, booking = _lock_pending(capture_id)
+        if capture is None:
+            return False
+        payment = booking.payment
+
+        capture.status = "FAILED"
+        capture.attempts = attempts
+        capture.last_error = error
+        capture.save()
+
+        barber_id = booking.barber_id
+        cancelled = booking.status != "CANCELLED"
+        if cancelled:
+            booking.status = "CANCELLED"
+            booking.save()
+
+        payment.payment_status = "FAILED"
+        payment.save()
+
+    if payment.transaction_id:
+        try:
+            get_gateway().cancel_payment_intent(payment.transaction_id)
+        except stripe.error.StripeError as e:
+            logger.error(f"Could not release authorization for booking {booking.id}: {str(e)}")
+
+    if not cancelled:
+        return True
+
+    messages = [(
+        f"customer_{booking.customer_id}",
+        {
+            "type": "booking_cancelled",
+            "booking_id": booking.id,
+            "message": "Your payment could not be completed, so the booking was cancelled."
+        }
+    )]
+    if barber_id:
+        messages.append((
+            f"barber_{barber_id}",
+            {
+                "type": "booking_cancelled",
+                "booking_id": booking.id,
+                "message": "The customer's payment failed. This booking was cancelled."
+            }
+        ))
+    publisher.publish_many(messages)
+    return True
+
+
+def cancel_pending_capture(booking):
+    """Stop the queued capture of a booking the customer is cancelling and
+    release the card authorization. Call with the booking row locked.
+
+    Returns ``True`` when the worker captured the payment first, so the
+    caller must refund it as a paid booking. Raises ``StripeError`` when
+    Stripe cannot tell which happened; the cancellation should then fail
+    and be retried.
+    """
+    cancelled = PaymentCapture.objects.filter(booking=booking, status="PENDING").update(
+        status="CANCELLED", updated_at=timezone.now()
+    )
+    payment = booking.payment
+    if not cancelled or not payment.transaction_id:
+        return False
+
+    gateway = get_gateway()
+    try:
+        gateway.cancel_payment_intent(payment.transaction_id)
+        return False
+    except stripe.error.StripeError:
+        status = gateway.retrieve_payment_intent(payment.transaction_id).status
+        if status == "succeeded":
+            return True
+        if status == "canceled":
+            return False
+        raise
+
+
+def run_due_captures(limit=20):
+    results = {}
+    for capture_id in claim_due_captures(limit):
+        outcome = process_capture(capture_id)
+        if outcome:
+            results[outcome] = results.get(outcome, 0) + 1
+    return results
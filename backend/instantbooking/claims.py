@@ -0,0 +1,42 @@
+import logging
+import redis
+from django.conf import settings
+from .presence import get_redis
+
+logger = logging.getLogger(__name__)
+
+CLAIM_KEY = "claim:booking:{}"
+
+# Delete the claim only if this barber still holds it.
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def claim_booking(booking_id, barber_id):
+    """First-wins claim on an instant booking, taken before any row lock.
+
+    Returns ``True`` for the winner and ``False`` for everyone else. Returns
+    ``None`` when claims are disabled or Redis is unreachable; the row lock in
+    the accept transaction still decides the winner then.
+    """
+    ttl = settings.INSTANT_ACCEPT_CLAIM_TTL_SECONDS
+    if not ttl:
+        return None
+
+    try:
+        return bool(get_redis().set(CLAIM_KEY.format(booking_id), str(barber_id), nx=True, ex=ttl))
+    except redis.RedisError as e:
+        logger.error(f"Accept claim unavailable for booking {booking_id}: {str(e)}")
+        return None
+
+
+def release_claim(booking_id, barber_id):
+    """Give the claim back after an accept that did not go through."""
+    try:
+        get_redis().eval(RELEASE_SCRIPT, 1, CLAIM_KEY.format(booking_id), str(barber_id))
+    except redis.RedisError as e:
+        logger.error(f"Could not release accept claim for booking {booking_id}: {str(e)}")
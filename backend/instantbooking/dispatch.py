@@ -0,0 +1,181 @@
+import logging
+from datetime import timedelta
+import stripe
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from chat.publisher import publisher
+from customersite.models import Booking
+from paymentservice.gateway import get_gateway
+from .models import BookingDispatch, BookingOffer
+from .offers import booking_request_event, close_offers, record_offers
+
+logger = logging.getLogger(__name__)
+
+
+def get_waves():
+    return settings.INSTANT_DISPATCH_WAVES
+
+
+def run_wave(booking, wave_number, image_url=None):
+    """Offer the booking to the nearest barbers allowed in this wave who have
+    not been offered it yet, and return them."""
+    from .views import BookingMixin
+
+    wave = get_waves()[wave_number - 1]
+    already_offered = set(
+        BookingOffer.objects.filter(booking=booking).values_list('barber_id', flat=True)
+    )
+
+    candidates = [
+        barber for barber in BookingMixin.get_available_barbers_for_booking(booking)
+        if barber.id not in already_offered
+        and (getattr(barber, 'distance_km', None) is None or barber.distance_km <= wave["radius_km"])
+    ]
+    barbers = candidates[:wave["size"]]
+
+    record_offers(booking, barbers, wave=wave_number)
+    events = [
+        (
+            f"barber_{barber.id}",
+            booking_request_event(booking, image_url, getattr(barber, 'distance_km', None))
+        )
+        for barber in barbers
+    ]
+    # Barbers only hear of offers that were committed; outside a transaction this runs now.
+    transaction.on_commit(lambda: publisher.publish_many(events))
+    return barbers
+
+
+def start_dispatch(booking, image_url=None):
+    """Run the first wave and hand the booking to the dispatch scheduler.
+
+    Repeated calls for the same booking do not start a new wave while the
+    dispatch is running. When the first wave finds nobody the dispatch is
+    finished straight away, as the customer is told no barber is available,
+    and a later call searches again.
+    """
+    first_wave = get_waves()[0]
+    next_run_at = timezone.now() + timedelta(seconds=first_wave["timeout_seconds"])
+    dispatch, created = BookingDispatch.objects.get_or_create(
+        booking=booking,
+        defaults={'next_run_at': next_run_at, 'customer_image_url': image_url or ""}
+    )
+    if not created and dispatch.status == "ACTIVE":
+        return [
+            offer.barber for offer in
+            BookingOffer.objects.filter(booking=booking, status="OPEN").select_related('barber')
+        ]
+    if not created:
+        dispatch.wave, dispatch.status, dispatch.next_run_at = 1, "ACTIVE", next_run_at
+        dispatch.customer_image_url = image_url or ""
+        dispatch.save(update_fields=['wave', 'status', 'next_run_at', 'customer_image_url', 'updated_at'])
+
+    offered = run_wave(booking, 1, image_url)
+    if not offered:
+        finish_dispatch(booking)
+    return offered
+
+
+def finish_dispatch(booking):
+    BookingDispatch.objects.filter(booking=booking, status="ACTIVE").update(status="DONE")
+
+
+def advance_dispatch(booking_id):
+    """Run the next wave of a due dispatch, or expire the booking after the last one.
+
+    Returns when the dispatch should run again, or ``None`` once it is finished.
+    """
+    now = timezone.now()
+    waves = get_waves()
+
+    with transaction.atomic():
+        dispatch = (
+            BookingDispatch.objects.select_for_update(skip_locked=True)
+            .select_related('booking__customer', 'booking__service', 'booking__address')
+            .filter(booking_id=booking_id, status="ACTIVE")
+            .first()
+        )
+        if dispatch is None:
+            return None
+        if dispatch.next_run_at > now:
+            return dispatch.next_run_at
+
+        booking = dispatch.booking
+        if booking.status != "PENDING" or booking.barber_id is not None:
+            dispatch.status = "DONE"
+            dispatch.save(update_fields=['status', 'updated_at'])
+            return None
+
+        if dispatch.wave < len(waves):
+            dispatch.wave += 1
+            offered = run_wave(booking, dispatch.wave, dispatch.customer_image_url or None)
+            dispatch.next_run_at = now + timedelta(seconds=waves[dispatch.wave - 1]["timeout_seconds"])
+            dispatch.save(update_fields=['wave', 'next_run_at', 'updated_at'])
+            logger.info(f"Dispatch wave {dispatch.wave} for booking {booking_id}: {len(offered)} barbers offered")
+            return dispatch.next_run_at
+
+    try:
+        expire_instant_booking(booking_id)
+        logger.info(f"Booking {booking_id} expired after {len(waves)} dispatch waves")
+    except Booking.DoesNotExist:
+        finish_dispatch(booking)
+    return None
+
+
+def expire_instant_booking(booking_id):
+    """Cancel an unassigned instant booking and refund its payment.
+
+    The cancellation commits first and clients hear of it only then; a card
+    authorization is released afterwards, without the booking row locked.
+    Raises ``Booking.DoesNotExist`` when the booking was already taken or processed.
+    """
+    with transaction.atomic():
+        booking = Booking.objects.select_for_update().get(
+            id=booking_id,
+            booking_type="INSTANT_BOOKING",
+            status="PENDING",
+            barber__isnull=True
+        )
+        payment = booking.payment
+
+        booking.status = "CANCELLED"
+        booking.save()
+        finish_dispatch(booking)
+        offered_barber_ids = close_offers(booking, "EXPIRED")
+
+        # Wallet bookings are only debited when a barber accepts, so an
+        # unassigned booking has nothing to give back. A card payment stays
+        # FAILED until its authorization is released below.
+        refund_processed = payment.payment_method in ('WALLET', 'COD')
+        payment.payment_status = "REFUNDED" if payment.payment_method == 'WALLET' else "FAILED"
+        payment.save()
+
+        messages = [(
+            f"customer_{booking.customer_id}",
+            {
+                "type": "booking_cancelled",
+                "booking_id": booking.id,
+                "message": "No barbers available. Payment refunded to your wallet/card."
+            }
+        )]
+        messages.extend(
+            (
+                f"barber_{barber_id}",
+                {"type": "remove_booking", "booking_id": booking.id, "message": "Booking expired."}
+            )
+            for barber_id in offered_barber_ids
+        )
+        transaction.on_commit(lambda: publisher.publish_many(messages))
+
+    if payment.payment_method == 'STRIPE' and payment.transaction_id:
+        try:
+            get_gateway().cancel_payment_intent(payment.transaction_id)
+            logger.info(f"Stripe Payment cancelled for booking {booking_id}")
+            payment.payment_status = "REFUNDED"
+            payment.save(update_fields=['payment_status', 'updated_at'])
+            refund_processed = True
+        except stripe.error.StripeError as e:
+            logger.error(f"Stripe refund error: {str(e)}")
+
+    return refund_processed
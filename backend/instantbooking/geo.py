@@ -0,0 +1,107 @@
+import math
+from profileservice.models import Address
+from barbersite.models import Portfolio
+from .models import BarberGeoIndex
+
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+# Grid cells are CELL_SIZE_DEG x CELL_SIZE_DEG (~11 km at the equator).
+CELL_SIZE_DEG = 0.1
+
+# Upper bound for the dispatch search area, whatever a barber's own radius is.
+MAX_SEARCH_RADIUS_KM = 25.0
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def _cell_coords(latitude, longitude):
+    return math.floor(latitude / CELL_SIZE_DEG), math.floor(longitude / CELL_SIZE_DEG)
+
+
+def cell_for(latitude, longitude):
+    row, col = _cell_coords(latitude, longitude)
+    return f"{row}:{col}"
+
+
+def cells_around(latitude, longitude, radius_km=MAX_SEARCH_RADIUS_KM):
+    lat_span = radius_km / KM_PER_DEGREE
+    cos_lat = max(math.cos(math.radians(latitude)), 0.01)
+    lng_span = radius_km / (KM_PER_DEGREE * cos_lat)
+
+    min_row, min_col = _cell_coords(latitude - lat_span, longitude - lng_span)
+    max_row, max_col = _cell_coords(latitude + lat_span, longitude + lng_span)
+
+    return [
+        f"{row}:{col}"
+        for row in range(min_row, max_row + 1)
+        for col in range(min_col, max_col + 1)
+    ]
+
+
+def get_barber_coordinates(barber):
+    address = (
+        Address.objects.filter(user=barber, latitude__isnull=False, longitude__isnull=False)
+        .order_by('-is_default', '-created_at')
+        .first()
+    )
+    if not address:
+        return None, None
+    return address.latitude, address.longitude
+
+
+def refresh_barber_geo_index(barber):
+    latitude, longitude = get_barber_coordinates(barber)
+
+    if latitude is None or longitude is None:
+        BarberGeoIndex.objects.filter(barber=barber).delete()
+        return None
+
+    travel_radius_km = (
+        Portfolio.objects.filter(user=barber)
+        .values_list('travel_radius_km', flat=True)
+        .first()
+    )
+    if travel_radius_km is None:
+        travel_radius_km = Portfolio._meta.get_field('travel_radius_km').default
+
+    entry, _ = BarberGeoIndex.objects.update_or_create(
+        barber=barber,
+        defaults={
+            'latitude': latitude,
+            'longitude': longitude,
+            'cell': cell_for(latitude, longitude),
+            'travel_radius_km': travel_radius_km,
+        }
+    )
+    return entry
+
+
+def find_nearby_barbers(barbers, latitude, longitude):
+    """Barbers from ``barbers`` whose travel radius covers the point, nearest first.
+
+    Only the grid cells around the point are read, so the cost follows local
+    supply. Each returned barber carries a ``distance_km`` attribute.
+    """
+    entries = BarberGeoIndex.objects.filter(
+        cell__in=cells_around(latitude, longitude),
+        barber__in=barbers,
+    ).select_related('barber')
+
+    nearby = []
+    for entry in entries:
+        distance = haversine_km(latitude, longitude, entry.latitude, entry.longitude)
+        if distance <= min(entry.travel_radius_km, MAX_SEARCH_RADIUS_KM):
+            entry.barber.distance_km = round(distance, 2)
+            nearby.append(entry.barber)
+
+    nearby.sort(key=lambda barber: barber.distance_km)
+    return nearby
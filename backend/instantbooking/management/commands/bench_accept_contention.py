@@ -0,0 +1,108 @@
+import threading
+import time
+import redis
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+from adminsite.models import CategoryModel, ServiceModel
+from authservice.models import User
+from backend.metrics import Histogram
+from customersite.models import Booking, PaymentModel
+from profileservice.models import Address
+from instantbooking import claims
+from instantbooking.views import HandleBarberActions
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark concurrent accepts of the same instant booking with and without "
+        "the Redis claim. Runs against a throwaway test database; use PostgreSQL "
+        "to see real row-lock contention."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--barbers', type=int, default=30, help="Barbers accepting each booking at once.")
+        parser.add_argument('--rounds', type=int, default=20, help="Bookings to contend for per mode.")
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(
+                CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}, PAYMENT_GATEWAY="fake"
+            ):
+                barbers, fixtures = self.setup_fixtures(options['barbers'])
+                for label, ttl in (("row lock only", 0), ("redis claim", 30)):
+                    with override_settings(INSTANT_ACCEPT_CLAIM_TTL_SECONDS=ttl):
+                        self.report(label, self.run_mode(barbers, fixtures, options['rounds']))
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def setup_fixtures(self, barber_count):
+        category = CategoryModel.objects.create(name="Bench", image="categories/bench.png")
+        service = ServiceModel.objects.create(category=category, name="Bench cut", price=200, duration_minutes=30)
+        customer = User.objects.create_user(email="bench-customer@example.com", name="Bench", user_type="customer")
+        address = Address.objects.create(
+            user=customer, name="Bench", mobile="9999999999", building="1", street="Bench Street",
+            city="Kochi", district="Ernakulam", state="Kerala", pincode="682001"
+        )
+        barbers = [
+            User.objects.create_user(
+                email=f"bench-barber{i}@example.com", name=f"Bench Barber {i}", user_type="barber", is_online=True
+            )
+            for i in range(barber_count)
+        ]
+        return barbers, {"customer": customer, "service": service, "address": address}
+
+    def run_mode(self, barbers, fixtures, rounds):
+        latencies = Histogram()
+        statuses = {}
+        lock = threading.Lock()
+        view = HandleBarberActions.as_view()
+        factory = APIRequestFactory()
+
+        for _ in range(rounds):
+            booking = Booking.objects.create(booking_type="INSTANT_BOOKING", total_amount=210, **fixtures)
+            PaymentModel.objects.create(booking=booking, payment_method="COD", final_amount=210)
+            self.clear_claim(booking.id)
+            start = threading.Barrier(len(barbers))
+
+            def accept(barber):
+                request = factory.post("/", {"action": "accept"}, format="json")
+                force_authenticate(request, user=barber)
+                start.wait()
+                started = time.perf_counter()
+                try:
+                    outcome = view(request, barber_id=barber.id, booking_id=booking.id).status_code
+                except Exception as e:
+                    outcome = type(e).__name__
+                finally:
+                    connections.close_all()
+                with lock:
+                    latencies.observe((time.perf_counter() - started) * 1000)
+                    statuses[outcome] = statuses.get(outcome, 0) + 1
+
+            threads = [threading.Thread(target=accept, args=(barber,)) for barber in barbers]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        return latencies.snapshot(), statuses
+
+    def clear_claim(self, booking_id):
+        """Drop a claim left on this booking id by an earlier run; test
+        database ids restart at 1 every time."""
+        try:
+            claims.get_redis().delete(claims.CLAIM_KEY.format(booking_id))
+        except redis.RedisError:
+            pass
+
+    def report(self, label, result):
+        latencies, statuses = result
+        self.stdout.write(
+            f"{label:>14}: p50 {latencies['p50_ms']:.1f} ms, p99 {latencies['p99_ms']:.1f} ms, "
+            f"max {latencies['max_ms']:.1f} ms, outcomes {statuses}"
+        )
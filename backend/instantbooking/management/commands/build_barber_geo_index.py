@@ -0,0 +1,19 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from instantbooking.geo import refresh_barber_geo_index
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Build the dispatch geo index for every barber from their saved address and travel radius."
+
+    def handle(self, *args, **options):
+        indexed = skipped = 0
+        for barber in User.objects.filter(user_type='barber').iterator():
+            if refresh_barber_geo_index(barber):
+                indexed += 1
+            else:
+                skipped += 1
+
+        self.stdout.write(f"Geo index: {indexed} barbers indexed, {skipped} without coordinates.")
@@ -0,0 +1,19 @@
+import asyncio
+from django.core.management.base import BaseCommand
+from instantbooking.scheduler import DispatchScheduler
+
+
+class Command(BaseCommand):
+    help = "Run instant-booking dispatch waves and expire bookings whose last wave lapsed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tick', type=float, default=1.0, help="Timer wheel tick in seconds.")
+        parser.add_argument('--poll', type=float, default=5.0, help="Seconds between reloads of active dispatches.")
+
+    def handle(self, *args, **options):
+        scheduler = DispatchScheduler(tick_seconds=options['tick'], poll_seconds=options['poll'])
+        self.stdout.write("Dispatch scheduler started.")
+        try:
+            asyncio.run(scheduler.run())
+        except KeyboardInterrupt:
+            self.stdout.write("Dispatch scheduler stopped.")
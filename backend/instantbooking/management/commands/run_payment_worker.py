@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from instantbooking.capture import run_due_captures
+
+
+class Command(BaseCommand):
+    help = "Capture Stripe payments of accepted instant bookings, retrying and compensating failures."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds to sleep when nothing is due.")
+        parser.add_argument('--batch', type=int, default=20, help="Captures leased per round.")
+        parser.add_argument('--once', action='store_true', help="Process the due captures once and exit.")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Payment worker started.")
+        try:
+            while True:
+                results = run_due_captures(options['batch'])
+                if results:
+                    self.stdout.write(f"Captures: {results}")
+                if options['once']:
+                    break
+                if not results:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Payment worker stopped.")
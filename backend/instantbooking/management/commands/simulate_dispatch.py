@@ -0,0 +1,290 @@
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import redis
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+from adminsite.models import CategoryModel, ServiceModel
+from authservice.models import User
+from backend import metrics
+from backend.metrics import Histogram
+from barbersite.models import BarberService, Portfolio
+from chat.publisher import publisher
+from customersite.models import Booking, PaymentModel
+from profileservice.models import Address
+from instantbooking import claims, presence
+from instantbooking.geo import refresh_barber_geo_index
+from instantbooking.models import BookingOffer
+from instantbooking.views import ExpireInstantBookingView, HandleBarberActions, MakingFindingBarberRequest
+
+IN_MEMORY_CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+# Barbers and customers are scattered around this point (Kochi).
+CENTER = (9.9312, 76.2673)
+SPREAD_DEG = 0.08
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database with barbers and customers, then drive "
+        "find-barber, accept and expire concurrently and report dispatch metrics. "
+        "Runs with the same --seed replay the same workload. SQLite serializes "
+        "writers, so use PostgreSQL (or --concurrency 1) for meaningful numbers. "
+        "Seeded barbers heartbeat into the configured Redis for the length of "
+        "the run and are removed from it afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--barbers', type=int, default=50)
+        parser.add_argument('--customers', type=int, default=20)
+        parser.add_argument('--bookings', type=int, default=100)
+        parser.add_argument('--concurrency', type=int, default=8, help="Bookings in flight at once.")
+        parser.add_argument('--accepters', type=int, default=3, help="Offered barbers racing to accept each booking.")
+        parser.add_argument('--expire-rate', type=float, default=0.1, help="Share of bookings left to expire.")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--json', dest='json_path', help="Also write the report to this file.")
+
+    def handle(self, *args, **options):
+        self.options = options
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+        # Presence and claim lookups fall back quietly when Redis is not running.
+        if options['verbosity'] < 2:
+            logging.disable(logging.ERROR)
+        self.barbers = {}
+        try:
+            with override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, PAYMENT_GATEWAY="fake"):
+                self.seed()
+                report = self.run()
+        finally:
+            # Test database ids restart at 1 on every run; leave nothing behind
+            # for the next run (or the real app) to mistake for its own.
+            for barber_id in self.barbers:
+                presence.remove(barber_id)
+            logging.disable(logging.NOTSET)
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        self.print_report(report)
+        if options['json_path']:
+            with open(options['json_path'], 'w') as report_file:
+                json.dump(report, report_file, indent=2)
+
+    def scatter(self, rng):
+        return (
+            round(CENTER[0] + rng.uniform(-SPREAD_DEG, SPREAD_DEG), 6),
+            round(CENTER[1] + rng.uniform(-SPREAD_DEG, SPREAD_DEG), 6),
+        )
+
+    def create_address(self, user, rng):
+        latitude, longitude = self.scatter(rng)
+        return Address.objects.create(
+            user=user, name=user.name, mobile="9999999999", building="1", street="Sim Street",
+            city="Kochi", district="Ernakulam", state="Kerala", pincode="682001",
+            is_default=True, latitude=latitude, longitude=longitude
+        )
+
+    def seed(self):
+        rng = random.Random(self.options['seed'])
+        category = CategoryModel.objects.create(name="Simulation", image="categories/sim.png")
+        self.service = ServiceModel.objects.create(
+            category=category, name="Sim cut", price=200, duration_minutes=30
+        )
+
+        self.cells = {}
+        for i in range(self.options['barbers']):
+            barber = User.objects.create_user(
+                email=f"sim-barber{i}@example.com", name=f"Sim Barber {i}", user_type="barber", is_online=True
+            )
+            Portfolio.objects.create(user=barber, expert_at="Haircuts", current_location="Kochi")
+            BarberService.objects.create(barber=barber, service=self.service)
+            self.create_address(barber, rng)
+            self.cells[barber.id] = refresh_barber_geo_index(barber).cell
+            self.barbers[barber.id] = barber
+
+        self.customers = []
+        for i in range(self.options['customers']):
+            customer = User.objects.create_user(
+                email=f"sim-customer{i}@example.com", name=f"Sim Customer {i}", user_type="customer"
+            )
+            self.customers.append((customer, self.create_address(customer, rng)))
+
+    def run(self):
+        self.factory = APIRequestFactory()
+        self.lock = threading.Lock()
+        self.last_heartbeat = None
+        self.accept_latency = Histogram()
+        self.queries = []
+        self.outcomes = {}
+        metrics.reset()
+
+        rng = random.Random(self.options['seed'])
+        plans = [
+            {
+                "customer": self.customers[i % len(self.customers)],
+                "expire": rng.random() < self.options['expire_rate'],
+                "rng": random.Random(rng.random()),
+            }
+            for i in range(self.options['bookings'])
+        ]
+
+        self.heartbeat_barbers()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.options['concurrency']) as pool:
+            list(pool.map(self.simulate_booking, plans))
+        elapsed = time.perf_counter() - started
+        publisher.drain()
+
+        snapshot = metrics.snapshot()
+        counters = snapshot["counters"]
+        histograms = snapshot["histograms"]
+        return {
+            "seed": self.options['seed'],
+            "barbers": self.options['barbers'],
+            "bookings": self.options['bookings'],
+            "elapsed_s": round(elapsed, 3),
+            "outcomes": self.outcomes,
+            "notifications": {
+                "sent": counters.get("notifications.sent", 0),
+                "failed": counters.get("notifications.failed", 0),
+            },
+            "accept_latency_ms": dict(
+                self.accept_latency.snapshot(), p95_ms=self.accept_latency.quantile(0.95)
+            ),
+            "lock_wait_ms": histograms.get("instant_accept.lock_wait_ms"),
+            "lock_hold_ms": histograms.get("instant_accept.lock_ms"),
+            "queries_per_booking": {
+                "avg": round(sum(self.queries) / len(self.queries), 1) if self.queries else 0,
+                "max": max(self.queries, default=0),
+            },
+        }
+
+    def record(self, outcome, query_count=None):
+        with self.lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            if query_count is not None:
+                self.queries.append(query_count)
+
+    def call(self, view, user, **kwargs):
+        request = self.factory.post("/", kwargs.pop("data", {}), format="json")
+        force_authenticate(request, user=user)
+        return view(request, **kwargs)
+
+    def heartbeat_barbers(self):
+        """Keep the seeded barbers live in presence, as their apps would while
+        online. Stops at the first failure, leaving dispatch on its is_online
+        fallback when Redis is down."""
+        with self.lock:
+            if self.last_heartbeat and time.monotonic() - self.last_heartbeat < presence.HEARTBEAT_INTERVAL_SECONDS:
+                return
+            self.last_heartbeat = time.monotonic()
+        for barber_id in self.barbers:
+            if not presence.heartbeat(barber_id, [self.service.id], self.cells[barber_id]):
+                break
+
+    def clear_claim(self, booking_id):
+        """Drop a claim left on this booking id by an earlier run."""
+        try:
+            claims.get_redis().delete(claims.CLAIM_KEY.format(booking_id))
+        except redis.RedisError:
+            pass
+
+    def simulate_booking(self, plan):
+        customer, address = plan["customer"]
+        self.heartbeat_barbers()
+        try:
+            with CaptureQueriesContext(connection) as context:
+                booking = Booking.objects.create(
+                    customer=customer, service=self.service, address=address,
+                    booking_type="INSTANT_BOOKING", total_amount=210
+                )
+                self.clear_claim(booking.id)
+                PaymentModel.objects.create(booking=booking, payment_method="COD", final_amount=210)
+                response = self.call(MakingFindingBarberRequest.as_view(), customer, booking_id=booking.id)
+
+                if response.status_code != 200:
+                    self.call(ExpireInstantBookingView.as_view(), customer, booking_id=booking.id)
+                    self.record("no_barbers", len(context.captured_queries))
+                    return
+
+                if plan["expire"]:
+                    self.call(ExpireInstantBookingView.as_view(), customer, booking_id=booking.id)
+                    self.record("expired", len(context.captured_queries))
+                    return
+
+            offered = sorted(
+                BookingOffer.objects.filter(booking=booking).values_list('barber_id', flat=True)
+            )
+            accepters = plan["rng"].sample(offered, min(self.options['accepters'], len(offered)))
+            accept_queries = self.race_accepts(booking, accepters)
+
+            # Finish the job so the barber can be dispatched again.
+            booking.refresh_from_db()
+            booking.status = "COMPLETED"
+            booking.save()
+            self.record("accepted", len(context.captured_queries) + accept_queries)
+        except Exception as e:
+            self.record(f"error:{type(e).__name__}")
+        finally:
+            connections.close_all()
+
+    def race_accepts(self, booking, barber_ids):
+        start = threading.Barrier(len(barber_ids))
+        query_counts = []
+
+        def accept(barber_id):
+            start.wait()
+            began = time.perf_counter()
+            try:
+                with CaptureQueriesContext(connection) as context:
+                    self.call(
+                        HandleBarberActions.as_view(), self.barbers[barber_id],
+                        data={"action": "accept"}, barber_id=barber_id, booking_id=booking.id
+                    )
+                with self.lock:
+                    self.accept_latency.observe((time.perf_counter() - began) * 1000)
+                    query_counts.append(len(context.captured_queries))
+            except Exception as e:
+                self.record(f"accept_error:{type(e).__name__}")
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=accept, args=(barber_id,)) for barber_id in barber_ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sum(query_counts)
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"Simulated {report['bookings']} bookings over {report['barbers']} barbers "
+            f"(seed {report['seed']}) in {report['elapsed_s']} s"
+        )
+        self.stdout.write(f"  outcomes:            {report['outcomes']}")
+        self.stdout.write(
+            f"  notifications:       {report['notifications']['sent']} sent, "
+            f"{report['notifications']['failed']} failed"
+        )
+        latency = report['accept_latency_ms']
+        self.stdout.write(
+            f"  accept latency:      p50 {latency['p50_ms']:.1f} ms, p95 {latency['p95_ms']:.1f} ms, "
+            f"p99 {latency['p99_ms']:.1f} ms"
+        )
+        for label, key in (("lock wait", "lock_wait_ms"), ("lock hold", "lock_hold_ms")):
+            values = report[key]
+            if values:
+                self.stdout.write(
+                    f"  {label + ':':<20} avg {values['avg_ms']:.1f} ms, p99 {values['p99_ms']:.1f} ms, "
+                    f"max {values['max_ms']:.1f} ms"
+                )
+        self.stdout.write(
+            f"  queries per booking: avg {report['queries_per_booking']['avg']}, "
+            f"max {report['queries_per_booking']['max']}"
+        )
@@ -0,0 +1,42 @@
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from instantbooking import presence
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Mirror the live barber presence registry into User.is_online."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help="Keep syncing every N seconds instead of running once."
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+
+        while True:
+            self.sync()
+            if not interval:
+                break
+            time.sleep(interval)
+
+    def sync(self):
+        live_ids = presence.live_barber_ids()
+        if live_ids is None:
+            # An empty registry would mark every barber offline right after a deploy.
+            self.stderr.write("Presence registry is unavailable or empty; User.is_online left as is.")
+            return
+
+        barbers = User.objects.filter(user_type='barber')
+        went_offline = barbers.filter(is_online=True).exclude(id__in=live_ids).update(is_online=False)
+        came_online = barbers.filter(is_online=False, id__in=live_ids).update(is_online=True)
+
+        self.stdout.write(
+            f"Presence sync: {len(live_ids)} live, {went_offline} marked offline, {came_online} marked online."
+        )
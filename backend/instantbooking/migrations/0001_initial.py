@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BarberGeoIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('cell', models.CharField(db_index=True, max_length=32)),
+                ('travel_radius_km', models.FloatField(default=10.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('barber', models.OneToOneField(limit_choices_to={'user_type': 'barber'}, on_delete=django.db.models.deletion.CASCADE, related_name='geo_index', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
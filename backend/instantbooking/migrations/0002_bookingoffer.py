@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customersite', '0003_customerwallettransaction'),
+        ('instantbooking', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingOffer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('OPEN', 'Open'), ('ACCEPTED', 'Accepted'), ('WITHDRAWN', 'Withdrawn'), ('EXPIRED', 'Expired')], default='OPEN', max_length=10)),
+                ('distance_km', models.FloatField(blank=True, null=True)),
+                ('offered_at', models.DateTimeField(auto_now_add=True)),
+                ('closed_at', models.DateTimeField(blank=True, null=True)),
+                ('barber', models.ForeignKey(limit_choices_to={'user_type': 'barber'}, on_delete=django.db.models.deletion.CASCADE, related_name='booking_offers', to=settings.AUTH_USER_MODEL)),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='offers', to='customersite.booking')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['barber', 'status'], name='instantbook_barber__0a56cc_idx'), models.Index(fields=['booking', 'status'], name='instantbook_booking_0a3d02_idx')],
+                'unique_together': {('booking', 'barber')},
+            },
+        ),
+    ]
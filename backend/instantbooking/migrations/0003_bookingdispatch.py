@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customersite', '0003_customerwallettransaction'),
+        ('instantbooking', '0002_bookingoffer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookingoffer',
+            name='wave',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.CreateModel(
+            name='BookingDispatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('wave', models.PositiveIntegerField(default=1)),
+                ('status', models.CharField(choices=[('ACTIVE', 'Active'), ('DONE', 'Done')], default='ACTIVE', max_length=10)),
+                ('next_run_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('booking', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='dispatch', to='customersite.booking')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'next_run_at'], name='instantbook_status_32f1fc_idx')],
+            },
+        ),
+    ]
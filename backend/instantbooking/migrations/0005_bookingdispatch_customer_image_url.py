@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instantbooking', '0004_paymentcapture'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookingdispatch',
+            name='customer_image_url',
+            field=models.URLField(blank=True, default='', max_length=500),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instantbooking', '0005_bookingdispatch_customer_image_url'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='paymentcapture',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('SUCCEEDED', 'Succeeded'), ('FAILED', 'Failed'), ('CANCELLED', 'Cancelled')], default='PENDING', max_length=10),
+        ),
+    ]
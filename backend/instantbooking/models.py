@@ -0,0 +1,97 @@
+from django.db import models
+from authservice.models import User
+from customersite.models import Booking
+
+
+class BarberGeoIndex(models.Model):
+    barber = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='geo_index',
+        limit_choices_to={'user_type': 'barber'}
+    )
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    cell = models.CharField(max_length=32, db_index=True)
+    travel_radius_km = models.FloatField(default=10.0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.barber.name} @ {self.cell} ({self.travel_radius_km} km)"
+
+
+class BookingOffer(models.Model):
+    OFFER_STATUS = [
+        ("OPEN", "Open"),
+        ("ACCEPTED", "Accepted"),
+        ("WITHDRAWN", "Withdrawn"),
+        ("EXPIRED", "Expired"),
+    ]
+
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='offers')
+    barber = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='booking_offers',
+        limit_choices_to={'user_type': 'barber'}
+    )
+    status = models.CharField(max_length=10, choices=OFFER_STATUS, default="OPEN")
+    wave = models.PositiveIntegerField(default=1)
+    distance_km = models.FloatField(null=True, blank=True)
+    offered_at = models.DateTimeField(auto_now_add=True)
+    closed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ['booking', 'barber']
+        indexes = [
+            models.Index(fields=['barber', 'status']),
+            models.Index(fields=['booking', 'status']),
+        ]
+
+    def __str__(self):
+        return f"Booking #{self.booking_id} → {self.barber.name} ({self.status})"
+
+
+class BookingDispatch(models.Model):
+    DISPATCH_STATUS = [
+        ("ACTIVE", "Active"),
+        ("DONE", "Done"),
+    ]
+
+    booking = models.OneToOneField(Booking, on_delete=models.CASCADE, related_name='dispatch')
+    wave = models.PositiveIntegerField(default=1)
+    status = models.CharField(max_length=10, choices=DISPATCH_STATUS, default="ACTIVE")
+    next_run_at = models.DateTimeField()
+    # Absolute URL sent with every wave's offers and with replayed offers.
+    customer_image_url = models.URLField(max_length=500, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_run_at'])]
+
+    def __str__(self):
+        return f"Dispatch for Booking #{self.booking_id} - wave {self.wave} ({self.status})"
+
+
+class PaymentCapture(models.Model):
+    CAPTURE_STATUS = [
+        ("PENDING", "Pending"),
+        ("SUCCEEDED", "Succeeded"),
+        ("FAILED", "Failed"),
+        ("CANCELLED", "Cancelled"),
+    ]
+
+    booking = models.OneToOneField(Booking, on_delete=models.CASCADE, related_name='capture')
+    status = models.CharField(max_length=10, choices=CAPTURE_STATUS, default="PENDING")
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField()
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    def __str__(self):
+        return f"Capture for Booking #{self.booking_id} ({self.status}, {self.attempts} attempts)"
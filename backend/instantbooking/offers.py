@@ -0,0 +1,72 @@
+from django.utils import timezone
+from .models import BookingOffer
+
+
+def booking_request_event(booking, image_url=None, distance_km=None):
+    return {
+        "type": "new_booking_request",
+        "booking_id": booking.id,
+        "service": booking.service.name,
+        "customer_name": booking.customer.name,
+        "customer_id": booking.customer.id,
+        "address": str(booking.address),
+        "total_amount": str(booking.total_amount),
+        "barber_image": image_url,
+        "distance_km": distance_km,
+    }
+
+
+def record_offers(booking, barbers, wave=1):
+    """Add every barber the booking is being offered to. Re-offering is a no-op."""
+    BookingOffer.objects.bulk_create(
+        [
+            BookingOffer(
+                booking=booking,
+                barber=barber,
+                wave=wave,
+                distance_km=getattr(barber, 'distance_km', None)
+            )
+            for barber in barbers
+        ],
+        ignore_conflicts=True
+    )
+
+
+def close_offers(booking, status, accepted_barber=None):
+    """Close the open offers of a booking and return the barber ids that held them.
+
+    The accepting barber's offer is marked ACCEPTED and is not returned.
+    """
+    closed_at = timezone.now()
+    open_offers = BookingOffer.objects.filter(booking=booking, status="OPEN")
+
+    if accepted_barber is not None:
+        open_offers.filter(barber=accepted_barber).update(status="ACCEPTED", closed_at=closed_at)
+        open_offers = open_offers.exclude(barber=accepted_barber)
+
+    barber_ids = list(open_offers.values_list('barber_id', flat=True))
+    BookingOffer.objects.filter(booking=booking, barber_id__in=barber_ids, status="OPEN").update(
+        status=status, closed_at=closed_at
+    )
+    return barber_ids
+
+
+def open_offers_for_barber(barber_id):
+    return (
+        BookingOffer.objects.filter(
+            barber_id=barber_id,
+            status="OPEN",
+            booking__status="PENDING",
+            booking__barber__isnull=True,
+        )
+        .select_related('booking__customer', 'booking__service', 'booking__address', 'booking__dispatch')
+        .order_by('offered_at')
+    )
+
+
+def pending_offer_events(barber_id):
+    """The open offers of a reconnecting barber, as sent when they were made."""
+    return [
+        booking_request_event(offer.booking, offer.booking.dispatch.customer_image_url or None, offer.distance_km)
+        for offer in open_offers_for_barber(barber_id)
+    ]
@@ -0,0 +1,137 @@
+import logging
+import time
+import redis
+from django.conf import settings
+from barbersite.models import BarberService
+from .models import BarberGeoIndex
+
+logger = logging.getLogger(__name__)
+
+# A barber is live while heartbeats keep arriving; a dead app drops out after the TTL.
+PRESENCE_TTL_SECONDS = 90
+HEARTBEAT_INTERVAL_SECONDS = 30
+
+BARBER_KEY = "presence:barber:{}"
+SERVICE_INDEX_KEY = "presence:service:{}"
+CELL_INDEX_KEY = "presence:cell:{}"
+ALL_INDEX_KEY = "presence:all"
+
+_client = None
+
+
+def get_redis():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            socket_connect_timeout=1,
+            socket_timeout=1,
+        )
+    return _client
+
+
+def get_presence_profile(barber_id):
+    service_ids = list(
+        BarberService.objects.filter(barber_id=barber_id, is_active=True)
+        .values_list('service_id', flat=True)
+    )
+    cell = (
+        BarberGeoIndex.objects.filter(barber_id=barber_id)
+        .values_list('cell', flat=True)
+        .first()
+    )
+    return service_ids, cell
+
+
+def heartbeat(barber_id, service_ids=None, cell=None):
+    """Mark a barber live for another PRESENCE_TTL_SECONDS.
+
+    Index entries are sorted-set members scored by their expiry time, so stale
+    members are ignored on read and pruned lazily.
+    """
+    if service_ids is None:
+        service_ids, cell = get_presence_profile(barber_id)
+
+    expires_at = time.time() + PRESENCE_TTL_SECONDS
+    index_keys = [ALL_INDEX_KEY] + [SERVICE_INDEX_KEY.format(service_id) for service_id in service_ids]
+    if cell:
+        index_keys.append(CELL_INDEX_KEY.format(cell))
+
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.set(BARBER_KEY.format(barber_id), cell or "", ex=PRESENCE_TTL_SECONDS)
+        for key in index_keys:
+            pipe.zadd(key, {str(barber_id): expires_at})
+            pipe.expire(key, PRESENCE_TTL_SECONDS * 2)
+        pipe.execute()
+        return True
+    except redis.RedisError as e:
+        logger.error(f"Presence heartbeat failed for barber {barber_id}: {str(e)}")
+        return False
+
+
+def refresh(barber_id):
+    """Heartbeat only if the barber is still registered (has not gone offline)."""
+    try:
+        if not get_redis().exists(BARBER_KEY.format(barber_id)):
+            return False
+    except redis.RedisError as e:
+        logger.error(f"Presence refresh failed for barber {barber_id}: {str(e)}")
+        return False
+    return heartbeat(barber_id)
+
+
+def remove(barber_id):
+    service_ids, cell = get_presence_profile(barber_id)
+    index_keys = [ALL_INDEX_KEY] + [SERVICE_INDEX_KEY.format(service_id) for service_id in service_ids]
+    if cell:
+        index_keys.append(CELL_INDEX_KEY.format(cell))
+
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.delete(BARBER_KEY.format(barber_id))
+        for key in index_keys:
+            pipe.zrem(key, str(barber_id))
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.error(f"Presence removal failed for barber {barber_id}: {str(e)}")
+
+
+def _live_members(pipe_results):
+    return {int(member) for member in pipe_results}
+
+
+def live_barber_ids(service_id=None, cells=None):
+    """Ids of live barbers, optionally limited to a service and a set of grid cells.
+
+    Returns ``None`` when the registry cannot be reached, or holds no live
+    barber at all (as right after a deploy, before sockets have heartbeated),
+    so callers can fall back to the ``User.is_online`` mirror. Expired members
+    of every index read are pruned.
+    """
+    now = time.time()
+    index_key = SERVICE_INDEX_KEY.format(service_id) if service_id else ALL_INDEX_KEY
+    cell_keys = [CELL_INDEX_KEY.format(cell) for cell in cells or []]
+
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.zcount(ALL_INDEX_KEY, now, "+inf")
+        for key in [index_key] + cell_keys:
+            pipe.zremrangebyscore(key, "-inf", now)
+            pipe.zrangebyscore(key, now, "+inf")
+        results = pipe.execute()
+    except redis.RedisError as e:
+        logger.error(f"Presence registry unavailable: {str(e)}")
+        return None
+
+    if not results[0]:
+        return None
+
+    live_ids = _live_members(results[2])
+    if cells is not None:
+        in_cells = set()
+        for members in results[4::2]:
+            in_cells |= _live_members(members)
+        live_ids &= in_cells
+    return live_ids
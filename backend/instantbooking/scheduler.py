@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import math
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from .dispatch import advance_dispatch
+from .models import BookingDispatch
+
+logger = logging.getLogger(__name__)
+
+
+class TimerWheel:
+    """Hashed timer wheel: scheduling and cancelling are O(1) and every tick
+    only looks at the timers stored in one slot."""
+
+    def __init__(self, tick_seconds=1.0, slots=64):
+        self.tick_seconds = tick_seconds
+        self.slots = [dict() for _ in range(slots)]
+        self.position = 0
+        self._slot_of = {}
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    def __contains__(self, key):
+        return key in self._slot_of
+
+    def schedule(self, key, delay_seconds):
+        self.cancel(key)
+        ticks = max(1, math.ceil(delay_seconds / self.tick_seconds))
+        slot = (self.position + ticks) % len(self.slots)
+        self.slots[slot][key] = (ticks - 1) // len(self.slots)
+        self._slot_of[key] = slot
+
+    def cancel(self, key):
+        slot = self._slot_of.pop(key, None)
+        if slot is not None:
+            self.slots[slot].pop(key, None)
+
+    def advance(self):
+        """Move one tick forward and return the keys that became due."""
+        self.position = (self.position + 1) % len(self.slots)
+        bucket = self.slots[self.position]
+
+        due = []
+        for key, rounds in list(bucket.items()):
+            if rounds:
+                bucket[key] = rounds - 1
+            else:
+                del bucket[key]
+                del self._slot_of[key]
+                due.append(key)
+        return due
+
+
+class DispatchScheduler:
+    """Drives BookingDispatch rows through their waves on a timer wheel.
+
+    Active dispatches are (re)loaded from the database every ``poll_seconds``
+    so bookings started by the web workers are picked up. Row locks in
+    ``advance_dispatch`` keep several scheduler processes from running the
+    same wave twice.
+    """
+
+    def __init__(self, tick_seconds=1.0, poll_seconds=5.0):
+        self.wheel = TimerWheel(tick_seconds=tick_seconds)
+        self.poll_seconds = poll_seconds
+        self.scheduled = {}
+
+    def _schedule(self, booking_id, run_at):
+        delay = (run_at - timezone.now()).total_seconds()
+        self.wheel.schedule(booking_id, max(delay, 0))
+        self.scheduled[booking_id] = run_at
+
+    @sync_to_async
+    def _active_dispatches(self):
+        return list(
+            BookingDispatch.objects.filter(status="ACTIVE").values_list('booking_id', 'next_run_at')
+        )
+
+    async def load(self):
+        active = await self._active_dispatches()
+        active_ids = set()
+
+        for booking_id, run_at in active:
+            active_ids.add(booking_id)
+            if self.scheduled.get(booking_id) != run_at:
+                self._schedule(booking_id, run_at)
+
+        for booking_id in set(self.scheduled) - active_ids:
+            self.wheel.cancel(booking_id)
+            del self.scheduled[booking_id]
+
+    async def fire(self, booking_id):
+        self.scheduled.pop(booking_id, None)
+        try:
+            next_run_at = await sync_to_async(advance_dispatch, thread_sensitive=False)(booking_id)
+        except Exception as e:
+            logger.error(f"Dispatch error for booking {booking_id}: {str(e)}")
+            next_run_at = timezone.now() + timedelta(seconds=self.poll_seconds)
+
+        if next_run_at is not None:
+            self._schedule(booking_id, next_run_at)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        next_poll = 0.0
+        next_tick = loop.time()
+
+        while True:
+            if loop.time() >= next_poll:
+                await self.load()
+                next_poll = loop.time() + self.poll_seconds
+
+            due = self.wheel.advance()
+            if due:
+                await asyncio.gather(*(self.fire(booking_id) for booking_id in due))
+
+            next_tick += self.wheel.tick_seconds
+            await asyncio.sleep(max(next_tick - loop.time(), 0))
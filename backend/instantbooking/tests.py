@@ -0,0 +1,840 @@
+import io
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+import stripe
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+from adminsite.models import AdminWallet, AdminWalletTransaction
+from authservice.models import User
+from backend import metrics
+from backend.testing import IN_MEMORY_CHANNEL_LAYERS, DispatchTestMixin
+from barbersite.models import BarberWallet, Portfolio, WalletTransaction
+from customersite.models import BarberCommitment, Booking, CustomerWallet, PaymentModel
+from customersite.views import EmergencyCancel
+from paymentservice import ledger
+from paymentservice.gateway import get_gateway
+from paymentservice.settlement import settle_releasable_payments
+from profileservice.models import Address
+from . import capture, geo, offers, presence
+from .capture import run_due_captures
+from .dispatch import advance_dispatch, expire_instant_booking, start_dispatch
+from .models import BarberGeoIndex, BookingDispatch, BookingOffer, PaymentCapture
+from .scheduler import TimerWheel
+from .views import BookingMixin, CompletedServiceView, HandleBarberActions, MakingFindingBarberRequest
+
+
+SINGLE_WIDE_WAVE = [{"size": 1000, "radius_km": 25, "timeout_seconds": 30}]
+
+
+class AvailableBarbersQueryCountTests(DispatchTestMixin, TestCase):
+
+    def count_queries(self, booking):
+        with CaptureQueriesContext(connection) as context:
+            available = BookingMixin.get_available_barbers_for_booking(booking)
+        return len(context.captured_queries), available
+
+    def test_query_count_does_not_grow_with_candidates(self):
+        booking = self.create_booking()
+
+        self.create_barbers(3)
+        small_count, small_available = self.count_queries(booking)
+
+        self.create_barbers(40)
+        large_count, large_available = self.count_queries(booking)
+
+        self.assertEqual(len(small_available), 3)
+        self.assertEqual(len(large_available), 43)
+        self.assertEqual(small_count, 1)
+        self.assertEqual(large_count, small_count)
+
+    def test_busy_barbers_are_excluded(self):
+        free, on_instant, scheduled_soon, scheduled_later = self.create_barbers(4)
+        now = timezone.now()
+
+        self.create_booking(barber=on_instant, status="CONFIRMED")
+        self.create_booking(
+            barber=scheduled_soon, status="CONFIRMED", booking_type="SCHEDULE_BOOKING",
+            service_started_at=now + timedelta(minutes=BookingMixin.SAFETY_BUFFER_MINUTES - 10)
+        )
+        self.create_booking(
+            barber=scheduled_later, status="CONFIRMED", booking_type="SCHEDULE_BOOKING",
+            service_started_at=now + timedelta(minutes=BookingMixin.SAFETY_BUFFER_MINUTES + 60)
+        )
+        booking = self.create_booking()
+
+        available = BookingMixin.get_available_barbers_for_booking(booking)
+
+        self.assertCountEqual(available, [free, scheduled_later])
+        for barber in (free, on_instant, scheduled_soon, scheduled_later):
+            self.assertEqual(
+                barber in available,
+                not BookingMixin.has_active_instant_booking(barber)
+                and not BookingMixin.is_barber_schedule_conflict(barber)
+            )
+
+
+class GeoIndexTests(DispatchTestMixin, TestCase):
+    LAT, LNG = 9.98, 76.28
+
+    def locate(self, barber, km_north, travel_radius_km=10):
+        Address.objects.create(
+            user=barber, name="Shop", mobile="8888888888", building="2", street="Market Road",
+            city="Kochi", district="Ernakulam", state="Kerala", pincode="682011",
+            latitude=self.LAT + km_north / geo.KM_PER_DEGREE, longitude=self.LNG
+        )
+        Portfolio.objects.create(
+            user=barber, expert_at="Fades", current_location="Kochi", travel_radius_km=travel_radius_km
+        )
+
+    def test_cells_around_cover_the_search_radius(self):
+        cells = geo.cells_around(self.LAT, self.LNG, radius_km=25)
+
+        self.assertIn(geo.cell_for(self.LAT, self.LNG), cells)
+        self.assertIn(geo.cell_for(self.LAT + 24 / geo.KM_PER_DEGREE, self.LNG), cells)
+        self.assertNotIn(geo.cell_for(self.LAT + 40 / geo.KM_PER_DEGREE, self.LNG), cells)
+        self.assertLess(len(geo.cells_around(self.LAT, self.LNG, radius_km=5)), len(cells))
+
+    def test_nearby_barbers_are_ordered_by_distance_within_their_radius(self):
+        far, near, short_range, out_of_area, unlocated = self.create_barbers(5)
+        self.locate(far, 8)
+        self.locate(near, 1)
+        self.locate(short_range, 3, travel_radius_km=2)
+        self.locate(out_of_area, 30, travel_radius_km=50)
+        for barber in (far, near, short_range, out_of_area, unlocated):
+            geo.refresh_barber_geo_index(barber)
+
+        nearby = geo.find_nearby_barbers(User.objects.filter(user_type="barber"), self.LAT, self.LNG)
+
+        self.assertEqual(nearby, [near, far])
+        for barber, km in zip(nearby, (1, 8)):
+            self.assertAlmostEqual(barber.distance_km, km, delta=0.05)
+        self.assertEqual(geo.find_nearby_barbers(User.objects.filter(id=far.id), self.LAT, self.LNG), [far])
+
+    def test_located_booking_is_offered_to_local_barbers_nearest_first(self):
+        far, near, out_of_area, busy = self.create_barbers(4)
+        for barber, km in ((far, 6), (near, 2), (out_of_area, 40), (busy, 1)):
+            self.locate(barber, km)
+            geo.refresh_barber_geo_index(barber)
+        self.create_booking(barber=busy, status="CONFIRMED")
+        self.address.latitude, self.address.longitude = self.LAT, self.LNG
+        self.address.save()
+
+        available = BookingMixin.get_available_barbers_for_booking(self.create_booking())
+
+        self.assertEqual(available, [near, far])
+        self.address.latitude = self.address.longitude = None
+        self.address.save()
+        # Without coordinates the booking still reaches every free barber.
+        self.assertCountEqual(
+            BookingMixin.get_available_barbers_for_booking(self.create_booking()), [far, near, out_of_area]
+        )
+
+    def test_refresh_follows_the_address_and_command_backfills(self):
+        located, unlocated = self.create_barbers(2)
+        self.locate(located, 2)
+
+        call_command("build_barber_geo_index", stdout=io.StringIO())
+
+        entry = BarberGeoIndex.objects.get()
+        self.assertEqual((entry.barber, entry.cell), (located, geo.cell_for(entry.latitude, entry.longitude)))
+        Address.objects.filter(user=located).update(latitude=None, longitude=None)
+        self.assertIsNone(geo.refresh_barber_geo_index(located))
+        self.assertFalse(BarberGeoIndex.objects.exists())
+
+
+class PresenceTests(DispatchTestMixin, TestCase):
+    CELL = "99:762"
+
+    def setUp(self):
+        super().setUp()
+        self.barbers = self.create_barbers(3)
+
+    def test_registry_filters_by_service_and_cell(self):
+        near, far, other_service = self.barbers
+        presence.heartbeat(near.id, [self.service.id], self.CELL)
+        presence.heartbeat(far.id, [self.service.id], "100:762")
+        presence.heartbeat(other_service.id, [self.service.id + 1], self.CELL)
+
+        self.assertEqual(presence.live_barber_ids(self.service.id), {near.id, far.id})
+        self.assertEqual(presence.live_barber_ids(self.service.id, [self.CELL]), {near.id})
+        self.assertEqual(presence.live_barber_ids(), {near.id, far.id, other_service.id})
+
+        presence.remove(far.id)
+        self.assertEqual(presence.live_barber_ids(self.service.id), {near.id})
+
+    def test_expired_members_are_pruned_from_every_index_read(self):
+        stale, live, _ = self.barbers
+        presence.heartbeat(stale.id, [self.service.id], self.CELL)
+
+        with mock.patch("time.time", return_value=time.time() + presence.PRESENCE_TTL_SECONDS + 1):
+            presence.heartbeat(live.id, [self.service.id], self.CELL)
+            self.assertEqual(presence.live_barber_ids(self.service.id, [self.CELL]), {live.id})
+            self.assertFalse(presence.refresh(stale.id))
+
+        for key in (presence.SERVICE_INDEX_KEY.format(self.service.id), presence.CELL_INDEX_KEY.format(self.CELL)):
+            self.assertEqual(set(self.redis.sorted_sets[key]), {str(live.id)})
+
+    def test_empty_registry_falls_back_to_is_online(self):
+        offline, *online = self.barbers
+        User.objects.filter(id=offline.id).update(is_online=False)
+        booking = self.create_booking()
+
+        self.assertIsNone(presence.live_barber_ids(self.service.id))
+        self.assertCountEqual(BookingMixin.get_available_barbers_for_booking(booking), online)
+
+        presence.heartbeat(offline.id, [self.service.id])
+        self.assertEqual(BookingMixin.get_available_barbers_for_booking(booking), [offline])
+
+    def test_sync_leaves_is_online_alone_while_registry_is_empty(self):
+        call_command("sync_barber_presence", stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(User.objects.filter(user_type="barber", is_online=True).count(), 3)
+
+        presence.heartbeat(self.barbers[0].id, [self.service.id])
+        call_command("sync_barber_presence", stdout=io.StringIO())
+        self.assertEqual(list(User.objects.filter(user_type="barber", is_online=True)), [self.barbers[0]])
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, INSTANT_DISPATCH_WAVES=SINGLE_WIDE_WAVE)
+class FindBarberRequestQueryCountTests(DispatchTestMixin, TestCase):
+
+    def post_find_barber(self, booking):
+        request = APIRequestFactory().post(f"/instant-booking/bookings/{booking.id}/find-barber/")
+        force_authenticate(request, user=self.customer)
+        with CaptureQueriesContext(connection) as context:
+            response = MakingFindingBarberRequest.as_view()(request, booking_id=booking.id)
+        return response, len(context.captured_queries)
+
+    def test_query_count_is_independent_of_barber_count(self):
+        self.create_barbers(2)
+        small_response, small_count = self.post_find_barber(self.create_booking())
+
+        self.create_barbers(30)
+        large_response, large_count = self.post_find_barber(self.create_booking())
+
+        self.assertEqual(small_response.data["barbers_notified"], 2)
+        self.assertEqual(large_response.data["barbers_notified"], 32)
+        self.assertEqual(large_count, small_count)
+
+
+@override_settings(
+    CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS,
+    INSTANT_DISPATCH_WAVES=[
+        {"size": 2, "radius_km": 5, "timeout_seconds": 30},
+        {"size": 3, "radius_km": 10, "timeout_seconds": 30},
+    ]
+)
+class WaveDispatchTests(DispatchTestMixin, TestCase):
+
+    def make_due(self, booking):
+        BookingDispatch.objects.filter(booking=booking).update(next_run_at=timezone.now())
+
+    def test_waves_widen_then_expire(self):
+        self.create_barbers(6)
+        booking = self.create_booking()
+        PaymentModel.objects.create(booking=booking, payment_method="COD", final_amount=210)
+
+        self.assertEqual(len(start_dispatch(booking)), 2)
+        self.assertIsNotNone(advance_dispatch(booking.id), "dispatch is not due yet")
+        self.assertEqual(BookingOffer.objects.filter(booking=booking).count(), 2)
+
+        self.make_due(booking)
+        self.assertIsNotNone(advance_dispatch(booking.id))
+        self.assertEqual(BookingOffer.objects.filter(booking=booking, wave=2).count(), 3)
+
+        self.make_due(booking)
+        self.assertIsNone(advance_dispatch(booking.id))
+
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, "CANCELLED")
+        self.assertEqual(booking.dispatch.status, "DONE")
+        self.assertFalse(BookingOffer.objects.filter(booking=booking, status="OPEN").exists())
+
+    def test_accepted_booking_stops_dispatch(self):
+        barber = self.create_barbers(1)[0]
+        booking = self.create_booking()
+        start_dispatch(booking)
+
+        Booking.objects.filter(id=booking.id).update(barber=barber, status="CONFIRMED")
+        self.make_due(booking)
+
+        self.assertIsNone(advance_dispatch(booking.id))
+        self.assertEqual(BookingDispatch.objects.get(booking=booking).status, "DONE")
+
+    def test_empty_first_wave_finishes_dispatch_until_retried(self):
+        booking = self.create_booking()
+
+        self.assertEqual(start_dispatch(booking), [])
+        self.assertEqual(BookingDispatch.objects.get(booking=booking).status, "DONE")
+        self.make_due(booking)
+        self.assertIsNone(advance_dispatch(booking.id))
+        self.assertFalse(BookingOffer.objects.exists())
+
+        self.create_barbers(1)
+        self.assertEqual(len(start_dispatch(booking)), 1)
+        self.assertEqual(BookingDispatch.objects.get(booking=booking).status, "ACTIVE")
+
+    @override_settings(PAYMENT_GATEWAY="fake")
+    @mock.patch("instantbooking.dispatch.publisher")
+    def test_expiry_releases_the_card_after_the_cancellation_commits(self, publisher):
+        [barber] = self.create_barbers(1)
+        booking = self.create_booking()
+        get_gateway.cache_clear()
+        gateway = get_gateway()
+        session = gateway.create_checkout_session(payment_intent_data={"capture_method": "manual"})
+        PaymentModel.objects.create(
+            booking=booking, payment_method="STRIPE", transaction_id=session.payment_intent, final_amount=210
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            start_dispatch(booking)
+        publisher.reset_mock()
+        depth = len(connection.savepoint_ids)
+        seen = []
+
+        def cancel(intent_id):
+            seen.append((Booking.objects.get(id=booking.id).status, len(connection.savepoint_ids)))
+            return intent_id
+
+        with mock.patch.object(gateway, "cancel_payment_intent", side_effect=cancel):
+            with self.captureOnCommitCallbacks() as callbacks:
+                self.assertTrue(expire_instant_booking(booking.id))
+
+        self.assertEqual(seen, [("CANCELLED", depth)])
+        self.assertFalse(publisher.publish_many.called)
+        for callback in callbacks:
+            callback()
+        [messages] = publisher.publish_many.call_args.args
+        self.assertEqual([group for group, _ in messages], [f"customer_{self.customer.id}", f"barber_{barber.id}"])
+        self.assertEqual(PaymentModel.objects.get(booking=booking).payment_status, "REFUNDED")
+
+    @mock.patch("instantbooking.dispatch.publisher")
+    def test_later_waves_publish_after_commit(self, publisher):
+        self.create_barbers(6)
+        booking = self.create_booking()
+        with self.captureOnCommitCallbacks(execute=True):
+            start_dispatch(booking)
+        self.make_due(booking)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            advance_dispatch(booking.id)
+            self.assertEqual(publisher.publish_many.call_count, 1)
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(publisher.publish_many.call_count, 2)
+        self.assertEqual(len(publisher.publish_many.call_args.args[0]), 3)
+
+
+@override_settings(
+    CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS,
+    INSTANT_DISPATCH_WAVES=[
+        {"size": 1, "radius_km": 25, "timeout_seconds": 30},
+        {"size": 5, "radius_km": 25, "timeout_seconds": 30},
+    ]
+)
+class OfferLedgerTests(DispatchTestMixin, TestCase):
+    IMAGE_URL = "https://groomnet.example/media/profiles/customer.png"
+
+    def setUp(self):
+        super().setUp()
+        self.barbers = self.create_barbers(3)
+        self.booking = self.create_booking()
+        patcher = mock.patch("instantbooking.dispatch.publisher")
+        self.publisher = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def published_images(self):
+        events = [event for call in self.publisher.publish_many.call_args_list for _, event in call.args[0]]
+        return [event["barber_image"] for event in events]
+
+    def test_record_is_idempotent_and_close_skips_the_accepting_barber(self):
+        first, second, third = self.barbers
+        offers.record_offers(self.booking, [first, second])
+        offers.record_offers(self.booking, [first, second, third], wave=2)
+
+        self.assertEqual(
+            dict(BookingOffer.objects.values_list("barber_id", "wave")), {first.id: 1, second.id: 1, third.id: 2}
+        )
+        self.assertCountEqual(offers.close_offers(self.booking, "WITHDRAWN", accepted_barber=second), [first.id, third.id])
+        self.assertEqual(
+            dict(BookingOffer.objects.values_list("barber_id", "status")),
+            {first.id: "WITHDRAWN", second.id: "ACCEPTED", third.id: "WITHDRAWN"}
+        )
+        self.assertEqual(offers.close_offers(self.booking, "EXPIRED"), [])
+
+    def test_every_wave_and_replay_send_the_same_absolute_image_url(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            start_dispatch(self.booking, self.IMAGE_URL)
+            BookingDispatch.objects.filter(booking=self.booking).update(next_run_at=timezone.now())
+            advance_dispatch(self.booking.id)
+
+        self.assertEqual(self.published_images(), [self.IMAGE_URL] * 3)
+        for barber in self.barbers:
+            [event] = offers.pending_offer_events(barber.id)
+            self.assertEqual((event["booking_id"], event["barber_image"]), (self.booking.id, self.IMAGE_URL))
+
+    def test_replay_skips_offers_for_taken_bookings(self):
+        start_dispatch(self.booking)
+        [offered] = [offer.barber for offer in BookingOffer.objects.all()]
+        self.assertEqual(offers.pending_offer_events(offered.id)[0]["barber_image"], None)
+
+        Booking.objects.filter(id=self.booking.id).update(barber=self.barbers[2], status="CONFIRMED")
+        self.assertEqual(offers.pending_offer_events(offered.id), [])
+
+
+class TimerWheelTests(TestCase):
+
+    def test_timers_fire_after_their_delay(self):
+        wheel = TimerWheel(tick_seconds=1, slots=4)
+        wheel.schedule("soon", 1)
+        wheel.schedule("later", 6)
+        wheel.schedule("cancelled", 2)
+        wheel.cancel("cancelled")
+
+        fired = {tick: wheel.advance() for tick in range(1, 8)}
+
+        self.assertEqual(fired[1], ["soon"])
+        self.assertEqual(fired[6], ["later"])
+        self.assertEqual(sum(len(keys) for keys in fired.values()), 2)
+        self.assertEqual(len(wheel), 0)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, INSTANT_CAPTURE_RETRY_DELAYS=[0], PAYMENT_GATEWAY="fake")
+class DeferredCaptureTests(DispatchTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.barber = self.create_barbers(1)[0]
+        self.booking = self.create_booking(booking_type="INSTANT_BOOKING")
+        get_gateway.cache_clear()
+        self.gateway = get_gateway()
+        session = self.gateway.create_checkout_session(payment_intent_data={"capture_method": "manual"})
+        self.payment = PaymentModel.objects.create(
+            booking=self.booking, payment_method="STRIPE", transaction_id=session.payment_intent, final_amount=210
+        )
+
+    def accept(self):
+        request = APIRequestFactory().post("/", {"action": "accept"}, format="json")
+        force_authenticate(request, user=self.barber)
+        return HandleBarberActions.as_view()(request, barber_id=self.barber.id, booking_id=self.booking.id)
+
+    def gateway_calls(self, name):
+        return [call for call in self.gateway.calls if call[0] == name]
+
+    def test_accept_claims_without_calling_stripe(self):
+        response = self.accept()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.gateway_calls("capture_payment_intent"), [])
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, "CONFIRMED")
+        self.assertEqual(PaymentCapture.objects.get(booking=self.booking).status, "PENDING")
+
+    def test_later_accept_loses_the_claim(self):
+        self.assertEqual(self.accept().status_code, 200)
+        self.barber = self.create_barbers(1)[0]
+
+        self.assertEqual(self.accept().status_code, 409)
+        self.assertEqual(PaymentCapture.objects.filter(booking=self.booking).count(), 1)
+
+    def test_worker_captures_and_retries_transient_errors(self):
+        self.accept()
+        self.gateway.fail_next(stripe.error.APIConnectionError("timeout"))
+
+        self.assertEqual(run_due_captures(), {"RETRY": 1})
+        self.assertEqual(run_due_captures(), {"SUCCEEDED": 1})
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.payment_status, "SUCCESS")
+        self.assertEqual(self.gateway.intents[self.payment.transaction_id].status, "succeeded")
+        self.assertEqual(PaymentCapture.objects.get(booking=self.booking).attempts, 2)
+
+    def test_declined_capture_cancels_booking(self):
+        self.accept()
+        self.gateway.fail_next(stripe.error.CardError("declined", None, "card_declined"))
+
+        self.assertEqual(run_due_captures(), {"FAILED": 1})
+
+        self.booking.refresh_from_db()
+        self.payment.refresh_from_db()
+        self.assertEqual(self.booking.status, "CANCELLED")
+        self.assertEqual(self.payment.payment_status, "FAILED")
+        self.assertEqual(self.gateway_calls("cancel_payment_intent"), [("cancel_payment_intent", self.payment.transaction_id)])
+
+    def cancel(self):
+        request = APIRequestFactory().post("/")
+        force_authenticate(request, user=self.customer)
+        return EmergencyCancel.as_view()(request, booking_id=self.booking.id)
+
+    def test_cancel_before_capture_releases_the_card(self):
+        self.accept()
+
+        self.assertEqual(self.cancel().status_code, 200)
+        self.assertEqual(run_due_captures(), {})
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.payment_status, "REFUNDED")
+        self.assertEqual(PaymentCapture.objects.get(booking=self.booking).status, "CANCELLED")
+        self.assertEqual(self.gateway.intents[self.payment.transaction_id].status, "canceled")
+        self.assertEqual(self.gateway_calls("capture_payment_intent"), [])
+
+    def test_cancel_during_capture_refunds_the_captured_payment(self):
+        self.accept()
+
+        def capture_then_cancel(payment):
+            self.gateway.capture_payment_intent(payment.transaction_id)
+            self.assertEqual(Decimal(self.cancel().data["refund_amount"]), Decimal("189"))
+
+        with mock.patch("instantbooking.capture._capture_intent", side_effect=capture_then_cancel):
+            self.assertEqual(run_due_captures(), {"CANCELLED": 1})
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.payment_status, "REFUNDED")
+        self.assertEqual(ledger.customer_wallet(self.customer).account_total_balance, 189)
+
+    @mock.patch("instantbooking.capture.publisher")
+    def test_failed_capture_of_cancelled_booking_is_not_announced(self, publisher):
+        self.accept()
+        capture_intent = capture._capture_intent
+
+        def cancel_then_capture(payment):
+            self.cancel()
+            capture_intent(payment)
+
+        with mock.patch("instantbooking.capture._capture_intent", side_effect=cancel_then_capture):
+            self.assertEqual(run_due_captures(), {"CANCELLED": 1})
+
+        publisher.publish_many.assert_not_called()
+        self.assertEqual(PaymentCapture.objects.get(booking=self.booking).status, "CANCELLED")
+
+    def test_worker_skips_bookings_no_longer_confirmed(self):
+        self.accept()
+        Booking.objects.filter(id=self.booking.id).update(status="CANCELLED")
+
+        self.assertEqual(run_due_captures(), {"CANCELLED": 1})
+        self.assertEqual(self.gateway_calls("capture_payment_intent"), [])
+
+    def test_worker_captures_bookings_completed_first(self):
+        self.accept()
+        request = APIRequestFactory().post("/", {"action": "complete_service"}, format="json")
+        force_authenticate(request, user=self.barber)
+        self.assertEqual(CompletedServiceView.as_view()(request, booking_id=self.booking.id).status_code, 200)
+
+        self.assertEqual(run_due_captures(), {"SUCCEEDED": 1})
+        self.assertEqual(
+            self.gateway_calls("capture_payment_intent"), [("capture_payment_intent", self.payment.transaction_id)]
+        )
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.payment_status, "SUCCESS")
+        self.assertIsNotNone(self.payment.releasable_at)
+
+    def test_gateway_calls_are_timed_and_awaitable(self):
+        metrics.reset()
+        intent = async_to_sync(self.gateway.capture_payment_intent_async)(self.payment.transaction_id)
+
+        self.assertEqual(intent.status, "succeeded")
+        self.assertEqual(metrics.snapshot()["histograms"]["stripe.capture_payment_intent_ms"]["count"], 1)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class AcceptClaimTests(DispatchTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.barber = self.create_barbers(1)[0]
+        self.booking = self.create_booking(booking_type="INSTANT_BOOKING")
+        PaymentModel.objects.create(booking=self.booking, payment_method="COD", final_amount=210)
+
+        patcher = mock.patch("instantbooking.claims.get_redis")
+        self.redis = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+    def accept(self):
+        request = APIRequestFactory().post("/", {"action": "accept"}, format="json")
+        force_authenticate(request, user=self.barber)
+        return HandleBarberActions.as_view()(request, barber_id=self.barber.id, booking_id=self.booking.id)
+
+    def test_losing_claim_gets_conflict_without_queries(self):
+        self.redis.set.return_value = None
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.accept()
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(len(context.captured_queries), 0)
+        self.booking.refresh_from_db()
+        self.assertIsNone(self.booking.barber)
+
+    def test_winning_claim_accepts_and_keeps_token(self):
+        self.redis.set.return_value = True
+
+        response = self.accept()
+
+        self.assertEqual(response.status_code, 200)
+        self.redis.set.assert_called_once_with(
+            f"claim:booking:{self.booking.id}", str(self.barber.id), nx=True, ex=30
+        )
+        self.redis.eval.assert_not_called()
+
+    def test_failed_accept_releases_claim(self):
+        self.redis.set.return_value = True
+        Booking.objects.filter(id=self.booking.id).update(status="CANCELLED")
+
+        response = self.accept()
+
+        self.assertEqual(response.status_code, 404)
+        self.redis.eval.assert_called_once()
+
+
+class BarberCommitmentTests(DispatchTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.barber = self.create_barbers(1)[0]
+
+    def commitment(self):
+        return BarberCommitment.objects.get(barber=self.barber)
+
+    def test_commitment_follows_booking_lifecycle(self):
+        soon = timezone.now() + timedelta(minutes=30)
+        instant = self.create_booking(booking_type="INSTANT_BOOKING")
+        scheduled = self.create_booking(
+            barber=self.barber, booking_type="SCHEDULE_BOOKING", status="PENDING", service_started_at=soon
+        )
+        self.assertIsNone(self.commitment().next_scheduled_booking)
+
+        scheduled.status = "CONFIRMED"
+        scheduled.save()
+        instant.barber = self.barber
+        instant.status = "CONFIRMED"
+        instant.save()
+        self.assertEqual(self.commitment().next_scheduled_booking, scheduled)
+        self.assertEqual(self.commitment().active_instant_booking, instant)
+
+        instant.status = "COMPLETED"
+        instant.save()
+        scheduled.status = "CANCELLED"
+        scheduled.save()
+        self.assertIsNone(self.commitment().active_instant_booking)
+        self.assertIsNone(self.commitment().next_scheduled_at)
+
+    def test_reassigned_booking_updates_previous_barber(self):
+        other = self.create_barbers(1)[0]
+        booking = self.create_booking(barber=self.barber, status="CONFIRMED")
+
+        booking = Booking.objects.get(id=booking.id)
+        booking.barber = other
+        booking.save()
+
+        self.assertIsNone(self.commitment().active_instant_booking)
+        self.assertEqual(BarberCommitment.objects.get(barber=other).active_instant_booking, booking)
+
+    def test_conflict_checks_are_primary_key_lookups(self):
+        self.create_booking(
+            barber=self.barber, booking_type="SCHEDULE_BOOKING", status="CONFIRMED",
+            service_started_at=timezone.now() + timedelta(minutes=30)
+        )
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertTrue(BookingMixin.is_barber_schedule_conflict(self.barber))
+            self.assertFalse(BookingMixin.has_active_instant_booking(self.barber))
+
+        self.assertEqual(len(context.captured_queries), 2)
+        self.assertNotIn("customersite_booking", context.captured_queries[0]["sql"])
+
+    def test_stale_commitment_is_refreshed(self):
+        now = timezone.now()
+        started = self.create_booking(
+            barber=self.barber, booking_type="SCHEDULE_BOOKING", status="CONFIRMED",
+            service_started_at=now + timedelta(minutes=5)
+        )
+        following = self.create_booking(
+            barber=self.barber, booking_type="SCHEDULE_BOOKING", status="CONFIRMED",
+            service_started_at=now + timedelta(minutes=60)
+        )
+        # The first job starts without its booking being saved again.
+        BarberCommitment.objects.filter(barber=self.barber).update(next_scheduled_at=now - timedelta(minutes=1))
+        booking = self.create_booking()
+
+        self.assertNotIn(self.barber, BookingMixin.get_available_barbers_for_booking(booking))
+        self.assertTrue(BookingMixin.is_barber_schedule_conflict(self.barber))
+        self.assertEqual(self.commitment().next_scheduled_booking, started)
+
+        Booking.objects.filter(id=started.id).update(status="COMPLETED")
+        BarberCommitment.objects.filter(barber=self.barber).update(next_scheduled_at=now - timedelta(minutes=1))
+        self.assertTrue(BookingMixin.is_barber_schedule_conflict(self.barber))
+        self.assertEqual(self.commitment().next_scheduled_booking, following)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, INSTANT_ACCEPT_CLAIM_TTL_SECONDS=0)
+class AdminEarningsTests(DispatchTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.barber = self.create_barbers(1)[0]
+
+    def complete(self, booking):
+        request = APIRequestFactory().post("/", {"action": "complete_service"}, format="json")
+        force_authenticate(request, user=self.barber)
+        return CompletedServiceView.as_view()(request, booking_id=booking.id)
+
+    def test_completions_append_transactions_and_roll_up(self):
+        wallet = AdminWallet.platform()
+        for _ in range(3):
+            booking = self.create_booking(barber=self.barber, status="CONFIRMED")
+            PaymentModel.objects.create(
+                booking=booking, payment_method="COD", final_amount=210, platform_fee=10
+            )
+            self.assertEqual(self.complete(booking).status_code, 200)
+
+        self.assertFalse(AdminWalletTransaction.objects.exists())
+        settle_releasable_payments()
+
+        wallet.refresh_from_db()
+        self.assertEqual(wallet.total_earnings, 0)
+        self.assertEqual(wallet.balance, 30)
+        self.assertEqual(AdminWalletTransaction.objects.count(), 1)
+
+        with mock.patch.object(AdminWallet, "ROLLUP_SAFETY_SECONDS", 0):
+            self.assertEqual(AdminWallet.roll_up(), 1)
+            self.assertEqual(AdminWallet.roll_up(), 0)
+
+        wallet.refresh_from_db()
+        self.assertEqual(wallet.total_earnings, 30)
+        self.assertEqual(wallet.balance, 30)
+        self.assertEqual(wallet.rolled_up_to_id, AdminWalletTransaction.objects.latest('id').id)
+
+    def test_recent_transactions_wait_for_next_rollup(self):
+        ledger.post(ledger.PAYMENT, [
+            (ledger.EXTERNAL, -50, None),
+            (ledger.platform_wallet(), 50, "Booking #1 - STRIPE payment received"),
+        ])
+
+        self.assertEqual(AdminWallet.roll_up(), 0)
+        self.assertEqual(AdminWallet.platform().balance, 50)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, INSTANT_ACCEPT_CLAIM_TTL_SECONDS=0)
+class LedgerTests(DispatchTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.barber = self.create_barbers(1)[0]
+        self.wallet = ledger.customer_wallet(self.customer)
+        ledger.post(ledger.TOPUP, [(ledger.EXTERNAL, -500, None), (self.wallet, 500, "₹500 added to your wallet")])
+
+    def test_unbalanced_journal_is_rejected(self):
+        with self.assertRaises(ledger.LedgerError):
+            ledger.post(ledger.PAYMENT, [(self.wallet, -100, "Paid"), (ledger.platform_wallet(), 90, "Received")])
+        self.assertEqual(CustomerWallet.objects.get(id=self.wallet.id).account_total_balance, 500)
+
+    def test_wallet_accept_posts_one_journal(self):
+        booking = self.create_booking(booking_type="INSTANT_BOOKING")
+        PaymentModel.objects.create(booking=booking, payment_method="WALLET", final_amount=210)
+
+        request = APIRequestFactory().post("/", {"action": "accept"}, format="json")
+        force_authenticate(request, user=self.barber)
+        response = HandleBarberActions.as_view()(request, barber_id=self.barber.id, booking_id=booking.id)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(CustomerWallet.objects.get(id=self.wallet.id).account_total_balance, 290)
+        customer_entry = self.wallet.transactions.get(kind=ledger.PAYMENT)
+        admin_entry = AdminWalletTransaction.objects.get(journal_id=customer_entry.journal_id)
+        self.assertEqual(customer_entry.amount + admin_entry.amount, 0)
+
+    def test_balances_follow_postings(self):
+        barber_wallet = ledger.barber_wallet(self.barber)
+
+        with CaptureQueriesContext(connection) as context:
+            ledger.post(ledger.FINE, [(self.wallet, -20, "Cancellation Fine #1"), (barber_wallet, 20, "Fine received")])
+
+        # Two inserts and two balance updates plus the barber's daily rollup upsert,
+        # no reads of the wallet rows.
+        writes = [q["sql"] for q in context.captured_queries if not q["sql"].startswith(("SAVEPOINT", "RELEASE"))]
+        self.assertEqual(len(writes), 6)
+        self.assertEqual(CustomerWallet.objects.get(id=self.wallet.id).account_total_balance, 480)
+        self.assertEqual(BarberWallet.objects.get(id=barber_wallet.id).balance, 20)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class SettlementTests(DispatchTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.barbers = self.create_barbers(2)
+        platform = ledger.platform_wallet()
+        ledger.post(ledger.PAYMENT, [(ledger.EXTERNAL, -1000, None), (platform, 1000, "Payment received")])
+
+    def complete(self, barber, payment_method, payment_status="PENDING"):
+        booking = self.create_booking(barber=barber, status="CONFIRMED")
+        PaymentModel.objects.create(
+            booking=booking, payment_method=payment_method, payment_status=payment_status,
+            final_amount=210, platform_fee=10
+        )
+        request = APIRequestFactory().post("/", {"action": "complete_service"}, format="json")
+        force_authenticate(request, user=barber)
+        return CompletedServiceView.as_view()(request, booking_id=booking.id)
+
+    def test_completion_only_marks_payment_releasable(self):
+        response = self.complete(self.barbers[0], "STRIPE", payment_status="SUCCESS")
+
+        self.assertEqual(response.data["earnings"], 200)
+        payment = PaymentModel.objects.get()
+        self.assertIsNotNone(payment.releasable_at)
+        self.assertFalse(payment.is_released_to_barber)
+        self.assertFalse(WalletTransaction.objects.exists())
+
+    def test_batch_posts_one_summary_per_barber_and_kind(self):
+        first, second = self.barbers
+        for _ in range(3):
+            self.complete(first, "STRIPE", payment_status="SUCCESS")
+        self.complete(first, "COD")
+        self.complete(second, "COD")
+        self.complete(second, "STRIPE")  # not yet captured
+
+        batch = settle_releasable_payments()
+
+        self.assertEqual((batch.payment_count, batch.barber_count), (5, 2))
+        self.assertEqual((batch.total_payout, batch.total_fees), (600, 20))
+        self.assertEqual(ledger.barber_wallet(first).balance, 590)
+        self.assertEqual(ledger.barber_wallet(second).balance, -10)
+        self.assertEqual(WalletTransaction.objects.filter(wallet__barber=first).count(), 2)
+        self.assertEqual(PaymentModel.objects.filter(settlement_batch=batch).count(), 5)
+        self.assertEqual(AdminWallet.platform().balance, 1000 - 600 + 20)
+        self.assertIsNone(settle_releasable_payments())
+
+    def test_uncovered_payouts_wait_for_the_next_run(self):
+        ledger.post(ledger.ADJUSTMENT, [(ledger.platform_wallet(), -1000, "Withdrawn"), (ledger.EXTERNAL, 1000, None)])
+        self.complete(self.barbers[0], "STRIPE", payment_status="SUCCESS")
+        self.complete(self.barbers[1], "COD")
+
+        batch = settle_releasable_payments()
+
+        self.assertEqual((batch.payment_count, batch.total_payout, batch.total_fees), (1, 0, 10))
+        self.assertEqual(PaymentModel.objects.filter(is_released_to_barber=False).count(), 1)
+
+    def test_platform_wallet_is_locked_before_its_balance_is_checked(self):
+        self.complete(self.barbers[0], "STRIPE", payment_status="SUCCESS")
+        select_for_update, balance = QuerySet.select_for_update, AdminWallet.balance.fget
+        events = []
+
+        def lock(queryset, *args, **kwargs):
+            events.append(("lock", queryset.model))
+            return select_for_update(queryset, *args, **kwargs)
+
+        def read_balance(wallet):
+            events.append(("balance", AdminWallet))
+            return balance(wallet)
+
+        with mock.patch.object(QuerySet, "select_for_update", lock), \
+                mock.patch.object(AdminWallet, "balance", property(read_balance)):
+            settle_releasable_payments()
+
+        self.assertLess(events.index(("lock", AdminWallet)), events.index(("balance", AdminWallet)))
@@ -1,5 +1,4 @@
-from barbersite.models import BarberWallet, WalletTransaction
-from adminsite.models import AdminWallet, AdminWalletTransaction
+from paymentservice import ledger
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -7,11 +6,11 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
 from django.contrib.auth import get_user_model
 from django.db import transaction
+from django.db.models import BooleanField, Exists, ExpressionWrapper, OuterRef, Q
 from django.utils import timezone
 from datetime import timedelta
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-from customersite.models import Booking, CustomerWallet, CustomerWalletTransaction,PaymentModel
+from chat.publisher import publisher
+from customersite.models import BarberCommitment, Booking, CustomerWallet, PaymentModel
 from .serializers import (
     BarberActionSerializer,
 )
@@ -20,10 +19,14 @@ from django.conf import settings
 import logging
 logger = logging.getLogger("django")
 User = get_user_model()
-import stripe
-
-stripe.api_key = settings.STRIPE_SECRET_KEY
 from barbersite.models import Portfolio , BarberService
+from .geo import cells_around, find_nearby_barbers, refresh_barber_geo_index
+from . import presence
+from .offers import close_offers
+from .dispatch import expire_instant_booking, finish_dispatch, start_dispatch
+from .capture import enqueue_capture
+from .claims import claim_booking, release_claim
+from backend import metrics
 
 
 
@@ -32,77 +35,102 @@ User = get_user_model()
 class BookingMixin:
   
     SAFETY_BUFFER_MINUTES = 90 
+    ACTIVE_INSTANT_STATUSES = BarberCommitment.ACTIVE_INSTANT_STATUSES
 
     @staticmethod
     def has_active_instant_booking(barber):
-        return Booking.objects.filter(
-            barber=barber,
-            booking_type="INSTANT_BOOKING",
-            status__in=["PENDING", "CONFIRMED", "STARTED", "ARRIVED", "ON_THE_WAY"]
+        return BarberCommitment.objects.filter(
+            barber_id=barber.id,
+            active_instant_booking__isnull=False
         ).exists()
 
 
 
     @staticmethod
-    def get_next_scheduled_booking(barber):
-        
-        now = timezone.now()
-        window_end = now + timedelta(hours=24)
-        
-        return Booking.objects.filter(
-            barber=barber,
-            booking_type="SCHEDULE_BOOKING",
-            status="CONFIRMED",
-            service_started_at__gte=now,
-            service_started_at__lte=window_end
-        ).order_by('service_started_at').first()
+    def starts_within_buffer(scheduled_at):
+        if scheduled_at is None:
+            return False
+
+        time_until_next_job = (scheduled_at - timezone.now()).total_seconds() / 60
+        return time_until_next_job < BookingMixin.SAFETY_BUFFER_MINUTES
 
 
 
     @staticmethod
     def is_barber_schedule_conflict(barber, instant_booking_request=None):
-        next_scheduled = BookingMixin.get_next_scheduled_booking(barber)
-        
-        if not next_scheduled:
-            return False 
+        commitment = BarberCommitment.for_barber(barber.id)
+        return BookingMixin.starts_within_buffer(commitment.next_scheduled_at)
 
-        now = timezone.now()
-        time_until_next_job = (next_scheduled.service_started_at - now).total_seconds() / 60
-       
-        if time_until_next_job < BookingMixin.SAFETY_BUFFER_MINUTES:
-            return True 
 
-        return False
 
 
+    @staticmethod
+    def annotate_availability(barbers):
+        """Annotate the same rules as ``has_active_instant_booking`` and
+        ``is_barber_schedule_conflict`` so a whole queryset is checked in one query."""
+        now = timezone.now()
+        buffer_end = now + timedelta(minutes=BookingMixin.SAFETY_BUFFER_MINUTES)
 
+        active_instant = BarberCommitment.objects.filter(
+            barber=OuterRef('pk'),
+            active_instant_booking__isnull=False
+        )
+        next_job_within_buffer = BarberCommitment.objects.filter(
+            barber=OuterRef('pk'),
+            next_scheduled_at__gte=now,
+            next_scheduled_at__lt=buffer_end
+        )
+        # A stale commitment (its booking already started) says nothing about
+        # the next job, so only those barbers fall back to the booking table.
+        stale_commitment = BarberCommitment.objects.filter(
+            barber=OuterRef('pk'),
+            next_scheduled_at__lt=now
+        )
+        scheduled_within_buffer = Booking.objects.filter(
+            barber=OuterRef('pk'),
+            booking_type="SCHEDULE_BOOKING",
+            status="CONFIRMED",
+            service_started_at__gte=now,
+            service_started_at__lt=buffer_end
+        )
 
-    @staticmethod
-    def has_conflicting_scheduled_booking(barber):
-        return BookingMixin.is_barber_schedule_conflict(barber)
+        return barbers.annotate(
+            has_active_instant=Exists(active_instant),
+            has_schedule_conflict=ExpressionWrapper(
+                Q(Exists(next_job_within_buffer)) | (Q(Exists(stale_commitment)) & Q(Exists(scheduled_within_buffer))),
+                output_field=BooleanField()
+            ),
+        )
 
 
 
     @staticmethod
     def get_available_barbers_for_booking(booking):
+        address = booking.address
+        has_location = address.latitude is not None and address.longitude is not None
+        cells = cells_around(address.latitude, address.longitude) if has_location else None
+
         potential_barbers = User.objects.filter(
             user_type='barber',
-            is_online=True,
             barber_services__service=booking.service,
             barber_services__is_active=True 
         ).distinct()
 
-        available_barbers = []
-        for barber in potential_barbers:
-            if BookingMixin.has_active_instant_booking(barber):
-                continue
-            
-            if BookingMixin.is_barber_schedule_conflict(barber, booking):
-                continue
-                
-            available_barbers.append(barber)
-            
-        return available_barbers
+        live_ids = presence.live_barber_ids(booking.service_id, cells)
+        if live_ids is None:
+            potential_barbers = potential_barbers.filter(is_online=True)
+        else:
+            potential_barbers = potential_barbers.filter(id__in=live_ids)
+
+        available_barbers = BookingMixin.annotate_availability(potential_barbers).filter(
+            has_active_instant=False,
+            has_schedule_conflict=False
+        )
+
+        if has_location:
+            return find_nearby_barbers(available_barbers, address.latitude, address.longitude)
+
+        return list(available_barbers)
 
 
 
@@ -113,27 +141,29 @@ class MakingFindingBarberRequest(APIView, BookingMixin):
 
     def post(self, request, booking_id):
         try:
-            booking = Booking.objects.get(
+            booking = Booking.objects.select_related('customer', 'service', 'address').get(
                 id=booking_id,
                 status="PENDING",
                 booking_type="INSTANT_BOOKING",
                 barber__isnull=True
             )
 
-            available_barbers = self.get_available_barbers_for_booking(booking)
+            image_url = None
+            if hasattr(booking.customer, 'profileimage') and booking.customer.profileimage:
+                image_url = request.build_absolute_uri(booking.customer.profileimage.url)
+
+            offered_barbers = start_dispatch(booking, image_url)
             
-            if not available_barbers:
+            if not offered_barbers:
                 self._notify_customer_no_barbers_available(booking)
                 return Response(
                     {"message": "No barbers available at the moment."},
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            self._notify_barbers_new_booking(request, booking, available_barbers)
-
             return Response({
                 "message": "Booking request sent.",
-                "barbers_notified": len(available_barbers)
+                "barbers_notified": len(offered_barbers)
             }, status=status.HTTP_200_OK)
 
         except Booking.DoesNotExist:
@@ -143,8 +173,7 @@ class MakingFindingBarberRequest(APIView, BookingMixin):
 
     def _notify_customer_no_barbers_available(self, booking):
         
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
+        publisher.publish(
             f"customer_{booking.customer.id}",
             {
                 "type": "no_barbers_available",
@@ -156,36 +185,6 @@ class MakingFindingBarberRequest(APIView, BookingMixin):
 
 
 
-    def _notify_barbers_new_booking(self, request, booking, barbers):
-        
-        channel_layer = get_channel_layer()
-        
-        image_url = None
-        if hasattr(booking.customer, 'profileimage') and booking.customer.profileimage:
-            image_url = request.build_absolute_uri(booking.customer.profileimage.url)
-
-        for barber in barbers:
-            group_name = f"barber_{barber.id}"
-            try:
-                async_to_sync(channel_layer.group_send)(
-                    group_name,
-                    {
-                        "type": "new_booking_request",
-                        "booking_id": booking.id,
-                        "service": booking.service.name,
-                        "customer_name": booking.customer.name,
-                        "customer_id": booking.customer.id, 
-                        "address": str(booking.address),
-                        "total_amount": str(booking.total_amount),
-                        "barber_image": image_url,
-                    }
-                )
-            except Exception as e:
-                logger.error(f"Socket Error for barber {barber.id}: {str(e)}")
-
-
-
-
 
 class DoggleStatusView(APIView, BookingMixin):
     permission_classes = [IsAuthenticated]
@@ -195,19 +194,14 @@ class DoggleStatusView(APIView, BookingMixin):
             barber = User.objects.get(id=barber_id, user_type='barber')
             
             
-            has_conflict = self.is_barber_schedule_conflict(barber)
-            next_booking_time = None
-            
-            if has_conflict:
-                next_job = self.get_next_scheduled_booking(barber)
-                if next_job:
-                    next_booking_time = next_job.service_started_at
+            commitment = BarberCommitment.for_barber(barber.id)
+            has_conflict = self.starts_within_buffer(commitment.next_scheduled_at)
 
             return Response({
                 'is_online': barber.is_online,
-                'has_active_instant_booking': self.has_active_instant_booking(barber),
+                'has_active_instant_booking': commitment.active_instant_booking_id is not None,
                 'has_upcoming_scheduled_booking': has_conflict,
-                'next_booking_time': next_booking_time 
+                'next_booking_time': commitment.next_scheduled_at if has_conflict else None
             }, status=200)
         except User.DoesNotExist:
             return Response({'message': 'Barber not found'}, status=404)
@@ -237,13 +231,15 @@ class DoggleStatusView(APIView, BookingMixin):
 
 
     def _handle_go_online(self, barber):
-        if self.has_active_instant_booking(barber):
+        commitment = BarberCommitment.for_barber(barber.id)
+
+        if commitment.active_instant_booking_id is not None:
             return Response({
                 'message': 'Finish your current booking before going online.',
                 'error_code': 'ACTIVE_BOOKING'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        if self.is_barber_schedule_conflict(barber):
+        if self.starts_within_buffer(commitment.next_scheduled_at):
             return Response({
                 'message': 'Upcoming scheduled booking soon (within 90 mins). Cannot go online.',
                 'error_code': 'SCHEDULE_CONFLICT'
@@ -272,6 +268,8 @@ class DoggleStatusView(APIView, BookingMixin):
 
         barber.is_online = True
         barber.save()
+        refresh_barber_geo_index(barber)
+        transaction.on_commit(lambda: presence.heartbeat(barber.id))
         return Response({'message': 'You are now Online.', 'is_online': True}, status=200)
 
 
@@ -280,6 +278,7 @@ class DoggleStatusView(APIView, BookingMixin):
     def _handle_go_offline(self, barber):
         barber.is_online = False
         barber.save()
+        transaction.on_commit(lambda: presence.remove(barber.id))
         return Response({'message': 'You are now Offline.', 'is_online': False}, status=200)
     
 
@@ -355,36 +354,56 @@ class HandleBarberActions(APIView):
         serializer.is_valid(raise_exception=True)
         action = serializer.validated_data['action']
 
-        barber = get_object_or_404(User, id=barber_id, user_type='barber')
-
         if action == 'accept':
-            return self._handle_accept(barber, booking_id)
-        elif action == 'reject':
+            return self._handle_accept(barber_id, booking_id)
+
+        barber = get_object_or_404(User, id=barber_id, user_type='barber')
+        if action == 'reject':
             return self._handle_reject(barber, booking_id)
 
     
     
     
-    def _handle_accept(self, barber, booking_id):
-        with transaction.atomic():
+    def _handle_accept(self, barber_id, booking_id):
+        # Losing barbers are turned away here, before any database work.
+        claimed = claim_booking(booking_id, barber_id)
+        if claimed is False:
+            metrics.increment("instant_accept.claim_lost")
+            return Response({'error': 'Booking already taken by another barber.'}, status=status.HTTP_409_CONFLICT)
+
+        try:
+            barber = get_object_or_404(User, id=barber_id, user_type='barber')
+            response = self._accept_booking(barber, booking_id)
+        except Exception:
+            if claimed:
+                release_claim(booking_id, barber_id)
+            raise
+
+        if claimed and response.status_code != 200:
+            release_claim(booking_id, barber_id)
+        return response
+
+
+
+    def _accept_booking(self, barber, booking_id):
+        # Only the local claim runs under the row locks; Stripe captures are
+        # queued for the payment worker (see capture.py).
+        with metrics.timer("instant_accept.lock_ms"), transaction.atomic():
             try:
-                booking = Booking.objects.select_for_update().get(
-                    id=booking_id,
-                    status="PENDING",
-                    booking_type="INSTANT_BOOKING",
-                    barber__isnull=True
-                )
+                with metrics.timer("instant_accept.lock_wait_ms"):
+                    booking = Booking.objects.select_for_update().get(
+                        id=booking_id,
+                        status="PENDING",
+                        booking_type="INSTANT_BOOKING",
+                        barber__isnull=True
+                    )
             except Booking.DoesNotExist:
                 return Response({'error': 'Booking expired or taken.'}, status=404)
 
             payment = booking.payment
 
             if payment.payment_method == 'STRIPE' and payment.transaction_id:
-                try:
-                    stripe.PaymentIntent.capture(payment.transaction_id)
-                    payment.payment_status = "SUCCESS"
-                except stripe.error.StripeError as e:
-                    return Response({'error': f'Payment capture failed: {str(e)}'}, status=500)
+                enqueue_capture(booking)
            
             elif payment.payment_method == 'WALLET':
                 try:
@@ -392,19 +411,10 @@ class HandleBarberActions(APIView):
                     if customer_wallet.account_total_balance < payment.final_amount:
                         return Response({'error': 'Customer has insufficient wallet balance.'}, status=400)
                    
-                    customer_wallet.account_total_balance -= payment.final_amount
-                    customer_wallet.save()
-                   
-                    CustomerWalletTransaction.objects.create(
-                        wallet=customer_wallet,
-                        amount=-payment.final_amount,
-                        note=f"Paid for Instant Booking #{booking.id}"
-                    )
-                    
-                   
-                    admin_wallet, _ = AdminWallet.objects.get_or_create(id=1)
-                    admin_wallet.total_earnings += payment.final_amount
-                    admin_wallet.save()
+                    ledger.post(ledger.PAYMENT, [
+                        (customer_wallet, -payment.final_amount, f"Paid for Instant Booking #{booking.id}"),
+                        (ledger.platform_wallet(), payment.final_amount, f"Booking #{booking.id} - WALLET payment received"),
+                    ])
                     
                     payment.payment_status = "SUCCESS"
                     
@@ -420,6 +430,7 @@ class HandleBarberActions(APIView):
             booking.travel_status = "NOT_STARTED"
             booking.save()
             payment.save()
+            finish_dispatch(booking)
 
         
         self._notify_customer_success(booking, barber)
@@ -435,12 +446,11 @@ class HandleBarberActions(APIView):
 
 
     def _notify_customer_success(self, booking, barber):
-        channel_layer = get_channel_layer()
         profile_image_url = None
         if hasattr(barber, 'profileimage') and barber.profileimage:
              profile_image_url = self.request.build_absolute_uri(barber.profileimage.url)
 
-        async_to_sync(channel_layer.group_send)(
+        publisher.publish(
             f"customer_{booking.customer.id}",
             {
                 "type": "booking_accepted",
@@ -457,22 +467,21 @@ class HandleBarberActions(APIView):
 
     def _notify_other_barbers_remove(self, booking, accepting_barber):
        
-        channel_layer = get_channel_layer()
-        potential_barbers = User.objects.filter(user_type='barber', is_online=True).exclude(id=accepting_barber.id)
+        offered_barber_ids = close_offers(booking, "WITHDRAWN", accepted_barber=accepting_barber)
         
-        for b in potential_barbers:
-             async_to_sync(channel_layer.group_send)(
-                f"barber_{b.id}",
+        publisher.publish_many(
+            (
+                f"barber_{barber_id}",
                 {"type": "remove_booking", "booking_id": booking.id, "message": "Booking taken."}
             )
+            for barber_id in offered_barber_ids
+        )
 
 
 
     def _notify_customer_no_barbers_available(self, booking):
 
-        channel_layer = get_channel_layer()
-
-        async_to_sync(channel_layer.group_send)(
+        publisher.publish(
             f"customer_{booking.customer.id}",
             {
                 "type": "no_barbers_available",
@@ -482,103 +491,15 @@ class HandleBarberActions(APIView):
         )
 
 
-
-    def _notify_barbers_new_booking(self, booking, barbers):
-
-        channel_layer = get_channel_layer()
-
-        for barber in barbers:
-            async_to_sync(channel_layer.group_send)(
-                f"barber_{barber.id}",
-                {
-                    "type": "new_booking_request",
-                    "booking_id": booking.id,
-                    "service": booking.service.name,
-                    "customer_name": booking.customer.name,
-                    "customer_id": booking.customer.id,
-                    "address": str(booking.address),
-                    "total_amount": str(booking.total_amount)
-                }
-            )
-
-
-
-
 class ExpireInstantBookingView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, booking_id):
         try:
-           
-            booking = Booking.objects.get(
-                id=booking_id,
-                booking_type="INSTANT_BOOKING",
-                status="PENDING",
-                barber__isnull=True
-            )
+            refund_processed = expire_instant_booking(booking_id)
         except Booking.DoesNotExist:
             return Response({"message": "Booking already processed or invalid"}, status=400)
 
-        with transaction.atomic():
-            payment = booking.payment
-            refund_processed = False
-
-         
-            if payment.payment_method == 'STRIPE':
-                try:
-                    if payment.transaction_id:
-                        stripe.PaymentIntent.cancel(payment.transaction_id)
-                        logger.info(f"Stripe Payment cancelled for booking {booking_id}")
-                        refund_processed = True
-                except stripe.error.StripeError as e:
-                    logger.error(f"Stripe refund error: {str(e)}")
-
-            elif payment.payment_method == 'WALLET':
-                try:
-                  
-                    wallet = CustomerWallet.objects.get(user=booking.customer)
-                   
-                    refund_amount = payment.final_amount
-                    wallet.account_total_balance += refund_amount
-                    wallet.save()
-
-                    CustomerWalletTransaction.objects.create(
-                        wallet=wallet,
-                        amount=refund_amount,
-                        note=f"Refund for Booking #{booking.id} (No Barber Found)"
-                    )
-                    
-                    refund_processed = True
-                    logger.info(f"Wallet Refund of ₹{refund_amount} processed for user {booking.customer.id}")
-                    
-                except CustomerWallet.DoesNotExist:
-                    logger.error(f"Wallet not found for user {booking.customer.id}")
-                except Exception as e:
-                    logger.error(f"Wallet refund error: {str(e)}")
-
-            elif payment.payment_method == 'COD':
-                refund_processed = True
-
-            booking.status = "CANCELLED"
-            booking.save()
-            
-            if refund_processed:
-                payment.payment_status = "REFUNDED" if payment.payment_method != 'COD' else 'FAILED'
-            else:
-                payment.payment_status = "FAILED"
-            
-            payment.save()
-           
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                f"customer_{booking.customer.id}",
-                {
-                    "type": "booking_cancelled",
-                    "booking_id": booking.id,
-                    "message": "No barbers available. Payment refunded to your wallet/card."
-                }
-            )
-
         return Response({"status": "expired", "refund_processed": refund_processed}, status=200)
 
 
@@ -616,7 +537,6 @@ class CompletedServiceView(APIView):
     def post(self, request, booking_id):
         booking = get_object_or_404(Booking, id=booking_id)
         action = request.data.get('action')
-        channel_layer = get_channel_layer()
         
         
         if action == 'complete_service':
@@ -625,77 +545,28 @@ class CompletedServiceView(APIView):
                 booking = Booking.objects.select_for_update().get(id=booking_id)
                 payment = PaymentModel.objects.select_for_update().get(booking=booking)
 
-                if booking.status == "COMPLETED" and payment.is_released_to_barber:
+                if booking.status == "COMPLETED" and (payment.is_released_to_barber or payment.releasable_at):
                      return Response({"message": "Service already completed and paid."}, status=200)
 
                 booking.status = "COMPLETED"
                 booking.completed_at = timezone.now()
-                booking.save()
 
                 if payment.payment_method == "COD":
                     payment.payment_status = "SUCCESS"
+
+                # The barber's share is released by the next settlement run
+                # (paymentservice.settlement), not inside this transaction.
+                payment.releasable_at = timezone.now()
                 payment.save()
 
                 earnings_added = 0.0
-
-                if not payment.is_released_to_barber and payment.payment_status == "SUCCESS":
-                    admin_wallet, _ = AdminWallet.objects.select_for_update().get_or_create(id=1)
-                    barber_wallet, _ = BarberWallet.objects.select_for_update().get_or_create(barber=booking.barber)
-                    
-                    final_amount = payment.final_amount
-                    platform_fee = payment.platform_fee
-                    barber_share = final_amount - platform_fee
-                    
-                    if payment.payment_method == "COD":
-                       
-                        barber_wallet.balance -= platform_fee
-                        WalletTransaction.objects.create(
-                            wallet=barber_wallet, 
-                            amount=-platform_fee, 
-                            note=f"Platform Fee for COD Booking #{booking.id}"
-                        )
-                        
-                        admin_wallet.total_earnings += platform_fee
-                        AdminWalletTransaction.objects.create(
-                            wallet=admin_wallet, 
-                            amount=platform_fee, 
-                            note=f"Fee collected from Barber #{booking.barber.id}"
-                        )
-                        earnings_added = float(barber_share) 
-                        
-                    else:
-                    
-                        if admin_wallet.total_earnings >= barber_share:
-                            admin_wallet.total_earnings -= barber_share
-                            barber_wallet.balance += barber_share
-                            
-                            WalletTransaction.objects.create(
-                                wallet=barber_wallet, 
-                                amount=barber_share, 
-                                note=f"Earnings for Booking #{booking.id}"
-                            )
-                            AdminWalletTransaction.objects.create(
-                                wallet=admin_wallet, 
-                                amount=-barber_share, 
-                                note=f"Payout to Barber #{booking.barber.id}"
-                            )
-                            earnings_added = float(barber_share)
-                        else:
-                            logger.error(f"Insufficient Admin Funds to pay Barber {booking.barber.id}")
-
-                    admin_wallet.save()
-                    barber_wallet.save()
-                   
-                    payment.is_released_to_barber = True
-                    payment.released_at = timezone.now()
-                    payment.save()
-                    
+                if payment.payment_status == "SUCCESS":
+                    earnings_added = float(payment.final_amount - payment.platform_fee)
                     booking.is_payment_done = True
-                    booking.save()
+                booking.save()
 
             if booking.barber:
-                channel_layer = get_channel_layer()
-                async_to_sync(channel_layer.group_send)(
+                publisher.publish(
                     f"barber_{booking.barber.id}",
                     {"type": "booking_completed", "booking_id": booking.id}
                 )
@@ -703,14 +574,15 @@ class CompletedServiceView(APIView):
             return Response({
                 "status": "Service marked as completed successfully",
                 "message": "Service has been completed.",
-                "earnings": earnings_added
+                "earnings": earnings_added,
+                "settlement": "pending"
             }, status=200)
 
 
 
 
         if action == 'request_start':
-            async_to_sync(channel_layer.group_send)(
+            publisher.publish(
                 f"customer_{booking.customer.id}",
                 {"type": "service_request", "subtype": "start_request", "booking_id": booking.id}
             )
@@ -720,7 +592,7 @@ class CompletedServiceView(APIView):
 
         if action == 'respond_start':
             response = request.data.get('response') 
-            async_to_sync(channel_layer.group_send)(
+            publisher.publish(
                 f"barber_{booking.barber.id}",
                 {"type": "service_response", "subtype": "start_response", "response": response}
             )
@@ -736,7 +608,7 @@ class CompletedServiceView(APIView):
 
 
         if action == 'request_complete':
-            async_to_sync(channel_layer.group_send)(
+            publisher.publish(
                 f"customer_{booking.customer.id}",
                 {"type": "service_request", "subtype": "complete_request", "booking_id": booking.id}
             )
@@ -745,7 +617,7 @@ class CompletedServiceView(APIView):
 
         if action == 'respond_complete':
             response = request.data.get('response') 
-            async_to_sync(channel_layer.group_send)(
+            publisher.publish(
                 f"barber_{booking.barber.id}",
                 {"type": "service_response", "subtype": "complete_response", "response": response}
             )
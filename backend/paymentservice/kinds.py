@@ -0,0 +1,33 @@
+# Entry kinds shared by the customer, barber and admin wallet transaction tables.
+TOPUP = "TOPUP"
+PAYMENT = "PAYMENT"
+REFUND = "REFUND"
+FINE = "FINE"
+PLATFORM_FEE = "PLATFORM_FEE"
+PAYOUT = "PAYOUT"
+ADJUSTMENT = "ADJUSTMENT"
+
+ENTRY_KINDS = [
+    (TOPUP, "Wallet top-up"),
+    (PAYMENT, "Booking payment"),
+    (REFUND, "Refund"),
+    (FINE, "Cancellation fine"),
+    (PLATFORM_FEE, "Platform fee"),
+    (PAYOUT, "Barber payout"),
+    (ADJUSTMENT, "Adjustment"),
+]
+
+# Income/expense split of the platform wallet, stored on each admin entry.
+INCOME = "INCOME"
+EXPENSE = "EXPENSE"
+
+CATEGORIES = [
+    (INCOME, "Income"),
+    (EXPENSE, "Expense"),
+]
+
+EXPENSE_KINDS = {PAYOUT, REFUND}
+
+
+def category_for(kind):
+    return EXPENSE if kind in EXPENSE_KINDS else INCOME
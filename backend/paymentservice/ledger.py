@@ -0,0 +1,86 @@
+import uuid
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import F
+from adminsite.models import AdminWallet, AdminWalletTransaction
+from barbersite.models import BarberWallet, BarberWalletDaily, WalletTransaction
+from customersite.models import CustomerWallet, CustomerWalletTransaction
+from .kinds import ADJUSTMENT, FINE, PAYMENT, PAYOUT, PLATFORM_FEE, REFUND, TOPUP, category_for
+
+# Counter-account for money entering or leaving the platform (cards, cash).
+# It keeps every journal balanced but has no table of its own.
+EXTERNAL = "EXTERNAL"
+
+# wallet model -> (transaction model, balance column or None when rolled up)
+ACCOUNTS = {
+    CustomerWallet: (CustomerWalletTransaction, 'account_total_balance'),
+    BarberWallet: (WalletTransaction, 'balance'),
+    AdminWallet: (AdminWalletTransaction, None),
+}
+
+# transaction model -> daily rollup kept in step with every insert. The
+# platform wallet's daily totals are built by ``AdminWallet.roll_up`` instead,
+# since every posting would otherwise update the same row.
+DAILY_ROLLUPS = {
+    WalletTransaction: BarberWalletDaily,
+}
+
+
+class LedgerError(Exception):
+    pass
+
+
+def post(kind, entries):
+    """Record one money event as a balanced journal and return its id.
+
+    ``entries`` is a list of ``(wallet, amount, note)`` postings whose amounts
+    sum to zero; use ``EXTERNAL`` as the wallet for money from outside the
+    platform. Each transaction table touched gets one ``bulk_create`` and each
+    wallet balance one ``F()`` update, so no wallet row is read and rewritten.
+    Admin earnings and daily totals are not updated here; see
+    ``AdminWallet.roll_up``.
+    """
+    total = sum((Decimal(amount) for _, amount, _ in entries), Decimal('0'))
+    if total != 0:
+        raise LedgerError(f"Unbalanced {kind} journal: postings sum to {total}")
+
+    journal_id = uuid.uuid4()
+    rows = {}
+    balance_changes = {}
+
+    for wallet, amount, note in entries:
+        if wallet == EXTERNAL or not amount:
+            continue
+        transaction_model, balance_field = ACCOUNTS[type(wallet)]
+        row = transaction_model(wallet=wallet, amount=amount, note=note, kind=kind, journal_id=journal_id)
+        if transaction_model is AdminWalletTransaction:
+            row.category = category_for(kind)
+        rows.setdefault(transaction_model, []).append(row)
+        if balance_field:
+            key = (type(wallet), wallet.pk, balance_field)
+            balance_changes[key] = balance_changes.get(key, Decimal('0')) + Decimal(amount)
+
+    with transaction.atomic():
+        for transaction_model, transactions in rows.items():
+            transaction_model.objects.bulk_create(transactions)
+            if transaction_model in DAILY_ROLLUPS:
+                DAILY_ROLLUPS[transaction_model].add_transactions(transactions)
+        for (wallet_model, wallet_id, balance_field), change in balance_changes.items():
+            if change:
+                wallet_model.objects.filter(pk=wallet_id).update(**{balance_field: F(balance_field) + change})
+
+    return journal_id
+
+
+def customer_wallet(user):
+    wallet, _ = CustomerWallet.objects.get_or_create(user=user)
+    return wallet
+
+
+def barber_wallet(barber):
+    wallet, _ = BarberWallet.objects.get_or_create(barber=barber)
+    return wallet
+
+
+def platform_wallet(lock=False):
+    return AdminWallet.platform(lock=lock)
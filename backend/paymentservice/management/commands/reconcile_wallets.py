@@ -0,0 +1,38 @@
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from paymentservice.reconciliation import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that every wallet balance and daily rollup equals the sum of its "
+        "transaction rows, and write a JSON report of the mismatches with the "
+        "bookings their transactions reference."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Rows fetched per round trip.")
+        parser.add_argument('--fail-on-drift', action='store_true', help="Exit non-zero when anything drifted.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        report = reconcile(options['chunk_size'])
+        report = {
+            "generated_at": timezone.now().isoformat(),
+            "duration_s": round(time.perf_counter() - started, 3),
+            **report,
+        }
+
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                json.dump(report, report_file, indent=2)
+            for check in report["checks"]:
+                self.stdout.write(f"{check['check']}: {check['mismatches']} mismatches")
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
+
+        if options['fail_on_drift'] and report["mismatches"]:
+            raise CommandError(f"{len(report['mismatches'])} wallet mismatches found")
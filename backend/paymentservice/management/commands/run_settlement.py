@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand
+from paymentservice.settlement import settle_releasable_payments
+
+
+class Command(BaseCommand):
+    help = "Release the barber share of completed payments in periodic settlement batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=300.0, help="Seconds between settlement runs.")
+        parser.add_argument('--limit', type=int, default=1000, help="Payments settled per batch.")
+        parser.add_argument('--once', action='store_true', help="Settle what is due now and exit.")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Settlement runner started.")
+        try:
+            while True:
+                # Drain the backlog in full batches before waiting for the next run.
+                while True:
+                    batch = settle_releasable_payments(options['limit'])
+                    if batch is None:
+                        break
+                    self.stdout.write(
+                        f"Settlement #{batch.id}: {batch.payment_count} payments, {batch.barber_count} barbers, "
+                        f"payouts ₹{batch.total_payout}, fees ₹{batch.total_fees}"
+                    )
+                    if batch.payment_count < options['limit']:
+                        break
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Settlement runner stopped.")
@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from paymentservice.webhooks import process_pending_events
+
+
+class Command(BaseCommand):
+    help = "Apply stored Stripe webhook events to payments, bookings and wallets in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds to sleep when the inbox is empty.")
+        parser.add_argument('--batch', type=int, default=100, help="Events applied per round.")
+        parser.add_argument('--once', action='store_true', help="Apply the pending events once and exit.")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Webhook worker started.")
+        try:
+            while True:
+                results = process_pending_events(options['batch'])
+                if results:
+                    self.stdout.write(f"Stripe events: {results}")
+                if options['once']:
+                    break
+                if not results:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Webhook worker stopped.")
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('paymentservice', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SettlementBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('RUNNING', 'Running'), ('SETTLED', 'Settled')], default='RUNNING', max_length=10)),
+                ('payment_count', models.PositiveIntegerField(default=0)),
+                ('barber_count', models.PositiveIntegerField(default=0)),
+                ('total_payout', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_fees', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('settled_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,53 @@
+from django.db import models
+
+
+class StripeEvent(models.Model):
+    """Inbox of Stripe webhook events. The webhook only stores the event;
+    ``paymentservice.webhooks`` applies it later. ``event_id`` is unique so a
+    redelivered event is dropped on arrival."""
+    EVENT_STATUS = [
+        ("PENDING", "Pending"),
+        ("PROCESSED", "Processed"),
+        ("IGNORED", "Ignored"),
+        ("FAILED", "Failed"),
+    ]
+
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    # id of the session or intent the event is about, for the verify endpoints
+    object_id = models.CharField(max_length=255, db_index=True)
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=EVENT_STATUS, default="PENDING")
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'received_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.type} {self.event_id} ({self.status})"
+
+
+class SettlementBatch(models.Model):
+    """One settlement run: the completed payments it released and what was
+    posted for them. Payments point back here through
+    ``PaymentModel.settlement_batch``."""
+    BATCH_STATUS = [
+        ("RUNNING", "Running"),
+        ("SETTLED", "Settled"),
+    ]
+
+    status = models.CharField(max_length=10, choices=BATCH_STATUS, default="RUNNING")
+    payment_count = models.PositiveIntegerField(default=0)
+    barber_count = models.PositiveIntegerField(default=0)
+    total_payout = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_fees = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    settled_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Settlement #{self.id} - {self.payment_count} payments ({self.status})"
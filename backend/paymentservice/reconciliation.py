@@ -0,0 +1,202 @@
+import re
+from contextlib import contextmanager
+from decimal import Decimal
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from adminsite.models import AdminWallet, AdminWalletDaily, AdminWalletTransaction
+from barbersite.models import BarberWallet, BarberWalletDaily, WalletTransaction
+from customersite.models import CustomerWallet, CustomerWalletTransaction
+
+BOOKING_REFERENCE = re.compile(r"#(\d+)")
+MAX_REFERENCED_BOOKINGS = 50
+
+# name -> (wallet model, owner column, balance column, transaction model)
+WALLET_CHECKS = {
+    "customer_wallets": (CustomerWallet, 'user_id', 'account_total_balance', CustomerWalletTransaction),
+    "barber_wallets": (BarberWallet, 'barber_id', 'balance', WalletTransaction),
+}
+
+
+def money(value):
+    return str(Decimal(value).quantize(Decimal('0.01')))
+
+
+def merge_totals(balances, totals):
+    """Walk two streams sorted by wallet id and yield ``(wallet_id, row, total, count)``.
+
+    ``balances`` yields ``(wallet_id, *row)`` and ``totals`` yields
+    ``(wallet_id, total, count)``. Only one row of each stream is held at a
+    time, so memory does not grow with the number of wallets. Wallets without
+    transactions get a zero total; transactions without a wallet get ``row=None``.
+    """
+    balances, totals = iter(balances), iter(totals)
+    balance, total = next(balances, None), next(totals, None)
+    while balance is not None or total is not None:
+        if total is None or (balance is not None and balance[0] < total[0]):
+            yield balance[0], balance[1:], Decimal('0'), 0
+            balance = next(balances, None)
+        elif balance is None or total[0] < balance[0]:
+            yield total[0], None, total[1], total[2]
+            total = next(totals, None)
+        else:
+            yield balance[0], balance[1:], total[1], total[2]
+            balance, total = next(balances, None), next(totals, None)
+
+
+def _transaction_totals(transaction_model, chunk_size, group_by='wallet_id'):
+    return (
+        transaction_model.objects.values_list(group_by)
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by(group_by)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def referenced_bookings(transactions):
+    """Bookings named in the notes of ``transactions``, and the (booking, kind)
+    pairs posted more than once, which is what a duplicated refund or fine
+    looks like."""
+    seen = {}
+    for note, kind in transactions.values_list('note', 'kind').iterator():
+        for booking_id in BOOKING_REFERENCE.findall(note or ""):
+            key = (int(booking_id), kind)
+            seen[key] = seen.get(key, 0) + 1
+
+    booking_ids = sorted({booking_id for booking_id, _ in seen})
+    duplicates = [
+        {"booking_id": booking_id, "kind": kind, "postings": count}
+        for (booking_id, kind), count in sorted(seen.items()) if count > 1
+    ]
+    return booking_ids[:MAX_REFERENCED_BOOKINGS], duplicates
+
+
+def check_wallets(name, chunk_size):
+    wallet_model, owner_field, balance_field, transaction_model = WALLET_CHECKS[name]
+    balances = (
+        wallet_model.objects.order_by('id')
+        .values_list('id', owner_field, balance_field)
+        .iterator(chunk_size=chunk_size)
+    )
+
+    summary = {"check": name, "wallets": 0, "transactions": 0, "mismatches": 0}
+    mismatches = []
+    for wallet_id, row, total, count in merge_totals(balances, _transaction_totals(transaction_model, chunk_size)):
+        summary["wallets"] += row is not None
+        summary["transactions"] += count
+        owner_id, balance = row if row is not None else (None, None)
+        if balance == total:
+            continue
+
+        bookings, duplicates = referenced_bookings(transaction_model.objects.filter(wallet_id=wallet_id))
+        mismatches.append({
+            "check": name,
+            "wallet_id": wallet_id,
+            "owner_id": owner_id,
+            "balance": money(balance) if balance is not None else None,
+            "ledger_total": money(total),
+            "drift": money((balance or 0) - total),
+            "transactions": count,
+            "referenced_bookings": bookings,
+            "duplicate_postings": duplicates,
+        })
+    summary["mismatches"] = len(mismatches)
+    return summary, mismatches
+
+
+def check_barber_daily_totals(chunk_size):
+    daily = (
+        BarberWalletDaily.objects.values_list('wallet_id')
+        .annotate(total=Sum('total'), count=Sum('transaction_count'))
+        .order_by('wallet_id')
+        .iterator(chunk_size=chunk_size)
+    )
+    summary = {"check": "barber_daily_totals", "wallets": 0, "mismatches": 0}
+    mismatches = []
+    for wallet_id, row, total, count in merge_totals(daily, _transaction_totals(WalletTransaction, chunk_size)):
+        summary["wallets"] += 1
+        rolled_total, rolled_count = row if row is not None else (Decimal('0'), 0)
+        if (rolled_total, rolled_count) != (total, count):
+            mismatches.append({
+                "check": "barber_daily_totals",
+                "wallet_id": wallet_id,
+                "rollup_total": money(rolled_total),
+                "ledger_total": money(total),
+                "rollup_count": rolled_count,
+                "transactions": count,
+            })
+    summary["mismatches"] = len(mismatches)
+    return summary, mismatches
+
+
+def check_admin_wallet():
+    mismatches = []
+    platform = AdminWallet.objects.filter(id=AdminWallet.PLATFORM_WALLET_ID).first()
+    rolled_up = AdminWalletTransaction.objects.filter(
+        id__lte=platform.rolled_up_to_id if platform else 0
+    ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+    if platform and platform.total_earnings != rolled_up:
+        mismatches.append({
+            "check": "admin_wallet",
+            "wallet_id": platform.id,
+            "balance": money(platform.total_earnings),
+            "ledger_total": money(rolled_up),
+            "drift": money(platform.total_earnings - rolled_up),
+            "rolled_up_to_id": platform.rolled_up_to_id,
+        })
+
+    by_category = dict(
+        AdminWalletTransaction.objects.filter(id__lte=platform.rolled_up_to_id if platform else 0)
+        .values_list('category').annotate(total=Sum('amount')).order_by()
+    )
+    rolled_by_category = dict(
+        AdminWalletDaily.objects.values_list('category').annotate(total=Sum('total')).order_by()
+    )
+    for category in sorted(set(by_category) | set(rolled_by_category)):
+        ledger_total = by_category.get(category) or Decimal('0')
+        rollup_total = rolled_by_category.get(category) or Decimal('0')
+        if ledger_total != rollup_total:
+            mismatches.append({
+                "check": "admin_daily_totals",
+                "category": category,
+                "rollup_total": money(rollup_total),
+                "ledger_total": money(ledger_total),
+            })
+
+    return {"check": "admin_wallet", "wallets": 1 if platform else 0, "mismatches": len(mismatches)}, mismatches
+
+
+@contextmanager
+def _snapshot():
+    """Run the block in one transaction whose reads all see the same
+    committed state, so a posting landing mid-run cannot show up in a
+    ledger total but not in the balance it was compared with."""
+    outermost = not connection.in_atomic_block
+    with transaction.atomic():
+        if outermost and connection.vendor == 'postgresql':
+            # Must come first in the transaction. READ COMMITTED would take a
+            # new snapshot per statement; MySQL and SQLite already keep one.
+            with connection.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        yield
+
+
+def reconcile(chunk_size=5000):
+    """Compare every stored balance and rollup with the sum of its transaction rows.
+
+    Each table is summed with one ``GROUP BY`` query whose rows are streamed
+    and merge-joined against the wallets in id order, so the run holds a
+    bounded number of rows regardless of table size. Every check reads from
+    one snapshot. Returns a JSON-ready report.
+    """
+    checks, mismatches = [], []
+    with _snapshot():
+        for name in WALLET_CHECKS:
+            summary, found = check_wallets(name, chunk_size)
+            checks.append(summary)
+            mismatches.extend(found)
+
+        for summary, found in (check_barber_daily_totals(chunk_size), check_admin_wallet()):
+            checks.append(summary)
+            mismatches.extend(found)
+
+    return {"checks": checks, "mismatches": mismatches}
@@ -0,0 +1,114 @@
+import logging
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from barbersite.models import BarberWallet
+from customersite.models import PaymentModel
+from . import ledger
+from .models import SettlementBatch
+
+logger = logging.getLogger(__name__)
+
+ZERO = Value(0, output_field=DecimalField())
+
+
+def releasable_payments():
+    return PaymentModel.objects.filter(
+        is_released_to_barber=False,
+        releasable_at__isnull=False,
+        payment_status="SUCCESS",
+        booking__barber__isnull=False,
+    )
+
+
+def _barber_wallets(barber_ids):
+    BarberWallet.objects.bulk_create(
+        [BarberWallet(barber_id=barber_id) for barber_id in barber_ids], ignore_conflicts=True
+    )
+    return {wallet.barber_id: wallet for wallet in BarberWallet.objects.filter(barber_id__in=barber_ids)}
+
+
+def settle_releasable_payments(limit=1000):
+    """Release the barber share of up to ``limit`` completed payments as one batch.
+
+    Payments are summed per barber in a single grouped query. COD fees owed
+    by the barbers go out as one PLATFORM_FEE journal and online earnings as
+    one PAYOUT journal, each with one entry per barber, so every barber wallet
+    gets one summary row and one balance update per kind. Online payouts the
+    platform wallet cannot cover stay releasable for the next run. Returns the
+    ``SettlementBatch``, or ``None`` when nothing was due.
+    """
+    with transaction.atomic():
+        payment_ids = list(
+            releasable_payments().select_for_update(skip_locked=True, of=('self',))
+            .order_by('releasable_at', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        if not payment_ids:
+            return None
+
+        online = ~Q(payment_method="COD")
+        totals = list(
+            PaymentModel.objects.filter(id__in=payment_ids)
+            .values(barber_id=F('booking__barber_id'))
+            .annotate(
+                payout=Coalesce(Sum(F('final_amount') - F('platform_fee'), filter=online), ZERO),
+                fees=Coalesce(Sum('platform_fee', filter=~online), ZERO),
+                online_count=Count('id', filter=online),
+            )
+            .order_by()
+        )
+
+        # Concurrent runs settle different payments, so they take turns on
+        # the platform balance rather than both spending the same funds.
+        platform = ledger.platform_wallet(lock=True)
+        total_payout = sum(row['payout'] for row in totals)
+        total_fees = sum(row['fees'] for row in totals)
+
+        if total_payout > platform.balance + total_fees:
+            # Online payouts stay releasable until the platform wallet can cover them.
+            logger.error(f"Insufficient admin funds to settle ₹{total_payout} of payouts; settling COD fees only")
+            payment_ids = list(
+                PaymentModel.objects.filter(id__in=payment_ids).exclude(online).values_list('id', flat=True)
+            )
+            if not payment_ids:
+                return None
+            total_payout = 0
+            for row in totals:
+                row['payout'] = 0
+
+        batch = SettlementBatch.objects.create(
+            payment_count=len(payment_ids),
+            barber_count=sum(1 for row in totals if row['fees'] or row['payout']),
+            total_payout=total_payout,
+            total_fees=total_fees,
+        )
+        wallets = _barber_wallets([row['barber_id'] for row in totals])
+
+        if total_fees:
+            ledger.post(ledger.PLATFORM_FEE, [
+                (wallets[row['barber_id']], -row['fees'], f"Platform fees for COD bookings (settlement #{batch.id})")
+                for row in totals if row['fees']
+            ] + [
+                (platform, total_fees, f"Fees collected in settlement #{batch.id}"),
+            ])
+        if total_payout:
+            ledger.post(ledger.PAYOUT, [
+                (platform, -total_payout, f"Payouts in settlement #{batch.id}"),
+            ] + [
+                (wallets[row['barber_id']], row['payout'],
+                 f"Earnings for {row['online_count']} bookings (settlement #{batch.id})")
+                for row in totals if row['payout']
+            ])
+
+        now = timezone.now()
+        PaymentModel.objects.filter(id__in=payment_ids).update(
+            is_released_to_barber=True, released_at=now, settlement_batch=batch, updated_at=now
+        )
+        batch.status = "SETTLED"
+        batch.settled_at = now
+        batch.save(update_fields=['status', 'settled_at'])
+
+    logger.info(f"Settlement #{batch.id}: {batch.payment_count} payments for {batch.barber_count} barbers")
+    return batch
@@ -0,0 +1,321 @@
+import hashlib
+import hmac
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+from adminsite.models import AdminWalletTransaction, CategoryModel, ServiceModel
+from authservice.models import User
+from customersite.models import Booking, CustomerWallet, PaymentModel
+from profileservice.models import Address
+from . import ledger, reconciliation
+from .gateway import get_gateway
+from .models import StripeEvent
+from .reconciliation import merge_totals, reconcile
+from .views import (
+    CreateWalletStripeCheckoutSession, StripeWebhookView, VerifyPayment, VerifyPaymentAndAddToWallet
+)
+from .webhooks import process_pending_events
+
+WEBHOOK_SECRET = "whsec_test"
+
+# Trimmed recordings of Stripe test-mode deliveries; ids and metadata are
+# rewritten per test.
+CHECKOUT_SESSION_COMPLETED = {
+    "id": "evt_1QxCheckoutCompleted",
+    "object": "event",
+    "api_version": "2024-06-20",
+    "created": 1760000000,
+    "type": "checkout.session.completed",
+    "data": {
+        "object": {
+            "id": "cs_test_a1SessionBooking",
+            "object": "checkout.session",
+            "amount_total": 21000,
+            "currency": "inr",
+            "mode": "payment",
+            "payment_intent": "pi_3QxBookingIntent",
+            "payment_status": "paid",
+            "status": "complete",
+            "metadata": {"booking_id": "0", "booking_type": "SCHEDULE_BOOKING"},
+        }
+    },
+}
+
+WALLET_TOPUP_COMPLETED = {
+    "id": "evt_1QxTopupCompleted",
+    "object": "event",
+    "api_version": "2024-06-20",
+    "created": 1760000100,
+    "type": "checkout.session.completed",
+    "data": {
+        "object": {
+            "id": "cs_test_a1SessionTopup",
+            "object": "checkout.session",
+            "amount_total": 50000,
+            "currency": "inr",
+            "mode": "payment",
+            "payment_intent": "pi_3QxTopupIntent",
+            "payment_status": "paid",
+            "status": "complete",
+            "metadata": {"customer_id": "0", "topup_amount": "500"},
+        }
+    },
+}
+
+PAYMENT_INTENT_FAILED = {
+    "id": "evt_3QxIntentFailed",
+    "object": "event",
+    "api_version": "2024-06-20",
+    "created": 1760000200,
+    "type": "payment_intent.payment_failed",
+    "data": {
+        "object": {
+            "id": "pi_3QxBookingIntent",
+            "object": "payment_intent",
+            "amount": 21000,
+            "status": "requires_payment_method",
+            "metadata": {"booking_id": "0", "booking_type": "INSTANT_BOOKING"},
+        }
+    },
+}
+
+
+def with_metadata(event, **metadata):
+    event = json.loads(json.dumps(event))
+    event["data"]["object"]["metadata"].update({key: str(value) for key, value in metadata.items()})
+    return event
+
+
+def sign(payload, secret=WEBHOOK_SECRET):
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+class StripeWebhookTests(TestCase):
+
+    def setUp(self):
+        category = CategoryModel.objects.create(name="Hair", image="categories/hair.png")
+        service = ServiceModel.objects.create(category=category, name="Haircut", price=200, duration_minutes=30)
+        self.customer = User.objects.create_user(email="customer@example.com", name="Customer", user_type="customer")
+        address = Address.objects.create(
+            user=self.customer, name="Home", mobile="9999999999", building="1",
+            street="Main Street", city="Kochi", district="Ernakulam", state="Kerala", pincode="682001"
+        )
+        self.booking = Booking.objects.create(
+            customer=self.customer, service=service, address=address,
+            booking_type="SCHEDULE_BOOKING", total_amount=210
+        )
+        self.payment = PaymentModel.objects.create(
+            booking=self.booking, final_amount=210, checkout_session_id="cs_test_a1SessionBooking"
+        )
+
+    def deliver(self, event, signature=None):
+        payload = json.dumps(event)
+        request = APIRequestFactory().post(
+            "/", payload, content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=signature or sign(payload)
+        )
+        return StripeWebhookView.as_view()(request)
+
+    def verify(self, view, session_id):
+        request = APIRequestFactory().post("/", {"session_id": session_id}, format="json")
+        force_authenticate(request, user=self.customer)
+        return view.as_view()(request)
+
+    def test_bad_signature_is_rejected(self):
+        response = self.deliver(CHECKOUT_SESSION_COMPLETED, signature="t=1,v1=deadbeef")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StripeEvent.objects.exists())
+
+    def test_redelivered_event_is_stored_once(self):
+        event = with_metadata(CHECKOUT_SESSION_COMPLETED, booking_id=self.booking.id)
+        self.assertEqual(self.deliver(event).status_code, 200)
+        self.assertEqual(self.deliver(event).status_code, 200)
+
+        self.assertEqual(StripeEvent.objects.count(), 1)
+
+    def test_checkout_completion_confirms_booking_once_applied(self):
+        self.deliver(with_metadata(CHECKOUT_SESSION_COMPLETED, booking_id=self.booking.id))
+
+        pending = self.verify(VerifyPayment, "cs_test_a1SessionBooking")
+        self.assertEqual(pending.status_code, 202)
+
+        self.assertEqual(process_pending_events(), {"PROCESSED": 1})
+        self.assertEqual(process_pending_events(), {})
+
+        self.booking.refresh_from_db()
+        self.payment.refresh_from_db()
+        self.assertEqual(self.booking.status, "CONFIRMED")
+        self.assertEqual(self.payment.payment_status, "SUCCESS")
+        self.assertEqual(self.payment.transaction_id, "pi_3QxBookingIntent")
+        self.assertEqual(AdminWalletTransaction.objects.get().amount, 210)
+
+        verified = self.verify(VerifyPayment, "cs_test_a1SessionBooking")
+        self.assertEqual(verified.status_code, 200)
+        self.assertEqual(verified.data["status"], "verified")
+
+    def test_wallet_topup_is_credited_by_the_worker(self):
+        self.deliver(with_metadata(WALLET_TOPUP_COMPLETED, customer_id=self.customer.id))
+        self.assertEqual(self.verify(VerifyPaymentAndAddToWallet, "cs_test_a1SessionTopup").status_code, 202)
+
+        process_pending_events()
+
+        self.assertEqual(CustomerWallet.objects.get(user=self.customer).account_total_balance, 500)
+        response = self.verify(VerifyPaymentAndAddToWallet, "cs_test_a1SessionTopup")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data["success"])
+
+    def test_failed_intent_marks_pending_payment_failed(self):
+        self.deliver(with_metadata(PAYMENT_INTENT_FAILED, booking_id=self.booking.id))
+        self.deliver({**CHECKOUT_SESSION_COMPLETED, "id": "evt_unknown", "type": "customer.created"})
+
+        self.assertEqual(process_pending_events(), {"PROCESSED": 1, "IGNORED": 1})
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.payment_status, "FAILED")
+
+    def test_failing_event_is_retried_then_parked(self):
+        self.deliver(with_metadata(CHECKOUT_SESSION_COMPLETED, booking_id=999999))
+
+        with self.settings(STRIPE_EVENT_MAX_ATTEMPTS=2):
+            self.assertEqual(process_pending_events(), {"RETRY": 1})
+            self.assertEqual(process_pending_events(), {"FAILED": 1})
+
+        event = StripeEvent.objects.get()
+        self.assertEqual((event.status, event.attempts), ("FAILED", 2))
+
+
+class ReconciliationTests(TestCase):
+
+    def setUp(self):
+        self.customer = User.objects.create_user(email="customer@example.com", name="Customer", user_type="customer")
+        self.barber = User.objects.create_user(email="barber@example.com", name="Barber", user_type="barber")
+        self.wallet = ledger.customer_wallet(self.customer)
+        ledger.post(ledger.TOPUP, [(ledger.EXTERNAL, -500, None), (self.wallet, 500, "₹500 added to your wallet")])
+        ledger.post(ledger.FINE, [
+            (self.wallet, -20, "Cancellation Fine #7"),
+            (ledger.barber_wallet(self.barber), 20, "Fine received #7"),
+        ])
+
+    def test_merge_totals_pairs_sorted_streams(self):
+        merged = list(merge_totals([(1, "a"), (3, "c")], [(2, 5, 1), (3, 7, 2)]))
+        self.assertEqual(merged, [(1, ("a",), 0, 0), (2, None, 5, 1), (3, ("c",), 7, 2)])
+
+    def test_consistent_ledger_reports_no_drift(self):
+        report = reconcile(chunk_size=1)
+
+        self.assertEqual(report["mismatches"], [])
+        checks = {check["check"]: check for check in report["checks"]}
+        self.assertEqual(checks["customer_wallets"]["transactions"], 2)
+
+    def test_drift_names_wallet_and_duplicated_bookings(self):
+        # A second refund for the same booking, written without the ledger.
+        for _ in range(2):
+            self.wallet.transactions.create(amount=210, note="Refund for Booking #7", kind=ledger.REFUND)
+        CustomerWallet.objects.filter(id=self.wallet.id).update(account_total_balance=690)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "report.json")
+            call_command("reconcile_wallets", output=path, stdout=open(os.devnull, "w"))
+            with open(path) as report_file:
+                report = json.load(report_file)
+
+        [mismatch] = report["mismatches"]
+        self.assertEqual(mismatch["wallet_id"], self.wallet.id)
+        self.assertEqual((mismatch["balance"], mismatch["ledger_total"], mismatch["drift"]), ("690.00", "900.00", "-210.00"))
+        self.assertEqual(mismatch["referenced_bookings"], [7])
+        self.assertEqual(mismatch["duplicate_postings"], [{"booking_id": 7, "kind": "REFUND", "postings": 2}])
+
+    def test_all_checks_read_inside_one_transaction(self):
+        depth = len(connection.savepoint_ids)
+        seen = []
+
+        def spy(check):
+            def run(*args):
+                seen.append((check.__name__, len(connection.savepoint_ids)))
+                return check(*args)
+            return run
+
+        with mock.patch.object(reconciliation, "check_wallets", spy(reconciliation.check_wallets)), \
+                mock.patch.object(reconciliation, "check_admin_wallet", spy(reconciliation.check_admin_wallet)):
+            reconcile()
+
+        self.assertEqual(seen, [
+            ("check_wallets", depth + 1), ("check_wallets", depth + 1), ("check_admin_wallet", depth + 1),
+        ])
+
+
+@override_settings(PAYMENT_GATEWAY="fake", IDEMPOTENCY_CACHE="default", IDEMPOTENCY_WAIT_SECONDS=2)
+class IdempotencyTests(TestCase):
+
+    def setUp(self):
+        caches["default"].clear()
+        get_gateway.cache_clear()
+        self.customer = User.objects.create_user(email="customer@example.com", name="Customer", user_type="customer")
+
+    def top_up(self, amount, key="key-1", user=None):
+        request = APIRequestFactory().post("/", {"amount": amount}, format="json", HTTP_IDEMPOTENCY_KEY=key)
+        force_authenticate(request, user=user or self.customer)
+        return CreateWalletStripeCheckoutSession.as_view()(request)
+
+    def test_retry_replays_the_first_response(self):
+        first = self.top_up(500)
+        retry = self.top_up(500)
+
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(len(get_gateway().calls), 1)
+
+    def test_key_is_scoped_to_the_user(self):
+        other = User.objects.create_user(email="other@example.com", name="Other", user_type="customer")
+        self.top_up(500)
+        self.top_up(500, user=other)
+
+        self.assertEqual(len(get_gateway().calls), 2)
+
+    def test_reused_key_with_different_body_is_rejected(self):
+        self.top_up(500)
+
+        self.assertEqual(self.top_up(900).status_code, 422)
+        self.assertEqual(len(get_gateway().calls), 1)
+
+    def test_failed_request_can_be_retried(self):
+        get_gateway().fail_next(RuntimeError("network down"))
+        self.assertEqual(self.top_up(500).status_code, 500)
+
+        self.assertEqual(self.top_up(500).status_code, 200)
+        self.assertEqual(len(get_gateway().calls), 2)
+
+    def test_rejected_request_is_not_replayed(self):
+        self.assertEqual(self.top_up(0).status_code, 400)
+        retry = self.top_up(0)
+        self.assertEqual(retry.status_code, 400)
+        self.assertFalse(retry.has_header("Idempotent-Replayed"))
+
+        # The corrected request goes through under the same key.
+        self.assertEqual(self.top_up(500).status_code, 200)
+        self.assertEqual(len(get_gateway().calls), 1)
+
+    def test_duplicate_waits_for_the_request_in_flight(self):
+        get_gateway().latency_ms = 300
+        responses = []
+        first = threading.Thread(target=lambda: responses.append(self.top_up(500)))
+        first.start()
+        time.sleep(0.1)
+        duplicate = self.top_up(500)
+        first.join()
+
+        self.assertEqual(duplicate.status_code, 200)
+        self.assertEqual(duplicate.data, responses[0].data)
+        self.assertEqual(len(get_gateway().calls), 1)
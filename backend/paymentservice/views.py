@@ -1,19 +1,22 @@
+import json
 import stripe
 from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from customersite.models import Booking, PaymentModel
-from adminsite.models import AdminWallet, AdminWalletTransaction
 from django.shortcuts import get_object_or_404
-from django.db import transaction
 import logging
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from backend.idempotency import idempotent
+from .gateway import get_gateway
+from .models import StripeEvent
+from .webhooks import record_event
 logger = logging.getLogger(__name__)
-stripe.api_key = settings.STRIPE_SECRET_KEY
 
 
 class CreateStripeCheckoutSession(APIView):
+    @idempotent
     def post(self, request, *args, **kwargs):
         booking_id = request.data.get("booking_id")
         booking = Booking.objects.get(id=booking_id)
@@ -25,7 +28,7 @@ class CreateStripeCheckoutSession(APIView):
         cancel_url = f"{settings.BASE_APP_URL}/payment-cancelled"
 
         try:
-            session = stripe.checkout.Session.create(
+            session = get_gateway().create_checkout_session(
                 payment_method_types=['card'],
                 line_items=[{
                     'price_data': {
@@ -52,7 +55,10 @@ class CreateStripeCheckoutSession(APIView):
                     "booking_type": booking.booking_type
                 }
             )
-            
+
+            payment.checkout_session_id = session.id
+            payment.save(update_fields=['checkout_session_id', 'updated_at'])
+
             return Response({
                 "sessionId": session.id,
                 "stripe_public_key": settings.STRIPE_PUBLISHABLE_KEY
@@ -63,69 +69,60 @@ class CreateStripeCheckoutSession(APIView):
         
         
 
-class VerifyPayment(APIView):
+class StripeWebhookView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
     def post(self, request):
-        session_id = request.data.get('session_id')
+        payload = request.body
         try:
-            session = stripe.checkout.Session.retrieve(session_id)
-            booking_id = session.metadata.get("booking_id")
-            
-            if session.payment_status == 'paid' or session.payment_status == 'unpaid': 
-               
-                with transaction.atomic():
-                    booking = Booking.objects.get(id=booking_id)
-                    payment = PaymentModel.objects.get(booking=booking)
-                    
-                    payment.transaction_id = session.payment_intent
-                    payment.payment_method = 'STRIPE'
-                    
-                    if booking.booking_type == 'SCHEDULE_BOOKING':
-                        
-                        booking.status = 'CONFIRMED'
-                        booking.is_payment_done = True
-                        payment.payment_status = 'SUCCESS'
-                        self.add_to_admin_wallet(payment.total_amount, booking.id)
-                    else:
-                       
-                        booking.status = 'PENDING'
-                        booking.is_payment_done = False
-                        payment.payment_status = 'PENDING' 
-                    
-                    booking.save()
-                    payment.save()
-
-                return Response({
-                    "booking_id": booking.id,
-                    "booking_type": booking.booking_type,
-                    "status": "verified"
-                })
-        except Exception as e:
-            return Response({"error": str(e)}, status=500)
-    
-    
-    def add_to_admin_wallet(self, amount, booking_id=None):
-        try:
-            admin_wallet, _ = AdminWallet.objects.get_or_create(
-                id=1,
-                defaults={'total_earnings': 0}
+            stripe.Webhook.construct_event(
+                payload, request.META.get("HTTP_STRIPE_SIGNATURE"), settings.STRIPE_WEBHOOK_SECRET
             )
-            admin_wallet.total_earnings += amount
-            admin_wallet.save()
+        except (ValueError, stripe.error.SignatureVerificationError) as e:
+            logger.error(f"Rejected Stripe webhook: {str(e)}")
+            return Response({"error": "Invalid webhook"}, status=status.HTTP_400_BAD_REQUEST)
 
-            AdminWalletTransaction.objects.create(
-                wallet=admin_wallet,
-                amount=amount,
-                note=f"Booking #{booking_id} - STRIPE payment received"
-            )
+        record_event(json.loads(payload))
+        return Response({"received": True})
 
-        except Exception as e:
-            logger.error(f"Error adding to admin wallet: {str(e)}")
-            raise
+
+class VerifyPayment(APIView):
+    """Report the state the webhook worker has applied for a checkout session."""
+
+    def post(self, request):
+        session_id = request.data.get('session_id')
+        payment = (
+            PaymentModel.objects.select_related('booking')
+            .filter(checkout_session_id=session_id)
+            .first()
+        ) if session_id else None
+
+        if payment is None:
+            return Response({"error": "Unknown checkout session"}, status=status.HTTP_404_NOT_FOUND)
+
+        booking = payment.booking
+        if payment.payment_status == 'FAILED':
+            return Response({"error": "Payment failed"}, status=status.HTTP_400_BAD_REQUEST)
+        if not payment.transaction_id:
+            # The checkout.session.completed event has not been applied yet.
+            return Response({
+                "booking_id": booking.id,
+                "booking_type": booking.booking_type,
+                "status": "pending"
+            }, status=status.HTTP_202_ACCEPTED)
+
+        return Response({
+            "booking_id": booking.id,
+            "booking_type": booking.booking_type,
+            "status": "verified"
+        })
 
 
 class CreateWalletStripeCheckoutSession(APIView):
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     def post(self, request, *args, **kwargs):
         try:
             amount = request.data.get("amount")
@@ -146,7 +143,7 @@ class CreateWalletStripeCheckoutSession(APIView):
                     {"error": "Invalid amount provided"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            checkout_session = stripe.checkout.Session.create(
+            checkout_session = get_gateway().create_checkout_session(
                 payment_method_types=['card'],
                 line_items=[{
                     'price_data': {
@@ -190,63 +187,46 @@ class CreateWalletStripeCheckoutSession(APIView):
 
 
 class VerifyPaymentAndAddToWallet(APIView):
+    """Report whether the webhook worker has credited a wallet top-up session."""
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
-        try:
-            session_id = request.data.get("session_id")
+        session_id = request.data.get("session_id")
 
-            if not session_id:
-                return Response(
-                    {"error": "Session ID is required"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        if not session_id:
+            return Response(
+                {"error": "Session ID is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-            session = stripe.checkout.Session.retrieve(session_id)
-
-            if session.payment_status == 'paid':
-                amount = float(session.metadata.get('topup_amount', 0))
-                user_id = int(session.metadata.get('customer_id', 0))
-
-                if user_id != request.user.id:
-                    return Response(
-                        {"error": "Unauthorized"},
-                        status=status.HTTP_403_FORBIDDEN
-                    )
-
-                from customersite.models import CustomerWallet, CustomerWalletTransaction
-                from decimal import Decimal
-                wallet, created = CustomerWallet.objects.get_or_create(
-                    user=request.user)
-                wallet.account_total_balance += Decimal(str(amount))
-                wallet.save()
-
-                CustomerWalletTransaction.objects.create(
-                    wallet=wallet,
-                    amount=Decimal(str(amount)),
-                    note=f"₹{amount} added to your wallet"
-                )
+        event = StripeEvent.objects.filter(
+            object_id=session_id, type="checkout.session.completed"
+        ).first()
 
-                return Response({
-                    "success": True,
-                    "message": f"Successfully added ₹{amount} to your wallet",
-                    "amount": amount
-                }, status=status.HTTP_200_OK)
-            else:
-                return Response(
-                    {"error": "Payment not completed"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        if event is None or event.status == "PENDING":
+            return Response({"success": False, "status": "pending"}, status=status.HTTP_202_ACCEPTED)
 
-        except stripe.error.StripeError as e:
-            logger.error(f"Stripe verification error: {str(e)}")
+        metadata = event.payload["data"]["object"].get("metadata") or {}
+        if int(metadata.get('customer_id', 0)) != request.user.id:
+            return Response(
+                {"error": "Unauthorized"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        if event.status == "FAILED":
             return Response(
                 {"error": "Payment verification failed"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-        except Exception as e:
-            logger.error(f"Verification error: {str(e)}")
+        if event.status == "IGNORED":
             return Response(
-                {"error": "An unexpected error occurred"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {"error": "Payment not completed"},
+                status=status.HTTP_400_BAD_REQUEST
             )
+
+        amount = metadata.get('topup_amount')
+        return Response({
+            "success": True,
+            "message": f"Successfully added ₹{amount} to your wallet",
+            "amount": float(amount)
+        }, status=status.HTTP_200_OK)
@@ -0,0 +1,152 @@
+import logging
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from authservice.models import User
+from backend import metrics
+from customersite.models import Booking, PaymentModel
+from . import ledger
+from .models import StripeEvent
+
+logger = logging.getLogger(__name__)
+
+
+def record_event(event):
+    """Store a verified webhook event in the inbox.
+
+    ``event`` is the decoded JSON body. Returns ``False`` when the event id
+    was already stored, so Stripe's redeliveries are acknowledged and dropped.
+    """
+    _, created = StripeEvent.objects.get_or_create(
+        event_id=event["id"],
+        defaults={
+            "type": event["type"],
+            "object_id": event["data"]["object"].get("id", ""),
+            "payload": event,
+        }
+    )
+    metrics.increment("stripe_events.received" if created else "stripe_events.duplicate")
+    return created
+
+
+def apply_checkout_session(session):
+    metadata = session.get("metadata") or {}
+    if metadata.get("booking_id"):
+        return apply_booking_payment(session, int(metadata["booking_id"]))
+    if metadata.get("customer_id"):
+        return apply_wallet_topup(session, int(metadata["customer_id"]), metadata.get("topup_amount"))
+    return False
+
+
+def apply_booking_payment(session, booking_id):
+    if session.get("payment_status") not in ("paid", "unpaid"):
+        return False
+
+    booking = Booking.objects.select_for_update().get(id=booking_id)
+    payment = PaymentModel.objects.select_for_update().get(booking=booking)
+    if payment.transaction_id and payment.transaction_id == session.get("payment_intent"):
+        return False
+
+    payment.transaction_id = session.get("payment_intent")
+    payment.checkout_session_id = session["id"]
+    payment.payment_method = 'STRIPE'
+
+    if booking.booking_type == 'SCHEDULE_BOOKING':
+        booking.status = 'CONFIRMED'
+        booking.is_payment_done = True
+        payment.payment_status = 'SUCCESS'
+        ledger.post(ledger.PAYMENT, [
+            (ledger.EXTERNAL, -payment.total_amount, None),
+            (ledger.platform_wallet(), payment.total_amount, f"Booking #{booking.id} - STRIPE payment received"),
+        ])
+    else:
+        # Instant bookings are authorized only; the payment worker captures on accept.
+        booking.status = 'PENDING'
+        booking.is_payment_done = False
+        payment.payment_status = 'PENDING'
+
+    booking.save()
+    payment.save()
+    return True
+
+
+def apply_wallet_topup(session, customer_id, amount):
+    if session.get("payment_status") != "paid" or not amount:
+        return False
+
+    topup = Decimal(amount)
+    ledger.post(ledger.TOPUP, [
+        (ledger.EXTERNAL, -topup, None),
+        (ledger.customer_wallet(User.objects.get(id=customer_id)), topup, f"₹{amount} added to your wallet"),
+    ])
+    return True
+
+
+def _booking_payments(intent):
+    booking_id = (intent.get("metadata") or {}).get("booking_id")
+    if not booking_id:
+        return PaymentModel.objects.none()
+    return PaymentModel.objects.filter(booking_id=int(booking_id))
+
+
+def apply_intent_succeeded(intent):
+    return bool(_booking_payments(intent).exclude(payment_status='SUCCESS').update(payment_status='SUCCESS'))
+
+
+def apply_intent_failed(intent):
+    return bool(_booking_payments(intent).filter(payment_status='PENDING').update(payment_status='FAILED'))
+
+
+HANDLERS = {
+    "checkout.session.completed": apply_checkout_session,
+    "payment_intent.succeeded": apply_intent_succeeded,
+    "payment_intent.payment_failed": apply_intent_failed,
+    "payment_intent.canceled": apply_intent_failed,
+}
+
+
+def _apply_event(event):
+    handler = HANDLERS.get(event.type)
+    if handler is None:
+        event.status = "IGNORED"
+        return event.status
+
+    try:
+        with transaction.atomic():
+            applied = handler(event.payload["data"]["object"])
+    except Exception as e:
+        event.attempts += 1
+        event.last_error = str(e)
+        logger.error(f"Stripe event {event.event_id} ({event.type}) failed, attempt {event.attempts}: {str(e)}")
+        if event.attempts >= settings.STRIPE_EVENT_MAX_ATTEMPTS:
+            event.status = "FAILED"
+        return "FAILED" if event.status == "FAILED" else "RETRY"
+
+    event.attempts += 1
+    event.status = "PROCESSED" if applied else "IGNORED"
+    event.processed_at = timezone.now()
+    return event.status
+
+
+def process_pending_events(limit=100):
+    """Apply up to ``limit`` stored events in arrival order and return a count per outcome.
+
+    The batch is locked with ``skip_locked`` so several workers can drain the
+    inbox; each event runs in its own savepoint so one bad event does not roll
+    back the rest, and the inbox rows are written back with one ``bulk_update``.
+    """
+    results = {}
+    with transaction.atomic():
+        events = list(
+            StripeEvent.objects.select_for_update(skip_locked=True)
+            .filter(status="PENDING")
+            .order_by('received_at', 'id')[:limit]
+        )
+        for event in events:
+            outcome = _apply_event(event)
+            results[outcome] = results.get(outcome, 0) + 1
+            metrics.increment(f"stripe_events.{outcome.lower()}")
+
+        StripeEvent.objects.bulk_update(events, ['status', 'attempts', 'last_error', 'processed_at'])
+    return results
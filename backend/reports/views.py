@@ -475,7 +475,7 @@ def download_financial_summary_report(request):
         Sum('platform_fee'))['platform_fee__sum'] or 0
 
     admin_wallet = AdminWallet.objects.first()
-    admin_balance = admin_wallet.total_earnings if admin_wallet else 0
+    admin_balance = admin_wallet.balance if admin_wallet else 0
 
     total_customer_wallet = CustomerWallet.objects.aggregate(
         Sum('account_total_balance'))['account_total_balance__sum'] or 0
@@ -5,11 +5,13 @@ import { Calendar, Wallet, Activity, Filter, TrendingUp, TrendingDown } from 'lu
 
 function AdminWallet() {
     const [walletData, setWalletData] = useState(null);
-    const [paymentHistory, setPaymentHistory] = useState([]);
-    const [filteredHistory, setFilteredHistory] = useState([]);
+    const [history, setHistory] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
     const [selectedPeriod, setSelectedPeriod] = useState('all');
+    const [transactionCounts, setTransactionCounts] = useState({ allTime: 0, month: 0 });
     const [periodStats, setPeriodStats] = useState({
         totalIncome: 0,
         totalExpense: 0,
@@ -19,12 +21,12 @@ function AdminWallet() {
 
     useEffect(() => {
         fetchWalletData();
-        fetchPaymentHistory();
+        fetchTransactionCounts();
     }, []);
 
     useEffect(() => {
-        filterTransactionsByPeriod();
-    }, [paymentHistory, selectedPeriod]);
+        fetchPaymentHistory();
+    }, [selectedPeriod]);
 
     const fetchWalletData = async () => {
         try {
@@ -39,81 +41,48 @@ function AdminWallet() {
         }
     };
 
-    const fetchPaymentHistory = async () => {
+    const fetchTransactionCounts = async () => {
         try {
-            const res = await apiClient.get('/adminsite/admin-wallet/transactions/');
-            const rawHistory = res.data.history || [];
-            const uniqueHistory = Array.from(
-                new Map(rawHistory.map(item => [item.id, item])).values()
+            const [allTime, month] = await Promise.all(
+                ['all', 'month'].map(period =>
+                    apiClient.get('/adminsite/admin-wallet/transactions/', { params: { period, limit: 1 } })
+                )
             );
-            
-            setPaymentHistory(uniqueHistory);
+            setTransactionCounts({
+                allTime: allTime.data.statistics.transaction_count,
+                month: month.data.statistics.transaction_count
+            });
         } catch (err) {
-            console.error("Error fetching payment history", err);
+            console.error("Error fetching transaction counts", err);
         }
     };
 
-    const getDateRangeForPeriod = (period) => {
-        const now = new Date();
-        const today = new Date(now.getFullYear(), now.getMonth(), now.getDate());
-        
-        switch (period) {
-            case 'today':
-                return {
-                    start: today,
-                    end: new Date(today.getTime() + 24 * 60 * 60 * 1000 - 1)
-                };
-            case 'week':
-                const weekStart = new Date(today);
-                weekStart.setDate(today.getDate() - today.getDay());
-                const weekEnd = new Date(weekStart);
-                weekEnd.setDate(weekStart.getDate() + 7);
-                return { start: weekStart, end: weekEnd };
-            case 'month':
-                const monthStart = new Date(today.getFullYear(), today.getMonth(), 1);
-                const monthEnd = new Date(today.getFullYear(), today.getMonth() + 1, 0, 23, 59, 59, 999);
-                return { start: monthStart, end: monthEnd };
-            default:
-                return null;
-        }
-    };
+    const fetchPaymentHistory = async (cursor = null) => {
+        try {
+            const params = { period: selectedPeriod };
+            if (cursor) params.cursor = cursor;
+            const res = await apiClient.get('/adminsite/admin-wallet/transactions/', { params });
+            const page = res.data.history || [];
 
-    const filterTransactionsByPeriod = () => {
-        let filtered = [...paymentHistory];
-        
-        if (selectedPeriod !== 'all') {
-            const dateRange = getDateRangeForPeriod(selectedPeriod);
-            if (dateRange) {
-                filtered = paymentHistory.filter(txn => {
-                    const txnDate = new Date(txn.created_at);
-                    return txnDate >= dateRange.start && txnDate <= dateRange.end;
-                });
-            }
-        }
+            setHistory(prev => (cursor ? [...prev, ...page] : page));
+            setNextCursor(res.data.next_cursor);
 
-        const stats = filtered.reduce((acc, txn) => {
-            const isExpense = txn.note?.toLowerCase().includes('payout') ||
-                              txn.note?.toLowerCase().includes('refund');
-            const amount = Math.abs(txn.amount);
-            
-            if (isExpense) {
-                acc.totalExpense += amount;
-            } else {
-                acc.totalIncome += amount;
-            }
-            
-            acc.transactionCount++;
-            return acc;
-        }, {
-            totalIncome: 0,
-            totalExpense: 0,
-            transactionCount: 0
-        });
+            const stats = res.data.statistics;
+            setPeriodStats({
+                totalIncome: Number(stats.total_income),
+                totalExpense: Number(stats.total_expense),
+                netAmount: Number(stats.net_amount),
+                transactionCount: stats.transaction_count
+            });
+        } catch (err) {
+            console.error("Error fetching payment history", err);
+        }
+    };
 
-        stats.netAmount = stats.totalIncome - stats.totalExpense;
-        
-        setFilteredHistory(filtered);
-        setPeriodStats(stats);
+    const loadMoreHistory = async () => {
+        setLoadingMore(true);
+        await fetchPaymentHistory(nextCursor);
+        setLoadingMore(false);
     };
 
     const formatCurrency = (amount) => {
@@ -212,7 +181,7 @@ function AdminWallet() {
                                     <h2 className="text-xl font-semibold text-gray-800">Total Transactions</h2>
                                 </div>
                                 <p className="text-3xl font-bold text-gray-800 mb-2">
-                                    {paymentHistory.length}
+                                    {transactionCounts.allTime}
                                 </p>
                                 <p className="text-sm text-gray-600">All time transactions</p>
                             </div>
@@ -225,15 +194,7 @@ function AdminWallet() {
                                     <h2 className="text-xl font-semibold text-gray-800">This Month</h2>
                                 </div>
                                 <p className="text-3xl font-bold text-gray-800 mb-2">
-                                    {(() => {
-                                        const monthlyTransactions = paymentHistory.filter(txn => {
-                                            const txnDate = new Date(txn.created_at);
-                                            const now = new Date();
-                                            return txnDate.getMonth() === now.getMonth() && 
-                                                   txnDate.getFullYear() === now.getFullYear();
-                                        });
-                                        return monthlyTransactions.length;
-                                    })()}
+                                    {transactionCounts.month}
                                 </p>
                                 <p className="text-sm text-gray-600">Monthly transactions</p>
                             </div>
@@ -319,7 +280,7 @@ function AdminWallet() {
                                 <strong>Showing transactions for:</strong> {getPeriodLabel()} 
                                 {selectedPeriod !== 'all' && (
                                     <span className="ml-2">
-                                        ({filteredHistory.length} of {paymentHistory.length} total transactions)
+                                        ({periodStats.transactionCount} of {transactionCounts.allTime} total transactions)
                                     </span>
                                 )}
                             </div>
@@ -335,13 +296,13 @@ function AdminWallet() {
                                         </h3>
                                     </div>
                                     <span className="text-sm text-gray-600">
-                                        {filteredHistory.length} transactions
+                                        {periodStats.transactionCount} transactions
                                     </span>
                                 </div>
                             </div>
 
                             <div className="p-6">
-                                {filteredHistory.length === 0 ? (
+                                {history.length === 0 ? (
                                     <div className="text-center py-12">
                                         <Calendar className="w-16 h-16 text-gray-300 mx-auto mb-4" />
                                         <div className="text-gray-500 text-lg mb-2">
@@ -358,9 +319,8 @@ function AdminWallet() {
                                     </div>
                                 ) : (
                                     <div className="space-y-4">
-                                        {filteredHistory.map((txn) => {
-                                            const isExpense = txn.note?.toLowerCase().includes('payout') ||
-                                                            txn.note?.toLowerCase().includes('refund');
+                                        {history.map((txn) => {
+                                            const isExpense = txn.category === 'EXPENSE';
                                             const amountClass = isExpense ? 'text-red-600' : 'text-green-600';
                                             const sign = isExpense ? '-' : '+';
                                             const bgClass = isExpense ? 'bg-red-50 border-red-200' : 'bg-green-50 border-green-200';
@@ -396,6 +356,18 @@ function AdminWallet() {
                                                 </div>
                                             );
                                         })}
+
+                                        {nextCursor && (
+                                            <div className="text-center pt-2">
+                                                <button
+                                                    onClick={loadMoreHistory}
+                                                    disabled={loadingMore}
+                                                    className="bg-gray-100 hover:bg-gray-200 text-gray-800 font-medium py-2 px-6 rounded-lg transition-colors disabled:opacity-50"
+                                                >
+                                                    {loadingMore ? 'Loading...' : 'Load more'}
+                                                </button>
+                                            </div>
+                                        )}
                                     </div>
                                 )}
                             </div>
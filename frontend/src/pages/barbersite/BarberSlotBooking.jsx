@@ -48,28 +48,21 @@ export const BarberSlotBooking = () => {
     
     setLoading(true);
     try {
-      const promises = selectedSlots.map(slotTime => {
+      const times = selectedSlots.map(slotTime => {
         let [startTime, endTime] = slotTime.split('-');
         
         if (startTime.length === 5) startTime += ':00';
         if (endTime.length === 5) endTime += ':00';
 
-        if (endTime === '24:00:00' || endTime === '00:00:00') {
-             endTime = '23:59:59';
-        }
+        return { start_time: startTime, end_time: endTime };
+      });
 
-        const slotData = {
-          date: selectedDate,
-          start_time: startTime,
-          end_time: endTime    
-        };
-        
-        console.log('Creating slot with data:', slotData); 
-        return apiClient.post('/barbersite/barber-slots/create-slot/', slotData);
+      const response = await apiClient.post('/barbersite/barber-slots/bulk-create/', {
+        start_date: selectedDate,
+        end_date: selectedDate,
+        times
       });
-      
-      const results = await Promise.all(promises);
-      console.log('Slot creation results:', results);
+      console.log('Slot creation summary:', response.data);
       
       setCurrentStep('success');
       await fetchMySlots();
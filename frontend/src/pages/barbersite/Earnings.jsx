@@ -8,6 +8,9 @@ import { useNavigate, useLocation } from 'react-router-dom';
 
 function Earnings() {
   const [wallet, setWallet] = useState(null);
+  const [transactions, setTransactions] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
@@ -21,11 +24,31 @@ function Earnings() {
   const location = useLocation();
   const isOnWorkingAreaPage = location.pathname.includes('/instant-booking');
 
+  const fetchTransactions = async (cursor = null) => {
+    const response = await apiClient.get('/barbersite/barber/wallet/transactions/', {
+      params: cursor ? { cursor } : {}
+    });
+    setTransactions(prev => (cursor ? [...prev, ...response.data.results] : response.data.results));
+    setNextCursor(response.data.next_cursor);
+  };
+
+  const loadMoreTransactions = async () => {
+    setLoadingMore(true);
+    try {
+      await fetchTransactions(nextCursor);
+    } catch (error) {
+      console.error('Failed to fetch transactions:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     const fetchWallet = async () => {
       try {
         const response = await apiClient.get('/barbersite/barber/wallet/');
         setWallet(response.data);
+        await fetchTransactions();
         setError(null);
       } catch (error) {
         console.error('Failed to fetch wallet:', error);
@@ -117,11 +140,11 @@ function Earnings() {
             
             <h3 className="text-xl font-semibold mb-3 text-gray-700">Transaction History</h3>
 
-            {wallet?.transactions?.length === 0 ? (
+            {transactions.length === 0 ? (
               <p className="text-gray-500">No transactions yet.</p>
             ) : (
               <div className="bg-white rounded-lg shadow divide-y">
-                {wallet.transactions?.map(tx => {
+                {transactions.map(tx => {
                  
                   const isNegative = parseFloat(tx.amount) < 0;
                   
@@ -143,6 +166,18 @@ function Earnings() {
                 })}
               </div>
             )}
+
+            {nextCursor && (
+              <div className="text-center mt-4">
+                <button
+                  onClick={loadMoreTransactions}
+                  disabled={loadingMore}
+                  className="px-4 py-2 text-sm font-medium text-green-700 bg-white border border-green-200 rounded-lg shadow-sm hover:bg-green-50 disabled:opacity-50"
+                >
+                  {loadingMore ? 'Loading...' : 'Load more'}
+                </button>
+              </div>
+            )}
           </div>
         )}
       </div>
@@ -270,6 +270,7 @@ function ServiceCompletePage() {
                         <span className="text-xl font-bold">Net Earnings</span>
                         <span className="text-2xl font-bold text-yellow-300">₹{earnings}</span>
                     </div>
+                    <p className="text-xs text-emerald-100 mt-2 text-right">Credited to your wallet in the next settlement run</p>
                 </div>
 
                 <div className="mt-6 text-center">
@@ -126,6 +126,11 @@ export const ConfirmBooking = () => {
         paymentUrl.searchParams.set("coupon_code", bookingSummary.coupon.code);
       }
 
+      // The signed quote makes create-booking charge exactly the amounts shown here.
+      if (bookingSummary?.quote) {
+        sessionStorage.setItem('priceQuote', bookingSummary.quote);
+      }
+
       window.location.href = paymentUrl.toString();
     } catch (error) {
       alert("Failed to confirm booking. Please try again.");
@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from 'react'
+import React, { useEffect, useRef, useState } from 'react'
 import { Button } from '../../components/mini ui/Button'
 import apiClient from '../../slices/api/apiIntercepters'
 import { Check, Wallet, Plus, Clock } from 'lucide-react'
@@ -8,11 +8,13 @@ function CustomerWallet() {
     const [amount, setAmount] = useState('')
     const [walletDetails, setWalletDetails] = useState(null)
     const [transactions, setTransactions] = useState([])
+    const [nextCursor, setNextCursor] = useState(null)
     const [loading, setLoading] = useState(false)
     const [showSuccess, setShowSuccess] = useState(false)
     const [successAmount, setSuccessAmount] = useState('')
     const [verifying, setVerifying] = useState(false)
     const [message, setMessage] = useState('')
+    const topUpKey = useRef({ amount: null, key: null })
 
 
     const fetchWalletDetails = () => {
@@ -21,19 +23,47 @@ function CustomerWallet() {
             .catch(error => console.error('Failed to fetch wallet details:', error))
     }
 
-    const fetchTransactions = () => {
-        apiClient.get('/customersite/customer-wallet/transactions/')
-            .then(res => setTransactions(res.data.history))
+    const fetchTransactions = (before = null) => {
+        apiClient.get('/customersite/customer-wallet/transactions/', { params: before ? { before } : {} })
+            .then(res => {
+                setTransactions(prev => (before ? [...prev, ...res.data.history] : res.data.history))
+                setNextCursor(res.data.next_cursor)
+            })
             .catch(err => console.error("Failed to load transactions", err))
     }
 
-    const verifyPayment = async (sessionId, amount) => {
+    const downloadStatement = () => {
+        apiClient.get('/customersite/customer-wallet/transactions/', {
+            params: { export: 'csv' },
+            responseType: 'blob'
+        })
+            .then(res => {
+                const url = window.URL.createObjectURL(res.data)
+                const link = document.createElement('a')
+                link.href = url
+                link.download = 'wallet_statement.csv'
+                link.click()
+                window.URL.revokeObjectURL(url)
+            })
+            .catch(err => console.error("Failed to download statement", err))
+    }
+
+    const verifyPayment = async (sessionId, amount, attempt = 0) => {
         setVerifying(true)
+        let retrying = false
         try {
             const response = await apiClient.post('/payment-service/wallet/verify-payment/', {
                 session_id: sessionId
             })
-            if (response.data.success) {
+            if (response.status === 202) {
+                // The top-up is credited by the Stripe webhook; check again shortly.
+                if (attempt < 20) {
+                    retrying = true
+                    setTimeout(() => verifyPayment(sessionId, amount, attempt + 1), 1500)
+                    return
+                }
+                setMessage('Payment is still processing. Your wallet will update shortly.')
+            } else if (response.data.success) {
                 setSuccessAmount(amount)
                 setShowSuccess(true)
                 fetchWalletDetails()
@@ -46,7 +76,7 @@ function CustomerWallet() {
             console.error('Payment verification failed:', error)
             setMessage('Payment verification failed')
         } finally {
-            setVerifying(false)
+            if (!retrying) setVerifying(false)
         }
     }
 
@@ -71,8 +101,15 @@ function CustomerWallet() {
             return
         }
 
+        // Retrying the same amount reuses the key, so only one checkout session is created.
+        if (topUpKey.current.amount !== amount) {
+            topUpKey.current = { amount, key: crypto.randomUUID() }
+        }
+
         setLoading(true)
-        apiClient.post('/payment-service/wallet/stripe-checkout/', { amount })
+        apiClient.post('/payment-service/wallet/stripe-checkout/', { amount }, {
+            headers: { 'Idempotency-Key': topUpKey.current.key }
+        })
             .then(res => window.location.href = res.data.url)
             .catch(err => {
                 console.error('Stripe Checkout failed:', err)
@@ -143,9 +180,16 @@ function CustomerWallet() {
                 </div>
 
                 <div className="bg-white rounded-lg shadow-md p-6 border">
-                    <div className="flex items-center space-x-3 mb-4">
-                        <Clock className="h-5 w-5 text-gray-600" />
-                        <h3 className="text-lg font-semibold text-gray-800">Transaction History</h3>
+                    <div className="flex items-center justify-between mb-4">
+                        <div className="flex items-center space-x-3">
+                            <Clock className="h-5 w-5 text-gray-600" />
+                            <h3 className="text-lg font-semibold text-gray-800">Transaction History</h3>
+                        </div>
+                        {transactions.length > 0 && (
+                            <button onClick={downloadStatement} className="text-sm text-blue-600 hover:text-blue-800">
+                                Download statement
+                            </button>
+                        )}
                     </div>
 
                     {transactions.length === 0 ? (
@@ -167,6 +211,14 @@ function CustomerWallet() {
                             ))}
                         </div>
                     )}
+
+                    {nextCursor && (
+                        <div className="text-center mt-4">
+                            <Button variant="secondary" className="mx-auto" onClick={() => fetchTransactions(nextCursor)}>
+                                Load more
+                            </Button>
+                        </div>
+                    )}
                 </div>
             </div>
         </CustomerLayout>
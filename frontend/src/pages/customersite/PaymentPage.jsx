@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import apiClient from '../../slices/api/apiIntercepters';
 import Navbar from '../../components/basics/Navbar';
@@ -18,6 +18,8 @@ function PaymentPage() {
     selectedAddressId: null
   });
   const navigate = useNavigate();
+  // One key per booking payload, so a double submit or a retried request books once.
+  const idempotencyKey = useRef({ payload: null, key: null });
 
   useEffect(() => {
     const urlParams = new URLSearchParams(window.location.search);
@@ -38,7 +40,8 @@ function PaymentPage() {
     setBookingData({
       selectedServiceId: parseInt(serviceId),
       selectedBarberId: barberId ? parseInt(barberId) : null,
-      selectedSlotId: slotId ? parseInt(slotId) : null,
+      // Either a slot id or the ref of a slot computed from working hours.
+      selectedSlotId: slotId || null,
       selectedAddressId: parseInt(addressId)
     });
 
@@ -63,6 +66,11 @@ function PaymentPage() {
           coupon_code: couponCode
         };
 
+        const quote = sessionStorage.getItem('priceQuote');
+        if (quote) {
+          payload.quote = quote;
+        }
+
         
         if (bookingType === "SCHEDULE_BOOKING") {
           payload.barber = bookingData.selectedBarberId;
@@ -70,8 +78,14 @@ function PaymentPage() {
         }
 
        
-        const res = await apiClient.post('/customersite/create-booking/', payload);
+        const payloadKey = JSON.stringify(payload);
+        if (idempotencyKey.current.payload !== payloadKey) {
+          idempotencyKey.current = { payload: payloadKey, key: crypto.randomUUID() };
+        }
+        const headers = { 'Idempotency-Key': idempotencyKey.current.key };
+        const res = await apiClient.post('/customersite/create-booking/', payload, { headers });
         const { booking_id } = res.data;
+        sessionStorage.removeItem('priceQuote');
         
         
         sessionStorage.setItem('instantBookingId', booking_id);
@@ -80,7 +94,7 @@ function PaymentPage() {
         if (method === "STRIPE") {
           const sessionRes = await apiClient.post('/payment-service/create-checkout-session/', {
             booking_id: booking_id
-          });
+          }, { headers });
           const stripe = await loadStripe(sessionRes.data.stripe_public_key);
           await stripe.redirectToCheckout({ sessionId: sessionRes.data.sessionId });
         } 
@@ -97,7 +111,7 @@ function PaymentPage() {
 
       } catch (err) {
         console.error(err);
-        setError(err.response?.data?.error || "Booking failed");
+        setError(err.response?.data?.error || err.response?.data?.quote?.[0] || "Booking failed");
       } finally {
         setLoading(false);
       }
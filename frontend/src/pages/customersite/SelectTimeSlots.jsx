@@ -31,11 +31,11 @@ export const SelectTime = () => {
     setParams(paramsObj);
     
     if (paramsObj.barber_id && paramsObj.selected_date) {
-      fetchTimeSlots(paramsObj.barber_id, paramsObj.selected_date);
+      fetchTimeSlots(paramsObj.barber_id, paramsObj.selected_date, false, paramsObj.service_id);
     }
   }, []);
 
-  const fetchTimeSlots = async (barberId, date, isRefresh = false) => {
+  const fetchTimeSlots = async (barberId, date, isRefresh = false, serviceId = params.service_id) => {
     try {
       if (isRefresh) {
         setRefreshing(true);
@@ -45,7 +45,7 @@ export const SelectTime = () => {
 
       const timestamp = new Date().getTime();
       const response = await apiClient.get(
-        `/customersite/available-slots/?barber_id=${barberId}&date=${date}&t=${timestamp}`
+        `/customersite/available-slots/?barber_id=${barberId}&date=${date}&service_id=${serviceId || ''}&t=${timestamp}`
       );
       
       const slots = response.data || [];
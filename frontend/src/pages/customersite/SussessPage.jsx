@@ -3,6 +3,9 @@ import { useNavigate, useSearchParams } from 'react-router-dom';
 import apiClient from '../../slices/api/apiIntercepters';
 import Navbar from '../../components/basics/Navbar';
 
+const VERIFY_ATTEMPTS = 20;
+const VERIFY_INTERVAL_MS = 1500;
+
 function SuccessPage() {
   const navigate = useNavigate();
   const [params] = useSearchParams();
@@ -21,9 +24,19 @@ function SuccessPage() {
       return;
     }
 
-    apiClient
+    // The payment is applied by the Stripe webhook; poll until it has landed.
+    const verify = (attempt = 0) => apiClient
       .post('/payment-service/verify-payment/', { session_id: sessionId })
       .then((res) => {
+        if (res.status === 202) {
+          if (attempt < VERIFY_ATTEMPTS) {
+            setTimeout(() => verify(attempt + 1), VERIFY_INTERVAL_MS);
+          } else {
+            setVerifying(false);
+          }
+          return;
+        }
+
         setPaymentVerified(true);
         setVerifying(false);
 
@@ -40,6 +53,8 @@ function SuccessPage() {
         console.error('Payment verification failed:', err);
         setVerifying(false);
       });
+
+    verify();
   }, []);
 
   if (verifying) {